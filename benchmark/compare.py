@@ -0,0 +1,156 @@
+#!/usr/bin/env python
+# Author: Ruediger Birkner (Networked Systems Group at ETH Zurich)
+
+import math
+import statistics
+from collections import defaultdict
+
+
+DEFAULT_THRESHOLD = 0.25
+DEFAULT_CONFIDENCE = 0.95
+
+# differences of the medians below this many seconds are within the noise of a single timed run
+DEFAULT_MIN_DIFFERENCE = 0.001
+
+
+def get_median_interval(times, confidence=DEFAULT_CONFIDENCE):
+    """
+    Returns a distribution-free confidence interval (lo, hi) of the median of the times: the order statistics j and
+    n - j + 1 around the median, with j the largest rank such that the interval covers the median with the given
+    confidence (binomial distribution with p = 0.5). With too few times, the interval spans all of them.
+    """
+    times = sorted(times)
+    n = len(times)
+
+    # P(X_(j) <= median <= X_(n-j+1)) = 1 - 2 * P(Binomial(n, 0.5) < j)
+    j = 0
+    tail = 0.0
+    while j < n // 2:
+        tail += math.comb(n, j) / 2 ** n
+        if 1 - 2 * tail < confidence:
+            break
+        j += 1
+
+    j = max(j, 1)
+    return times[j - 1], times[n - j]
+
+
+class Comparison(object):
+    """
+    Comparison of the times of a benchmark in two runs. If both runs used the same seed, the i-th runs of the two time
+    the very same generated policies and the comparison is paired: the ratio is the median of the per-run ratios (new /
+    base). Otherwise, it is the ratio of the medians and its interval is bounded by the intervals of the two medians.
+    """
+
+    def __init__(self, name, scenario, base_times, new_times, paired, threshold, confidence, min_difference):
+        self.name = name
+        self.scenario = scenario
+        self.paired = paired and len(base_times) == len(new_times) and min(base_times) > 0
+
+        self.base_median = statistics.median(base_times)
+        self.new_median = statistics.median(new_times)
+        self.base_interval = get_median_interval(base_times, confidence)
+        self.new_interval = get_median_interval(new_times, confidence)
+
+        if self.paired:
+            ratios = [new_time / base_time for base_time, new_time in zip(base_times, new_times)]
+            self.ratio = statistics.median(ratios)
+            self.ratio_interval = get_median_interval(ratios, confidence)
+        elif self.base_interval[0] > 0:
+            self.ratio = self.new_median / self.base_median
+            self.ratio_interval = (self.new_interval[0] / self.base_interval[1],
+                                   self.new_interval[1] / self.base_interval[0])
+        else:
+            self.ratio = float('inf')
+            self.ratio_interval = (0.0, float('inf'))
+
+        # a benchmark only counts as slower if its ratio grew beyond the threshold, the whole confidence interval of
+        # the ratio is above 1 and the medians differ by more than min_difference, i.e., the difference is not noise
+        significant = abs(self.new_median - self.base_median) > min_difference
+        self.regression = significant and self.ratio > 1 + threshold and self.ratio_interval[0] > 1
+        self.improvement = significant and self.ratio < 1 / (1 + threshold) and self.ratio_interval[1] < 1
+
+    def __str__(self):
+        if self.regression:
+            verdict = 'SLOWER'
+        elif self.improvement:
+            verdict = 'faster'
+        else:
+            verdict = ''
+        return "%-50s %10.6f %10.6f %7.3fx [%.3f, %.3f] %s" % (self.name, self.base_median, self.new_median,
+                                                             self.ratio, self.ratio_interval[0],
+                                                             self.ratio_interval[1], verdict)
+
+    def to_dict(self):
+        return {
+            'name': self.name,
+            'scenario': self.scenario,
+            'paired': self.paired,
+            'base_median': self.base_median,
+            'base_interval': list(self.base_interval),
+            'new_median': self.new_median,
+            'new_interval': list(self.new_interval),
+            'ratio': self.ratio,
+            'ratio_interval': list(self.ratio_interval),
+            'regression': self.regression,
+            'improvement': self.improvement,
+        }
+
+
+def compare_runs(base, new, threshold=DEFAULT_THRESHOLD, confidence=DEFAULT_CONFIDENCE,
+                 min_difference=DEFAULT_MIN_DIFFERENCE):
+    """
+    Compares two benchmark runs (as written by BenchmarkSuite) and returns the comparisons of the benchmarks that are
+    in both runs as well as the names of the benchmarks that are only in one of them
+    """
+    base_benchmarks = dict((benchmark['name'], benchmark) for benchmark in base['benchmarks'])
+    new_benchmarks = dict((benchmark['name'], benchmark) for benchmark in new['benchmarks'])
+
+    paired = base.get('seed') == new.get('seed')
+
+    comparisons = list()
+    for benchmark in new['benchmarks']:
+        name = benchmark['name']
+        if name in base_benchmarks:
+            comparisons.append(Comparison(name, benchmark['scenario'], base_benchmarks[name]['times'],
+                                          benchmark['times'], paired, threshold, confidence, min_difference))
+
+    missing = sorted(set(base_benchmarks) - set(new_benchmarks))
+    added = sorted(set(new_benchmarks) - set(base_benchmarks))
+
+    return comparisons, missing, added
+
+
+def get_scenario_ratios(comparisons):
+    """
+    Returns the geometric mean of the median ratios (new / base) of the benchmarks of each scenario
+    """
+    ratios = defaultdict(list)
+    for comparison in comparisons:
+        if 0 < comparison.ratio < float('inf'):
+            ratios[comparison.scenario].append(math.log(comparison.ratio))
+
+    return dict((scenario, math.exp(statistics.mean(logs))) for scenario, logs in ratios.items())
+
+
+def get_report(comparisons, missing, added):
+    output = "%-50s %10s %10s %8s %s\n" % ('Benchmark', 'Base', 'New', 'Ratio', 'CI')
+    for comparison in comparisons:
+        output += "%s\n" % comparison
+
+    output += "\nScenarios (geometric mean of the ratios):\n"
+    for scenario, ratio in sorted(get_scenario_ratios(comparisons).items()):
+        output += "\t%s: %.3fx\n" % (scenario, ratio)
+
+    if missing:
+        output += "\nOnly in the base run: %s\n" % ", ".join(missing)
+    if added:
+        output += "\nOnly in the new run: %s\n" % ", ".join(added)
+
+    regressions = [comparison.name for comparison in comparisons if comparison.regression]
+    if regressions:
+        output += "\n%d benchmarks got slower: %s\n" % (len(regressions), ", ".join(regressions))
+    else:
+        output += "\nNo benchmark got slower.\n"
+
+    return output
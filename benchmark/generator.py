@@ -0,0 +1,88 @@
+#!/usr/bin/env python
+# Author: Ruediger Birkner (Networked Systems Group at ETH Zurich)
+
+import contextlib
+import io
+import random
+from enum import Enum
+from ipaddress import IPv4Address
+
+from eval_time import create_route_map_item
+from model.announcement import RouteMapType
+from model.router import RouteMap, RouteMapDirection
+from model.network import NetworkTopology
+
+
+COMMUNITIES = ["16:%d" % i for i in range(1, 17)]
+
+INTERNAL_BASE = IPv4Address('10.0.0.0')
+EXTERNAL_BASE = IPv4Address('172.16.0.0')
+
+
+class IBGPShape(Enum):
+    FULL_MESH = 1
+    ROUTE_REFLECTOR = 2
+
+
+def generate_network(routers, peers, shape=IBGPShape.FULL_MESH, reflectors=1, items=2, as_number=100, seed=0,
+                     name=None):
+    """
+    Creates a NetworkTopology with the given number of internal routers and external peers. The internal routers are
+    connected in a full iBGP mesh or, with ROUTE_REFLECTOR, the first reflectors routers form a full mesh of route
+    reflectors and every other router is a client of all of them. Every peer is attached to a random internal router
+    which applies an import and an export route map with items random items each (as generated for the timing
+    evaluation). The same seed always creates the same network, the global random generator is left as it was.
+    """
+    state = random.getstate()
+    random.seed(seed)
+    try:
+        # the helpers of the timing evaluation print every item they create
+        with contextlib.redirect_stdout(io.StringIO()):
+            network = create_network(routers, peers, shape, reflectors, items, as_number, name)
+    finally:
+        random.setstate(state)
+
+    return network
+
+
+def create_network(routers, peers, shape, reflectors, items, as_number, name):
+    if not name:
+        name = 'Generated_%s_%d_%d' % (shape.name, routers, peers)
+
+    network = NetworkTopology(name)
+    network.add_community_list(COMMUNITIES)
+
+    internal_routers = list()
+    for i in range(0, routers):
+        router_id = str(INTERNAL_BASE + i + 1)
+        internal_routers.append(network.add_internal_router('router_%d' % i, router_id, as_number))
+
+    # iBGP sessions
+    if shape == IBGPShape.FULL_MESH:
+        reflectors = routers
+    reflectors = min(max(reflectors, 1), routers)
+
+    for i in range(0, reflectors):
+        for j in range(i + 1, reflectors):
+            network.add_peering(internal_routers[i].id, internal_routers[j].id)
+
+    for client in internal_routers[reflectors:]:
+        for reflector in internal_routers[:reflectors]:
+            network.add_peering(reflector.id, client.id)
+            reflector.add_route_reflector_client(client.id)
+
+    # eBGP sessions with a route map in each direction
+    for i in range(0, peers):
+        peer_id = str(EXTERNAL_BASE + i + 1)
+        network.add_external_router('peer_%d' % i, peer_id, as_number + i + 1)
+
+        router = random.choice(internal_routers)
+        network.add_peering(router.id, peer_id)
+
+        for direction in [RouteMapDirection.IN, RouteMapDirection.OUT]:
+            route_map = RouteMap('%s_%s_%d' % (direction.name, router.name, i), RouteMapType.PERMIT)
+            for j in range(0, items):
+                route_map.add_item(create_route_map_item(None, None, None, None), (j + 1) * 10)
+            router.add_route_map(route_map, direction, peer_id)
+
+    return network
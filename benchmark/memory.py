@@ -0,0 +1,113 @@
+#!/usr/bin/env python
+# Author: Ruediger Birkner (Networked Systems Group at ETH Zurich)
+
+import contextlib
+import io
+import logging
+import multiprocessing
+import random
+import resource
+import sys
+from concurrent.futures import ProcessPoolExecutor
+from enum import Enum
+
+from model.announcement import RouteAnnouncement, CommunityUniverse
+from model.fsm_store import fsm_store
+
+
+def get_announcements(result):
+    """
+    Returns all the announcements in the result of a propagation (nested dicts and lists of announcements)
+    """
+    if isinstance(result, RouteAnnouncement):
+        return [result]
+    if isinstance(result, dict):
+        result = result.values()
+    elif not isinstance(result, (list, tuple)):
+        # e.g., the network of the parse benchmarks
+        return []
+    announcements = list()
+    for value in result:
+        announcements.extend(get_announcements(value))
+    return announcements
+
+
+def get_size(obj, seen):
+    """
+    Returns the size in bytes of the object and everything it references that is not in seen yet (ids, updated).
+    Objects that are shared by the whole model are not counted: enum members, the community universes and the
+    automata of the automata store.
+    """
+    if id(obj) in seen or id(obj) in fsm_store.ids or obj is None or isinstance(obj, (Enum, type, CommunityUniverse)):
+        return 0
+    seen.add(id(obj))
+
+    size = sys.getsizeof(obj)
+    if isinstance(obj, dict):
+        for key, value in obj.items():
+            size += get_size(key, seen) + get_size(value, seen)
+    elif isinstance(obj, (list, tuple, set, frozenset)):
+        for value in obj:
+            size += get_size(value, seen)
+    elif not isinstance(obj, (str, bytes, int, float)):
+        if hasattr(obj, '__dict__'):
+            size += get_size(obj.__dict__, seen)
+        for cls in type(obj).__mro__:
+            for name in cls.__dict__.get('__slots__', ()):
+                size += get_size(getattr(obj, name, None), seen)
+    return size
+
+
+def get_peak_rss():
+    """
+    Returns the peak resident set size of the process in bytes
+    """
+    # on Linux, ru_maxrss survives the exec of a spawned process, the high water mark of its memory does not
+    try:
+        with open('/proc/self/status') as infile:
+            for line in infile:
+                if line.startswith('VmHWM:'):
+                    return int(line.split()[1]) * 1024
+    except OSError:
+        pass
+
+    peak_rss = resource.getrusage(resource.RUSAGE_SELF).ru_maxrss
+    # kilobytes on Linux, bytes on macOS
+    return peak_rss if sys.platform == 'darwin' else peak_rss * 1024
+
+
+def measure(benchmark, seed=0):
+    """
+    Sets up the benchmark, runs it once and returns the number of announcements it produced, their size in bytes
+    (objects shared between announcements are counted once) and the peak RSS of the process before and after the run
+    """
+    # as in BenchmarkSuite.run_once, the output of the setup and the run is dropped
+    logging.disable(logging.INFO)
+    with contextlib.redirect_stdout(io.StringIO()):
+        random.seed("%s-%s-memory" % (seed, benchmark.name))
+        function = benchmark.setup(**benchmark.params)
+
+        rss_before = get_peak_rss()
+        result = function()
+        peak_rss = get_peak_rss()
+
+    announcements = get_announcements(result)
+    seen = set()
+    size = sum(get_size(announcement, seen) for announcement in announcements)
+
+    return {
+        'announcements': len(announcements),
+        'bytes': size,
+        'bytes_per_announcement': size / len(announcements) if announcements else 0.0,
+        'peak_rss': peak_rss,
+        'rss_growth': peak_rss - rss_before,
+    }
+
+
+def measure_in_process(benchmark, seed=0):
+    """
+    Runs measure in a fresh worker process, such that the peak RSS only covers this benchmark. The worker is spawned
+    rather than forked, a forked worker would start out with the peak RSS of this process.
+    """
+    with ProcessPoolExecutor(max_workers=1, mp_context=multiprocessing.get_context('spawn')) as executor:
+        return executor.submit(measure, benchmark, seed).result()
@@ -0,0 +1,276 @@
+#!/usr/bin/env python
+# Author: Ruediger Birkner (Networked Systems Group at ETH Zurich)
+
+import os
+import random
+
+from benchmark.generator import COMMUNITIES, IBGPShape, generate_network
+from eval_time import ItemType, Scenario, create_route_map_item, create_a_match_or_set, route_map_random, \
+    ip_network_random
+from model.announcement import RouteAnnouncement, RouteMapType, RouteAnnouncementFields, FilterType
+from model.batch import AnnouncementBatch
+from model.router import RouteMap, RouteMapItems, RouteMapDirection
+from model.ternary import TernaryVector
+from model.network import NetworkTopology
+from utils.config_parser import load_network_from_configs
+
+
+# the scenarios that propagate a symbolic announcement through a network built from configurations or generated
+CONFIG_SCENARIOS = ['ConfigParseTest', 'ConfigTest']
+GENERATED_SCENARIOS = ['ScalingTest', 'BatchTest']
+
+MATCH_FIELDS = [RouteAnnouncementFields.IP_PREFIX, RouteAnnouncementFields.NEXT_HOP, RouteAnnouncementFields.AS_PATH,
+                RouteAnnouncementFields.COMMUNITIES, RouteAnnouncementFields.MED]
+
+SET_FIELDS = [RouteAnnouncementFields.LOCAL_PREF, RouteAnnouncementFields.NEXT_HOP, RouteAnnouncementFields.AS_PATH,
+              RouteAnnouncementFields.COMMUNITIES, RouteAnnouncementFields.MED]
+
+DEFAULT_ITEM_SIZES = [1, 2, 4, 6, 8, 10]
+DEFAULT_ROUTE_MAP_SIZES = [1, 2, 4, 8, 16]
+DEFAULT_ROUTE_MAP_NUMBERS = [1, 2, 4]
+DEFAULT_CONFIG_PATH = 'configs'
+
+# (routers, peers) of the generated networks
+DEFAULT_SCALING_SIZES = [(10, 4), (50, 8), (100, 8), (200, 16)]
+
+# number of concrete announcements that are run through a route map at once and the fields that the route map matches
+DEFAULT_BATCH_SIZES = [100, 1000, 10000]
+BATCH_ROUTE_MAP_SIZE = 16
+BATCH_FIELDS = [RouteAnnouncementFields.IP_PREFIX, RouteAnnouncementFields.NEXT_HOP, RouteAnnouncementFields.MED,
+                RouteAnnouncementFields.COMMUNITIES]
+
+
+class Benchmark(object):
+    """
+    A single benchmark: setup(**params) builds the state of one repetition (not timed) and returns the function whose
+    run time is measured.
+    """
+
+    def __init__(self, scenario, params, setup):
+        self.scenario = scenario
+        self.params = params
+        self.setup = setup
+
+        # enum parameters are named by their members (e.g., FieldTest/IP_PREFIX/MATCH/PERMIT/GE)
+        self.name = "/".join([scenario] + [str(getattr(value, 'name', value)) for value in params.values()])
+
+    def __str__(self):
+        return self.name
+
+
+def get_benchmark_network(route_map_number):
+    """
+    Creates the topologies of the timing evaluation: a single router between two external neighbors with an import
+    route map (and an export route map if route_map_number is 2), or two routers in a chain with an import and an
+    export route map each (route_map_number 4). Returns the network and the list of its route maps.
+    """
+    network = NetworkTopology('BenchmarkNetwork%d' % route_map_number)
+    network.add_community_list(COMMUNITIES)
+
+    if route_map_number == 4:
+        routers = [network.add_internal_router('main1', '10.0.0.1/32', 10),
+                   network.add_internal_router('main2', '10.0.0.2/32', 10)]
+        sessions = [('9.0.0.1', routers[1].id), (routers[0].id, '11.0.0.1')]
+    else:
+        routers = [network.add_internal_router('main', '10.0.0.1/32', 10)]
+        sessions = [('9.0.0.1', '11.0.0.1')]
+
+    route_maps = list()
+    for router, (in_neighbor, out_neighbor) in zip(routers, sessions):
+        route_map = RouteMap('IMPORT_FILTER', RouteMapType.PERMIT)
+        router.add_route_map(route_map, RouteMapDirection.IN, in_neighbor)
+        route_maps.append(route_map)
+
+        if route_map_number > 1:
+            route_map = RouteMap('EXPORT_FILTER', RouteMapType.PERMIT)
+            router.add_route_map(route_map, RouteMapDirection.OUT, out_neighbor)
+            route_maps.append(route_map)
+
+    network.add_external_router('in_neighbor', '9.0.0.1', 9)
+    network.add_external_router('out_neighbor', '11.0.0.1', 11)
+
+    network.add_peering(routers[0].name, 'in_neighbor')
+    if len(routers) > 1:
+        network.add_peering(routers[0].name, routers[1].name)
+    network.add_peering(routers[-1].name, 'out_neighbor')
+
+    return network, route_maps
+
+
+def get_propagation(network, neighbor='in_neighbor'):
+    def propagate():
+        return network.propagate_announcement(neighbor, None, network.AS_community_list)
+
+    return propagate
+
+
+def setup_field_test(field, itemtype, filtertype=None, routemaptype=None):
+    network, route_maps = get_benchmark_network(1)
+    route_maps[0].add_item(create_route_map_item(field, filtertype, routemaptype, itemtype), 10)
+    return get_propagation(network)
+
+
+def setup_item_size_test(itemsize):
+    # a route map item with one match more than sets (or as many), each field at most once
+    number_set = int(itemsize / 2)
+    number_match = itemsize - number_set
+
+    rm_items = RouteMapItems(route_map_random())
+    for field in random.sample(MATCH_FIELDS, number_match):
+        create_a_match_or_set(field, ItemType.MATCH, rm_items)
+    for field in random.sample(SET_FIELDS, number_set):
+        create_a_match_or_set(field, ItemType.SET, rm_items)
+
+    network, route_maps = get_benchmark_network(1)
+    route_maps[0].add_item(rm_items, 10)
+    return get_propagation(network)
+
+
+def setup_route_map_size_test(itemnumber):
+    network, route_maps = get_benchmark_network(1)
+    for i in range(0, itemnumber):
+        route_maps[0].add_item(create_route_map_item(None, None, None, None), (i + 1) * 10)
+    return get_propagation(network)
+
+
+def setup_network_size_test(routemapnum):
+    network, route_maps = get_benchmark_network(routemapnum)
+    for route_map in route_maps:
+        route_map.add_item(create_route_map_item(None, None, None, None), 10)
+    return get_propagation(network)
+
+
+def setup_config_parse_test(config_path):
+    def parse():
+        return load_network_from_configs(config_path, use_cache=False, processes=1)
+
+    return parse
+
+
+def setup_config_test(config_path):
+    network = load_network_from_configs(config_path, use_cache=False, processes=1)
+
+    def propagate():
+        return network.propagate_all(processes=1)
+
+    return propagate
+
+
+def setup_scaling_test(routers, peers, shape):
+    # the network is generated from the seed of the run, the propagation from every peer is timed
+    network = generate_network(routers, peers, shape, reflectors=2, seed=random.getrandbits(32))
+
+    def propagate():
+        return network.propagate_all(processes=1)
+
+    return propagate
+
+
+def create_concrete_announcement():
+    """
+    Returns an announcement of a single random route: the prefix length is fixed and every community is either carried
+    or not
+    """
+    prefix = ip_network_random()
+    announcement = RouteAnnouncement(ip_prefix=prefix, next_hop='10.0.%d.%d/32' % (random.randint(0, 255),
+                                                                                  random.randint(1, 254)),
+                                     med=random.randint(1, 1000), AS_community_list=COMMUNITIES)
+
+    prefixlen = announcement.ip_prefix.prefixlen
+    announcement.ip_prefix.prefix_mask = [prefixlen, prefixlen]
+    announcement.ip_prefix.prefix_type = FilterType.EQUAL
+
+    universe = announcement.communities.universe
+    mask = universe.mask(random.sample(COMMUNITIES, random.randint(0, 4)))
+    announcement.communities.community_vector = TernaryVector(len(universe), mask, ((1 << len(universe)) - 1) ^ mask)
+
+    return announcement
+
+
+def setup_batch_test(announcements, method):
+    # a route map that only matches, applied to the announcements one by one (apply) or all at once (apply_batch)
+    route_map = RouteMap('BATCH_FILTER', RouteMapType.PERMIT)
+    for i in range(0, BATCH_ROUTE_MAP_SIZE):
+        route_map.add_item(create_route_map_item(random.choice(BATCH_FIELDS), FilterType.GE, None, ItemType.MATCH),
+                           (i + 1) * 10)
+    announcement_list = [create_concrete_announcement() for _ in range(0, announcements)]
+
+    if method == 'apply_batch':
+        def apply():
+            return route_map.apply_batch(AnnouncementBatch(announcement_list), RouteMapDirection.IN)
+    else:
+        def apply():
+            return [route_map.apply(announcement, RouteMapDirection.IN) for announcement in announcement_list]
+
+    return apply
+
+
+def get_config_paths(config_path=DEFAULT_CONFIG_PATH):
+    """
+    Returns the paths of all the directories with configurations (*.conf) below config_path
+    """
+    config_paths = list()
+    for name in sorted(os.listdir(config_path)):
+        path = os.path.join(config_path, name)
+        if os.path.isdir(path) and any(config.endswith('.conf') for config in os.listdir(path)):
+            config_paths.append(path)
+    return config_paths
+
+
+def get_benchmarks(scenarios=None, config_path=DEFAULT_CONFIG_PATH):
+    """
+    Returns all benchmarks of the given scenarios (names of Scenario, CONFIG_SCENARIOS or GENERATED_SCENARIOS, all
+    by default)
+    """
+    if not scenarios:
+        scenarios = [scenario.name for scenario in Scenario] + CONFIG_SCENARIOS + GENERATED_SCENARIOS
+
+    benchmarks = list()
+    for scenario in scenarios:
+        if scenario == Scenario.FieldTest.name:
+            for field in MATCH_FIELDS:
+                for filtertype in FilterType:
+                    for routemaptype in RouteMapType:
+                        params = dict(field=field, itemtype=ItemType.MATCH, filtertype=filtertype,
+                                      routemaptype=routemaptype)
+                        benchmarks.append(Benchmark(scenario, params, setup_field_test))
+            for field in SET_FIELDS:
+                params = dict(field=field, itemtype=ItemType.SET)
+                benchmarks.append(Benchmark(scenario, params, setup_field_test))
+
+        elif scenario == Scenario.ItemSizeTest.name:
+            for itemsize in DEFAULT_ITEM_SIZES:
+                benchmarks.append(Benchmark(scenario, dict(itemsize=itemsize), setup_item_size_test))
+
+        elif scenario == Scenario.RoutemapSizeTest.name:
+            for itemnumber in DEFAULT_ROUTE_MAP_SIZES:
+                benchmarks.append(Benchmark(scenario, dict(itemnumber=itemnumber), setup_route_map_size_test))
+
+        elif scenario == Scenario.NetworkSizeTest.name:
+            for routemapnum in DEFAULT_ROUTE_MAP_NUMBERS:
+                benchmarks.append(Benchmark(scenario, dict(routemapnum=routemapnum), setup_network_size_test))
+
+        elif scenario == 'ConfigParseTest':
+            for path in get_config_paths(config_path):
+                benchmarks.append(Benchmark(scenario, dict(config_path=path), setup_config_parse_test))
+
+        elif scenario == 'ConfigTest':
+            for path in get_config_paths(config_path):
+                benchmarks.append(Benchmark(scenario, dict(config_path=path), setup_config_test))
+
+        elif scenario == 'ScalingTest':
+            for shape in IBGPShape:
+                for routers, peers in DEFAULT_SCALING_SIZES:
+                    params = dict(routers=routers, peers=peers, shape=shape)
+                    benchmarks.append(Benchmark(scenario, params, setup_scaling_test))
+
+        elif scenario == 'BatchTest':
+            for announcements in DEFAULT_BATCH_SIZES:
+                for method in ['apply', 'apply_batch']:
+                    params = dict(announcements=announcements, method=method)
+                    benchmarks.append(Benchmark(scenario, params, setup_batch_test))
+
+        else:
+            raise ValueError("Unknown benchmark scenario: %s" % scenario)
+
+    return benchmarks
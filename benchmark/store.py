@@ -0,0 +1,73 @@
+#!/usr/bin/env python
+# Author: Ruediger Birkner (Networked Systems Group at ETH Zurich)
+
+import datetime
+import json
+import os
+
+
+DEFAULT_STORE_PATH = 'evaluation/results'
+
+
+class ResultStore(object):
+    """
+    Directory of benchmark runs, one JSON file (as written by BenchmarkSuite) per run named <timestamp>_<label>.json
+    """
+
+    def __init__(self, path=DEFAULT_STORE_PATH):
+        self.path = path
+
+    def save(self, results, label='run'):
+        """
+        Stores the results (dict) of a run and returns the path of the file
+        """
+        if not os.path.exists(self.path):
+            os.makedirs(self.path)
+
+        results = dict(results)
+        results['label'] = label
+
+        file_name = os.path.join(self.path, '%s_%s.json' % ('{:%Y%m%d-%H%M%S}'.format(datetime.datetime.now()), label))
+        with open(file_name, 'w') as outfile:
+            json.dump(results, outfile, indent=2)
+
+        return file_name
+
+    def get_runs(self, label=None):
+        """
+        Returns the paths of all stored runs (with the label), oldest first
+        """
+        if not os.path.isdir(self.path):
+            return list()
+
+        runs = list()
+        for file_name in sorted(os.listdir(self.path)):
+            if not file_name.endswith('.json'):
+                continue
+            if label is not None and not file_name[:-len('.json')].split('_', 1)[-1] == label:
+                continue
+            runs.append(os.path.join(self.path, file_name))
+        return runs
+
+    def resolve(self, run):
+        """
+        Returns the path of a run given either as a path or as the label of a stored run (the latest one with that
+        label), 'latest' and 'previous' refer to the last two stored runs
+        """
+        if os.path.isfile(run):
+            return run
+
+        if run in ('latest', 'previous'):
+            runs = self.get_runs()
+            index = -1 if run == 'latest' else -2
+        else:
+            runs = self.get_runs(run)
+            index = -1
+
+        if len(runs) < -index:
+            raise ValueError("There is no benchmark run %s in %s." % (run, self.path))
+        return runs[index]
+
+    def load(self, run):
+        with open(self.resolve(run)) as infile:
+            return json.load(infile)
@@ -0,0 +1,126 @@
+#!/usr/bin/env python
+# Author: Ruediger Birkner (Networked Systems Group at ETH Zurich)
+
+import contextlib
+import datetime
+import gc
+import io
+import json
+import logging
+import platform
+import random
+import statistics
+import time
+
+from benchmark.memory import measure_in_process
+from utils.logger import get_logger
+
+
+# initialize logging
+logger = get_logger('BenchmarkSuite', 'INFO')
+
+
+class BenchmarkResult(object):
+    def __init__(self, benchmark, times, memory=None):
+        self.benchmark = benchmark
+        self.times = times
+        # announcements, their size and the peak RSS of a single run (see benchmark.memory.measure)
+        self.memory = memory
+
+    def __str__(self):
+        output = "%s: median %.6fs, min %.6fs (%d runs)" % (self.benchmark.name, self.get_median(), min(self.times),
+                                                           len(self.times))
+        if self.memory is not None:
+            output += ", %d announcements, %.0f bytes per announcement, peak RSS %.1f MB" % (
+                self.memory['announcements'], self.memory['bytes_per_announcement'], self.memory['peak_rss'] / 2 ** 20)
+        return output
+
+    def get_median(self):
+        return statistics.median(self.times)
+
+    def to_dict(self):
+        result = {
+            'name': self.benchmark.name,
+            'scenario': self.benchmark.scenario,
+            'params': dict((key, str(getattr(value, 'name', value))) for key, value in self.benchmark.params.items()),
+            'times': self.times,
+            'min': min(self.times),
+            'median': self.get_median(),
+            'mean': statistics.mean(self.times),
+            'stdev': statistics.stdev(self.times) if len(self.times) > 1 else 0.0,
+        }
+        if self.memory is not None:
+            result['memory'] = self.memory
+        return result
+
+
+class BenchmarkSuite(object):
+    """
+    Non-interactive replacement of the timing TestSuite in eval_time. Every benchmark is first run warmup times (to
+    fill the caches of the model, e.g., the automata store) and then repetitions times. Each run is set up anew with
+    the random generator seeded by (seed, benchmark, run), hence, all runs are reproducible. Only the run itself is
+    timed with time.perf_counter, with the garbage collector disabled as timeit does. With memory, every benchmark is
+    additionally run once in a fresh process to measure the size of the announcements and the peak RSS.
+    """
+
+    def __init__(self, benchmarks, repetitions=10, warmup=2, seed=0, memory=False):
+        self.benchmarks = benchmarks
+        self.repetitions = repetitions
+        self.warmup = warmup
+        self.seed = seed
+        self.memory = memory
+
+        self.results = list()
+
+    def run(self):
+        self.results = list()
+        for benchmark in self.benchmarks:
+            for i in range(0, self.warmup):
+                self.run_once(benchmark, 'warmup-%d' % i)
+
+            times = [self.run_once(benchmark, i) for i in range(0, self.repetitions)]
+            memory = measure_in_process(benchmark, self.seed) if self.memory else None
+            result = BenchmarkResult(benchmark, times, memory)
+            self.results.append(result)
+            logger.info(result)
+
+        return self.results
+
+    def run_once(self, benchmark, run):
+        # the helpers that generate the route maps print a lot and the parser logs every config, which should neither
+        # end up in the output nor be timed
+        logging.disable(logging.INFO)
+        try:
+            with contextlib.redirect_stdout(io.StringIO()):
+                random.seed("%s-%s-%s" % (self.seed, benchmark.name, run))
+                function = benchmark.setup(**benchmark.params)
+
+                gc.collect()
+                gc_enabled = gc.isenabled()
+                gc.disable()
+                try:
+                    start_time = time.perf_counter()
+                    function()
+                    run_time = time.perf_counter() - start_time
+                finally:
+                    if gc_enabled:
+                        gc.enable()
+        finally:
+            logging.disable(logging.NOTSET)
+
+        return run_time
+
+    def to_dict(self):
+        return {
+            'created': '{:%Y-%m-%dT%H:%M:%S}'.format(datetime.datetime.now()),
+            'python': platform.python_version(),
+            'platform': platform.platform(),
+            'seed': self.seed,
+            'warmup': self.warmup,
+            'repetitions': self.repetitions,
+            'benchmarks': [result.to_dict() for result in self.results],
+        }
+
+    def write_results(self, file_name):
+        with open(file_name, 'w') as outfile:
+            json.dump(self.to_dict(), outfile, indent=2)
@@ -0,0 +1,43 @@
+#!/usr/bin/env python
+# Author: Ruediger Birkner (Networked Systems Group at ETH Zurich)
+
+import argparse
+import json
+import sys
+
+from benchmark.compare import compare_runs, get_report, DEFAULT_THRESHOLD, DEFAULT_CONFIDENCE, DEFAULT_MIN_DIFFERENCE
+from benchmark.store import ResultStore, DEFAULT_STORE_PATH
+
+
+if __name__ == "__main__":
+    parser = argparse.ArgumentParser(description='Compare two benchmark runs and fail if a benchmark got slower.')
+    parser.add_argument('base', help='results file or label of a stored run ("previous" by default)', nargs='?',
+                        default='previous')
+    parser.add_argument('new', help='results file or label of a stored run ("latest" by default)', nargs='?',
+                        default='latest')
+    parser.add_argument('-t', '--threshold', help='relative slowdown of the median that counts as regression',
+                        type=float, default=DEFAULT_THRESHOLD)
+    parser.add_argument('-c', '--confidence', help='confidence level of the intervals of the medians', type=float,
+                        default=DEFAULT_CONFIDENCE)
+    parser.add_argument('-m', '--min-difference', help='difference of the medians (in seconds) below which a benchmark '
+                                                       'never counts as slower', type=float,
+                        default=DEFAULT_MIN_DIFFERENCE)
+    parser.add_argument('--store', help='directory of the result store', default=DEFAULT_STORE_PATH)
+    parser.add_argument('-o', '--output', help='also write the comparison as JSON to this file')
+
+    args = parser.parse_args()
+
+    store = ResultStore(args.store)
+    comparisons, missing, added = compare_runs(store.load(args.base), store.load(args.new), args.threshold,
+                                               args.confidence, args.min_difference)
+
+    print(get_report(comparisons, missing, added))
+
+    if args.output:
+        with open(args.output, 'w') as outfile:
+            json.dump({'threshold': args.threshold, 'confidence': args.confidence,
+                       'min_difference': args.min_difference, 'missing': missing, 'added': added,
+                       'comparisons': [comparison.to_dict() for comparison in comparisons]}, outfile, indent=2)
+
+    # the exit code fails the gate if any benchmark got slower
+    sys.exit(1 if any(comparison.regression for comparison in comparisons) else 0)
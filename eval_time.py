@@ -15,7 +15,7 @@ from model.router import RouteMap, RouteMapItems, RouteMapDirection
 
 from model.network import NetworkTopology
 
-from utils.logger import get_logger
+from utils.logger import get_logger, set_debug
 
 
 class ItemType(Enum):
@@ -771,6 +771,7 @@ if __name__ == "__main__":
     args = parser.parse_args()
 
     debug = args.debug
+    set_debug(debug)
 
     TestSuite()
 
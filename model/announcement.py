@@ -2,18 +2,22 @@
 # Author: Ruediger Birkner (Networked Systems Group at ETH Zurich)
 
 
+from collections import namedtuple
 from enum import Enum
 from netaddr import IPNetwork
-from bitstring import BitArray
 
+from utils import logger as log
 from utils.logger import get_logger
+from model.ternary import TernaryVector
+from model.intervals import IntervalSet
+from model.fsm_store import fsm_store
 
-from greenery.lego import parse
-from greenery import lego
 from colorama import Fore
 from colorama import Style
 import sys
-import copy
+
+
+logger = get_logger('RouteAnnouncement', 'DEBUG')
 
 def eprint(*args, **kwargs):
     print(Fore.RED, *args, Style.RESET_ALL, file=sys.stderr, **kwargs)
@@ -40,15 +44,60 @@ class FilterType(Enum):
     LE = 3
 
 
+# MED and local pref are 32 bit values
+METRIC_END = 2 ** 32
+
+# methods of RouteAnnouncement that filter and set the individual fields
+FILTER_METHODS = {
+    RouteAnnouncementFields.IP_PREFIX: 'filter_ip_prefix',
+    RouteAnnouncementFields.NEXT_HOP: 'filter_next_hop',
+    RouteAnnouncementFields.MED: 'filter_med',
+    RouteAnnouncementFields.LOCAL_PREF: 'filter_local_pref',
+    RouteAnnouncementFields.COMMUNITIES: 'filter_communities',
+    RouteAnnouncementFields.AS_PATH: 'filter_as_path',
+}
+
+SET_METHODS = {
+    RouteAnnouncementFields.IP_PREFIX: 'set_ip_prefix',
+    RouteAnnouncementFields.NEXT_HOP: 'set_next_hop',
+    RouteAnnouncementFields.AS_PATH: 'set_as_path',
+    RouteAnnouncementFields.MED: 'set_med',
+    RouteAnnouncementFields.LOCAL_PREF: 'set_local_pref',
+    RouteAnnouncementFields.COMMUNITIES: 'set_communities',
+}
+
+# attributes that a filter on the field changes in the announcement it passes on to the next route map item
+FILTER_ATTRIBUTES = {
+    RouteAnnouncementFields.IP_PREFIX: ('ip_prefix', 'ip_prefix_deny'),
+    RouteAnnouncementFields.NEXT_HOP: ('next_hop', 'next_hop_deny'),
+    RouteAnnouncementFields.MED: ('med', ),
+    RouteAnnouncementFields.LOCAL_PREF: ('local_pref', ),
+    RouteAnnouncementFields.COMMUNITIES: ('communities', 'communities_deny', 'AS_community_list'),
+    RouteAnnouncementFields.AS_PATH: ('as_path',),
+}
+
+
+def freeze(value):
+    """
+    Returns a hashable version of a field value: lists become tuples and model objects their fingerprint
+    """
+    if isinstance(value, list):
+        return tuple(freeze(element) for element in value)
+    if hasattr(value, 'fingerprint'):
+        return value.fingerprint()
+    return value
+
+
 class RouteAnnouncement(object):
     """
     A BGP Route Announcement whose fields can be anywhere from fully symbolic to fully specified
     """
 
-    def __init__(self, ip_prefix=None, next_hop=None, as_path=None, med=None, local_pref=None, communities=None, AS_community_list= None, debug=True):
-        self.logger = get_logger('RouteAnnouncement', 'DEBUG')
-        self.logger.disabled = True
+    # the propagation keeps a large number of announcements alive, hence, they have no per-instance __dict__
+    __slots__ = ('ip_prefix', 'ip_prefix_deny', 'next_hop', 'next_hop_deny', 'local_pref', 'med', 'AS_community_list',
+                 'communities', 'communities_deny', 'as_path', 'hit', 'drop_next_announcement')
 
+    def __init__(self, ip_prefix=None, next_hop=None, as_path=None, med=None, local_pref=None, communities=None, AS_community_list= None, debug=True):
         if ip_prefix:
             self.ip_prefix = SymbolicField.create_from_prefix(ip_prefix, RouteAnnouncementFields.IP_PREFIX)
             self.ip_prefix_deny = []
@@ -65,68 +114,59 @@ class RouteAnnouncement(object):
             self.next_hop = SymbolicField(RouteAnnouncementFields.NEXT_HOP, 32)
             self.next_hop_deny = []
 
-        if local_pref:
-            self.local_pref = local_pref
-
+        # med and local pref are the sets of values they can take, the values that are denied are removed from the set
+        if local_pref is not None:
+            self.local_pref = IntervalSet.point(int(local_pref), METRIC_END)
         else:
-            # set default local pref to 50
-            self.local_pref = "x"
+            self.local_pref = IntervalSet.full(METRIC_END)
 
-        if med:
-            self.med = med
-            self.med_deny = []
+        if med is not None:
+            self.med = IntervalSet.point(int(med), METRIC_END)
         else:
-            self.med = "x"
-            self.med_deny = []
+            self.med = IntervalSet.full(METRIC_END)
 
         if AS_community_list:
             self.AS_community_list = AS_community_list[:]
-            self.logger.debug("Assign AS community list: %s" % self.AS_community_list)
+            if log.DEBUG:
+                logger.debug("Assign AS community list: %s" % self.AS_community_list)
         else:
             self.AS_community_list = []
 
         if communities:
             # map community value to community bitstring, set the corresponding bit to 1
             self.communities = Community(self.AS_community_list )
-            # communities should be a list, currently only support to match AND type
-            # TODO add support for OR
-            self.communities.set_community_values_AND(communities)
+            # communities is a list of the communities the announcement carries, the OR of several lists is
+            # matched by a CommunityList
+            self.communities.set_community_values_and(communities)
             self.communities_deny = []
         else:
-            # communities are 32 bit bit-string with all 1s
-            # self.communities = BitArray('int:2*16=-1')
-            self.logger.debug("Creating a Community object with as community list %s" % self.AS_community_list)
+            # communities are fully symbolic, every community might be present
+            if log.DEBUG:
+                logger.debug("Creating a Community object with as community list %s" % self.AS_community_list)
 
             self.communities = Community(self.AS_community_list)
 
             self.communities_deny = []
-            self.logger.debug("Community bitarray: %s and As community list is %s" % (self.communities.community_bitarray, self.AS_community_list))
+            if log.DEBUG:
+                logger.debug("Community vector: %s and As community list is %s" % (self.communities.community_vector, self.AS_community_list))
 
         if as_path:
             self.as_path = AsPath(regex=as_path)
         else:
             self.as_path = AsPath(regex=None)
-            self.logger.debug(" Initialize as path regex to %s" % self.as_path.as_path_regex)
+            if log.DEBUG:
+                logger.debug(" Initialize as path regex to %s" % self.as_path.as_path_regex)
 
         self.hit = 0
         self.drop_next_announcement = 0
 
     def set_field(self, field, value):
-        if field == RouteAnnouncementFields.IP_PREFIX:
-            self.set_ip_prefix(value)
-        elif field == RouteAnnouncementFields.NEXT_HOP:
-            self.set_next_hop(value)
-        elif field == RouteAnnouncementFields.AS_PATH:
-            self.set_as_path(value)
-        elif field == RouteAnnouncementFields.MED:
-            self.set_med(value)
-        elif field == RouteAnnouncementFields.LOCAL_PREF:
-            self.set_local_pref(value)
-        elif field == RouteAnnouncementFields.COMMUNITIES:
-            # value here is a list of community strings ["16:3", "16:4"]
-            self.set_communities(value)
-        else:
-            self.logger.error('Tried to set unknown field "%s with value "%s"' % (field, value))
+        # for communities, value is a list of community strings ["16:3", "16:4"]
+        method = SET_METHODS.get(field)
+        if method is None:
+            logger.error('Tried to set unknown field "%s with value "%s"' % (field, value))
+            return
+        getattr(self, method)(value)
 
     def set_ip_prefix(self, ip_prefix):
         pass
@@ -137,19 +177,21 @@ class RouteAnnouncement(object):
         pass
 
     def set_as_path(self, as_path):
+        self.as_path = self.as_path.copy()
         self.as_path.prepend_as_path(as_path)
 
         pass
 
     def set_med(self, med):
-        self.med = med
+        self.med = IntervalSet.point(int(med), METRIC_END)
         pass
 
     def set_local_pref(self, local_pref):
-        self.local_pref = local_pref
+        self.local_pref = IntervalSet.point(int(local_pref), METRIC_END)
         pass
 
     def set_communities(self, communities):
+        self.communities = self.communities.copy()
         self.communities.set_community_values_and(communities)  # communities is a list of the actual community values
         pass
 
@@ -160,8 +202,8 @@ class RouteAnnouncement(object):
         mask_next_hop_list = list()
         mask_next_hop_list_str ="[]"
 
-        med_list = list()
-        med_str = "[]"
+        med_value, med_str = self.get_metric_str(self.med)
+        local_pref_value, _ = self.get_metric_str(self.local_pref)
         community_deny_list = list()
         community_deny_str = "[]"
 
@@ -179,11 +221,6 @@ class RouteAnnouncement(object):
                 mask_next_hop_list.append(("".join(str(mask_next_hop))))
                 mask_next_hop_list_str = ", ".join(mask_next_hop_list)
 
-        if len(self.med_deny) != 0:
-            for x in self.med_deny:
-                med_list.append(str(x))
-            med_str = ", ".join(med_list)
-
         if len(self.communities_deny) != 0:
             for x in self.communities_deny:
                 community_deny_list.append(str(x))
@@ -192,39 +229,120 @@ class RouteAnnouncement(object):
         return 'IP Prefix: %s, %s, IP Deny: %s, Next Hop: %s, Next Hop Deny: %s, Local Pref: %s, Med: %s, Med Deny: %s, Community: %s, ' \
                'Community_deny: %s, AS Path: %s' % (self.ip_prefix,self.ip_prefix.prefix_mask,mask_ip_list_str, self.next_hop,
                                                      mask_next_hop_list_str,
-            self.local_pref, self.med, med_str, self.communities, community_deny_str, ",".join(self.as_path.as_path_list))
+            local_pref_value, med_value, med_str, self.communities, community_deny_str, ",".join(self.as_path.as_path_list))
 
     def __repr__(self):
         return self.__str__()
 
+    @staticmethod
+    def get_metric_str(values):
+        """
+        Returns how a MED or local pref set is printed: its value (or the range it spans, 'x' if unrestricted) and the
+        values that are excluded from that range
+        """
+        value = values.get_value()
+        if value is not None:
+            return str(value), "[]"
+
+        intervals = values.get_intervals()
+        if not intervals:
+            return "z", "[]"
+        lo, hi = intervals[0][0], intervals[-1][1]
+        hull = IntervalSet.range(lo, hi, values.end)
+        gaps = hull.difference(values)
+        value = 'x' if hull.is_full() else str(hull)
+        if gaps.is_empty():
+            return value, "[]"
+        return value, str(gaps).replace(',', ', ')
+
+    def copy(self):
+        """
+        Returns a copy of the announcement that shares all its fields with the original. Fields are never changed in
+        place, every change replaces the field (or deny list) by a modified copy. Hence, deriving an announcement
+        only allocates the fields that actually change.
+        """
+        clone = RouteAnnouncement.__new__(RouteAnnouncement)
+        clone.ip_prefix = self.ip_prefix
+        clone.ip_prefix_deny = self.ip_prefix_deny
+        clone.next_hop = self.next_hop
+        clone.next_hop_deny = self.next_hop_deny
+        clone.local_pref = self.local_pref
+        clone.med = self.med
+        clone.AS_community_list = self.AS_community_list
+        clone.communities = self.communities
+        clone.communities_deny = self.communities_deny
+        clone.as_path = self.as_path
+        clone.hit = self.hit
+        clone.drop_next_announcement = self.drop_next_announcement
+        return clone
+
+    def __copy__(self):
+        return self.copy()
+
     def __deepcopy__(self, memo):
-        return deepcopy_with_sharing(self, shared_attribute_names=['logger'], memo=memo)
+        return self.copy()
+
+    def fingerprint(self):
+        """
+        Returns a hashable value that is equal for two announcements if and only if a route map treats them the same
+        """
+        return (self.ip_prefix.fingerprint(), freeze(self.ip_prefix_deny),
+                self.next_hop.fingerprint(), freeze(self.next_hop_deny),
+                self.med, self.local_pref,
+                self.communities.fingerprint(), freeze(self.communities_deny),
+                self.as_path.fingerprint(),
+                self.hit, self.drop_next_announcement)
+
+    def subsumes(self, other):
+        """
+        Returns True if every route described by the other announcement is also described by this one. The check is
+        conservative, fields that cannot be compared cheaply have to be equal.
+        """
+        if self.hit != other.hit or self.drop_next_announcement != other.drop_next_announcement:
+            return False
+        if self.communities.universe is not other.communities.universe:
+            return False
+        if not self.med.issuperset(other.med) or not self.local_pref.issuperset(other.local_pref):
+            return False
+        if self.as_path.as_path_list != other.as_path.as_path_list:
+            return False
+
+        # this announcement may only deny a subset of what the other denies
+        for deny, other_deny in [(self.ip_prefix_deny, other.ip_prefix_deny), (self.next_hop_deny, other.next_hop_deny),
+                                 (self.communities_deny, other.communities_deny)]:
+            if deny and not set(freeze(deny)) <= set(freeze(other_deny)):
+                return False
+
+        if not self.check_covers(self.ip_prefix, other.ip_prefix) or \
+                not self.check_covers(self.next_hop, other.next_hop):
+            return False
+
+        if not self.communities.covers(other.communities):
+            return False
+
+        if self.as_path.as_path_fsm is not other.as_path.as_path_fsm and \
+                not fsm_store.issuperset(self.as_path.as_path_fsm, other.as_path.as_path_fsm):
+            return False
+
+        return True
+
+    def check_covers(self, ip1, ip2):
+        # check if ip2 is a subset of ip1, for symbolic fields of two announcements
+        if ip1 is ip2 or ip1.fingerprint() == ip2.fingerprint():
+            return True
+        if self.check_ip_range_overlap(ip1.prefix_mask, ip2.prefix_mask)[0] == -1:
+            return False
+        return self.check_subset(ip1, ip2) == 1
 
     def set_action(self, instance, value):
         pass
 
-    @staticmethod
-    # check if a ip prefix bit array has any impossible bit in it
-    def check_zero(ip_prefix, length):
-        zero = 0
-        zero_position = 0
-        for i in range(0, length):
-            if not ip_prefix[2 * i] and not ip_prefix[2 * i + 1]:
-                zero = 1
-                zero_position = i
-                break
-            else:
-                continue
-        if zero == 0:
-            zero_position = 32
-        return zero, zero_position
-
     def check_zero_list(self, ip_list, ip_prefix):
         zero=0
         for x in ip_list:
-            if self.check_zero(x.bitarray & ip_prefix.bitarray, 32) != 0 or\
-                    ((x.bitarray_mask_type == FilterType.EQUAL) and (ip_prefix.bitarray_mask_type == FilterType.EQUAL)
-                     and (x.bitarray != ip_prefix.bitarray)):
+            if (x.ternary & ip_prefix.ternary).has_impossible() or\
+                    ((x.prefix_type == FilterType.EQUAL) and (ip_prefix.prefix_type == FilterType.EQUAL)
+                     and (x.ternary != ip_prefix.ternary)):
                 zero = 1
                 break
 
@@ -235,10 +353,10 @@ class RouteAnnouncement(object):
     def check_subset(self, ip1, ip2):
         # check if ip2 is a subset of ip1
         is_subset = 0
-        zero, zero_position = self.check_zero(ip1.bitarray & ip2.bitarray, 32)
+        zero_position = (ip1.ternary & ip2.ternary).first_impossible()
         range = self.check_ip_range_overlap(ip1.prefix_mask, ip2.prefix_mask)
         if range[0] == -1:
-            self.logger.error("IP mask ranges should be overlapping at this point")
+            logger.error("IP mask ranges should be overlapping at this point")
         if ip1.prefix_mask[0] <= ip2.prefix_mask[0] and ip1.prefix_mask[1] >= ip2.prefix_mask[1]:
             # Superset is GE type
             if ip1.prefix_mask[1] == 32:
@@ -246,7 +364,8 @@ class RouteAnnouncement(object):
                     is_subset = 1
             # Superset is LE type
             if ip1.prefix_mask[0] == 0:
-                self.logger.debug("comparing subset of LE types: zero position = %s" % ip2.prefix_mask[1])
+                if log.DEBUG:
+                    logger.debug("comparing subset of LE types: zero position = %s" % ip2.prefix_mask[1])
                 if zero_position + 1 > ip2.prefix_mask[1]:
 
                     is_subset = 1
@@ -260,7 +379,8 @@ class RouteAnnouncement(object):
                 if self.check_subset(x, ip2) == 1:
                     is_ip_subset_deny = 1
                     break
-        self.logger.debug("pattern is a subset of the deny list %s" % is_ip_subset_deny)
+        if log.DEBUG:
+            logger.debug("pattern is a subset of the deny list %s" % is_ip_subset_deny)
         return is_ip_subset_deny
 
     def prefix_mask_intersect(self, pattern):
@@ -272,36 +392,28 @@ class RouteAnnouncement(object):
         return
 
     def check_le_overlap(self, ip1, ip2, limit):
-        ip_prefix = ''
-        self.logger.debug("check le overlap, ip1.bitarray: %s and ip2.bitarray: %s" % (ip1.bitarray, ip2.bitarray))
-        fip = ip1.bitarray & ip2.bitarray
+        if log.DEBUG:
+            logger.debug("check le overlap, ip1: %s and ip2: %s" % (ip1.ternary, ip2.ternary))
+        fip = ip1.ternary & ip2.ternary
 
-        zero, zero_position = self.check_zero(fip, 32)
-        self.logger.debug("zero is found %s and zero_position is %s" % (zero, zero_position))
+        zero_position = fip.first_impossible()
+        if log.DEBUG:
+            logger.debug("zero_position is %s" % zero_position)
         if limit[0] < zero_position < limit[1]:
             prefix_len = zero_position
-            print('Assign zero position to prefix_len %d' % prefix_len)
-            for i in range(0, zero_position):
-                # 0 -> 01
-                if not fip[2 * i] and fip[2 * i + 1]:
-                    ip_prefix += '0'
-                # 1 -> 10
-                elif fip[2 * i] and not fip[2 * i + 1]:
-                    ip_prefix += '1'
+            if log.DEBUG:
+                logger.debug('Assign zero position to prefix_len %d' % prefix_len)
 
-            ip_prefix += '0' * (32 - prefix_len)
-
-            prefix = '%s/%d' % (
-            '.'.join(['%d' % int('0b%s' % ip_prefix[j * 8:(j + 1) * 8], 2) for j in range(0, 4)]), prefix_len)
-
-            filtered_ip = SymbolicField.create_from_prefix(prefix, RouteAnnouncementFields.IP_PREFIX)
+            filtered_ip = SymbolicField.create_from_int(fip.prefix_value(prefix_len), prefix_len,
+                                                        RouteAnnouncementFields.IP_PREFIX)
             filtered_ip.prefix_mask = [limit[0], prefix_len]
         elif zero_position == 32:
-            prefix = ip1.ip_str_of_smaller_prefix_len(ip2)
+            smaller_ip = ip1.ip_of_smaller_prefix_len(ip2)
             # check for filter pattern is a superset of the original announcement
 
-            self.logger.debug("zero position is at 32 and smaller prefix is %s" % prefix)
-            filtered_ip = SymbolicField.create_from_prefix(prefix, RouteAnnouncementFields.IP_PREFIX)
+            if log.DEBUG:
+                logger.debug("zero position is at 32 and smaller prefix is %s" % smaller_ip.str_ip_prefix)
+            filtered_ip = SymbolicField.create_from_field(smaller_ip, RouteAnnouncementFields.IP_PREFIX)
             filtered_ip.prefix_mask = limit
         else:
             # zero position is before range[0]
@@ -311,45 +423,36 @@ class RouteAnnouncement(object):
 
     def check_ge_le_overlap(self, ip1, ip2, limit):
 
-        self.logger.debug("check GE LE overlap, ip1.bitarray: %s and ip2.bitarray: %s" % (ip1.bitarray, ip2.bitarray))
-        fip = ip1.bitarray & ip2.bitarray
-        ip_prefix = ''
-        zero, zero_position = self.check_zero(fip, 32)
-        self.logger.debug("zero is found %s and zero_position is %s" % (zero, zero_position))
+        if log.DEBUG:
+            logger.debug("check GE LE overlap, ip1: %s and ip2: %s" % (ip1.ternary, ip2.ternary))
+        fip = ip1.ternary & ip2.ternary
+        zero_position = fip.first_impossible()
+        if log.DEBUG:
+            logger.debug("zero_position is %s" % zero_position)
         overlap = 0
         if ip2.prefix_type == FilterType.LE:
             # zero position could fall inside the range, but at least it needs to be greater than range[0]
             if zero_position + 1 > limit[0]:
                 prefix_len = min(zero_position, limit[1])
-                for i in range(0, prefix_len):
-                    if not fip[2 * i] and fip[2 * i + 1]:
-                        ip_prefix += '0'
-                    # 1 -> 10
-                    elif fip[2 * i] and not fip[2 * i + 1]:
-                        ip_prefix += '1'
-
-                ip_prefix += '0' * (32 - prefix_len)
-                prefix = '%s/%d' % (
-                    '.'.join(['%d' % int('0b%s' % ip_prefix[j * 8:(j + 1) * 8], 2) for j in range(0, 4)]), prefix_len)
-                overlap = SymbolicField.create_from_prefix(prefix, RouteAnnouncementFields.IP_PREFIX)
+                overlap = SymbolicField.create_from_int(fip.prefix_value(prefix_len), prefix_len,
+                                                        RouteAnnouncementFields.IP_PREFIX)
                 overlap.prefix_mask = [limit[0], prefix_len]
         elif ip2.prefix_type == FilterType.GE:
             if zero_position + 1 > limit[0]:
                 # check if its two GE type overlapping
                 if limit[1] == 32:
-                    prefix= ip2.str_ip_prefix
+                    overlap = SymbolicField.create_from_field(ip2, RouteAnnouncementFields.IP_PREFIX)
                 else:
-                    prefix = ip1.str_ip_prefix
-                overlap = SymbolicField.create_from_prefix(prefix, RouteAnnouncementFields.IP_PREFIX)
+                    overlap = SymbolicField.create_from_field(ip1, RouteAnnouncementFields.IP_PREFIX)
                 overlap.prefix_mask = limit
-                self.logger.debug("Overlap prefix_mask is two prefix intersection %s" % limit)
+                if log.DEBUG:
+                    logger.debug("Overlap prefix_mask is two prefix intersection %s" % limit)
 
             else: # there is no overlapping
                 overlap = -1
         elif ip2.prefix_type == FilterType.EQUAL:
             if zero_position +1 > ip2.prefix_mask[0]:
-                prefix = ip2.str_ip_prefix
-                overlap = SymbolicField.create_from_prefix(prefix, RouteAnnouncementFields.IP_PREFIX)
+                overlap = SymbolicField.create_from_field(ip2, RouteAnnouncementFields.IP_PREFIX)
                 overlap.prefix_mask = ip2.prefix_mask
             else:
                 overlap = -1
@@ -358,16 +461,15 @@ class RouteAnnouncement(object):
 
     @ staticmethod
     def equal_two_symbolic_ip(ip1, ip2):
-        if ip1.str_ip_prefix == ip2.str_ip_prefix:
-            ip1.prefix_mask = ip2.prefix_mask
-            return 0
-        else:
-            ip1.prefixlen = ip2.prefixlen
-            ip1.bitarray = ip2.bitarray
-            ip1.str_ip_prefix = ip2.str_ip_prefix
-            ip1.prefix_mask = ip2.prefix_mask
+        # ip1 might be shared with other announcements, hence the result is a copy of ip1 set to the prefix of ip2
+        ip = ip1.copy()
+        if ip1.str_ip_prefix != ip2.str_ip_prefix:
+            ip.prefixlen = ip2.prefixlen
+            ip.ternary = ip2.ternary
+            ip.str_ip_prefix = ip2.str_ip_prefix
+        ip.prefix_mask = ip2.prefix_mask
 
-        return
+        return ip
 
     @staticmethod
     def check_ip_range_overlap(prefix_mask1, prefix_mask2):
@@ -381,534 +483,881 @@ class RouteAnnouncement(object):
 
     # match type could be eq, ge, le
     def filter(self, match_type, field, pattern):
+        method = FILTER_METHODS.get(field)
+        if method is None:
+            logger.error('Tried to set unknown field %s with value %s' % (field, pattern))
+            return self, self.copy()
+        return getattr(self, method)(match_type, pattern)
 
-        # self.as_path.check_fsm('filter')
-        original_fsm = self.as_path.as_path_fsm
-        next = copy.deepcopy(self)
-        next.as_path.as_path_fsm = original_fsm
-        # next.as_path.check_fsm('filter deep copy next')
+    def filter_ip_prefix(self, match_type, pattern):
+        if isinstance(pattern, PrefixList):
+            return self.filter_prefix_list(match_type, pattern)
+
+        next = self.copy()
 
         # assume pattern can only be GE, LE or EQUAL. Currently not considering GE and LE at the match
-        if field == RouteAnnouncementFields.IP_PREFIX:
+        self.hit = 0
+        self.drop_next_announcement = 0
+        if log.DEBUG:
+            logger.debug("prefix_mask of ip1 %s" % self.ip_prefix.prefix_mask[0])
+        limit = self.check_ip_range_overlap(self.ip_prefix.prefix_mask, pattern.prefix_mask)
+        if log.DEBUG:
+            logger.debug("prefix_mask_intersect %s" % limit)
+        # no overlaps between two ips, or the pattern to be matched is already in the deny list
+        if limit[0] == -1 or self.check_subset_deny(self.ip_prefix_deny, pattern) == 1:
             self.hit = 0
-            self.drop_next_announcement = 0
-            self.logger.debug("prefix_mask of ip1 %s" % self.ip_prefix.prefix_mask[0])
-            limit = self.check_ip_range_overlap(self.ip_prefix.prefix_mask, pattern.prefix_mask)
-            self.logger.debug("prefix_mask_intersect %s" % limit)
-            # no overlaps between two ips, or the pattern to be matched is already in the deny list
-            if limit[0] == -1 or self.check_subset_deny(self.ip_prefix_deny, pattern) == 1:
-                self.hit = 0
-                self.logger.debug("pattern is a subset of the deny list or no intersection")
-            # if pattern is a superset of the current ip
-            else:
-                if self.check_subset(pattern, self.ip_prefix) == 1:
-                    self.logger.debug("pattern is a superset of the current ip. Pattern: %s | Self: %s" % (pattern, self.ip_prefix))
-                    # no leftovers from current match to be passed to the next
-                    self.drop_next_announcement = 1
-                    if match_type == RouteMapType.PERMIT:
-                        self.hit = 1
-                    else:
-                        self.hit = 0
+            if log.DEBUG:
+                logger.debug("pattern is a subset of the deny list or no intersection")
+        # if pattern is a superset of the current ip
+        else:
+            if self.check_subset(pattern, self.ip_prefix) == 1:
+                if log.DEBUG:
+                    logger.debug("pattern is a superset of the current ip. Pattern: %s | Self: %s" % (pattern, self.ip_prefix))
+                # no leftovers from current match to be passed to the next
+                self.drop_next_announcement = 1
+                if match_type == RouteMapType.PERMIT:
+                    self.hit = 1
+                else:
+                    self.hit = 0
 
-                        # everything is denied
-                elif pattern.prefix_type == FilterType.LE:
-                    self.logger.debug("Entering LE filtering")
-                    # limit = self.check_ip_range_overlap(self.ip_prefix.prefix_mask, pattern.prefix_mask)
-                    if limit[0] == 0:
-                        # both ip ranges are LE type
-                        ip_prefix_intersect = self.check_le_overlap(self.ip_prefix, pattern, limit)
-                        if ip_prefix_intersect != -1:
-                            if match_type == RouteMapType.PERMIT:
-                                self.equal_two_symbolic_ip(self.ip_prefix, ip_prefix_intersect)
-                                self.hit = 1
-                                self.logger.debug("self ip_prefix %s" % self.ip_prefix)
-                            else:
-                                # match_type == denys
-                                self.hit = 1
-                                self.ip_prefix_deny.append(ip_prefix_intersect)
-                                self.logger.debug("Next announcement would deny ip_prefix %s" % ip_prefix_intersect)
-
-                            next.ip_prefix_deny.append(ip_prefix_intersect)
+                    # everything is denied
+            elif pattern.prefix_type == FilterType.LE:
+                if log.DEBUG:
+                    logger.debug("Entering LE filtering")
+                # limit = self.check_ip_range_overlap(self.ip_prefix.prefix_mask, pattern.prefix_mask)
+                if limit[0] == 0:
+                    # both ip ranges are LE type
+                    ip_prefix_intersect = self.check_le_overlap(self.ip_prefix, pattern, limit)
+                    if ip_prefix_intersect != -1:
+                        if match_type == RouteMapType.PERMIT:
+                            self.ip_prefix = self.equal_two_symbolic_ip(self.ip_prefix, ip_prefix_intersect)
+                            self.hit = 1
+                            if log.DEBUG:
+                                logger.debug("self ip_prefix %s" % self.ip_prefix)
                         else:
-                            # no overlap between ip prefix and pattern
-                            self.hit = 0
+                            # match_type == denys
+                            self.hit = 1
+                            self.ip_prefix_deny = self.ip_prefix_deny + [ip_prefix_intersect]
+                            if log.DEBUG:
+                                logger.debug("Next announcement would deny ip_prefix %s" % ip_prefix_intersect)
+
+                        next.ip_prefix_deny = next.ip_prefix_deny + [ip_prefix_intersect]
                     else:
-                        overlap = self.check_ge_le_overlap(self.ip_prefix, pattern, limit)
-                        if overlap == -1:
-                            # need to check up to limit[0] there is no impossible bit, otherwise the two ips don't intersect
-                            # there is no overlap
-                            self.hit = 0
-                        else:
-                            if match_type == RouteMapType.PERMIT:
-                                self.hit = 1
-                                self.equal_two_symbolic_ip(self.ip_prefix, overlap)
-                            # else for deny no need to set ip_hit just add to the deny list
-                            else:
-                                self.hit = 1 # deny
-                                self.ip_prefix_deny.append(overlap)
-                            next.ip_prefix_deny.append(overlap)
-
-                elif pattern.prefix_type == FilterType.GE:
-                    self.logger.debug("Entering GE filtering")
-                    # partially overlap
+                        # no overlap between ip prefix and pattern
+                        self.hit = 0
+                else:
                     overlap = self.check_ge_le_overlap(self.ip_prefix, pattern, limit)
                     if overlap == -1:
+                        # need to check up to limit[0] there is no impossible bit, otherwise the two ips don't intersect
+                        # there is no overlap
                         self.hit = 0
                     else:
                         if match_type == RouteMapType.PERMIT:
                             self.hit = 1
-                            self.equal_two_symbolic_ip(self.ip_prefix, overlap)
-                            self.logger.debug("self.ip_prefix %s should have the same prefix mask as overlap %s" % (self.ip_prefix.prefix_mask, overlap.prefix_mask) )
-                        else:
-                            # set hit to 1 if we want to append it to the output, as long as if its not exactly the same
-                            # deny case
-                            self.hit = 1
-                            self.ip_prefix_deny.append(overlap)
-
-                        next.ip_prefix_deny.append(overlap)
-
-                elif pattern.prefix_type == FilterType.EQUAL:
-                    self.logger.debug("Entering EQUAL filtering")
-                    # check below may not be necessary since ip prefix mask overlap check is passed at the beginning
-                    # could combine equal and GE
-                    if self.ip_prefix.prefix_mask[0] <= pattern.prefix_mask[0] <= self.ip_prefix.prefix_mask[1]:
-                        overlap = self.check_ge_le_overlap(self.ip_prefix, pattern, limit)
-                        if overlap == -1:
-                            self.hit = 0
+                            self.ip_prefix = self.equal_two_symbolic_ip(self.ip_prefix, overlap)
+                        # else for deny no need to set ip_hit just add to the deny list
                         else:
-                            if match_type == RouteMapType.PERMIT:
-                                self.hit = 1
-                                self.equal_two_symbolic_ip(self.ip_prefix, overlap)
-                            else:
-                                self.hit = 1
-                                self.ip_prefix_deny.append(overlap)
-
-                            next.ip_prefix_deny.append(overlap)
-
-        elif field == RouteAnnouncementFields.NEXT_HOP:
-            self.logger.debug('Before: Next hop - %s | Pattern - %s' % (self.next_hop, pattern))
-            self.hit = 0
-            self.drop_next_announcement = 0
-            self.logger.debug("prefix_mask of ip1 %s" % self.next_hop.prefix_mask[0])
-            limit = self.check_ip_range_overlap(self.next_hop.prefix_mask, pattern.prefix_mask)
-            self.logger.debug("prefix_mask_intersect %s" % limit)
-            # no overlaps between two ips, or the pattern to be matched is already in the deny list
-            if limit[0] == -1 or self.check_subset_deny(self.next_hop_deny, pattern) == 1:
-                self.hit = 0
-                self.logger.debug("pattern is a subset of the deny list or no intersection")
-            # if pattern is a superset of the current ip
-            else:
-                if self.check_subset(pattern, self.next_hop) == 1:
-                    self.logger.debug(
-                        "pattern is a superset of the current ip. Pattern: %s | Self: %s" % (pattern, self.next_hop))
-                    # no leftovers from current match to be passed to the next
-                    self.drop_next_announcement = 1
+                            self.hit = 1 # deny
+                            self.ip_prefix_deny = self.ip_prefix_deny + [overlap]
+                        next.ip_prefix_deny = next.ip_prefix_deny + [overlap]
+
+            elif pattern.prefix_type == FilterType.GE:
+                if log.DEBUG:
+                    logger.debug("Entering GE filtering")
+                # partially overlap
+                overlap = self.check_ge_le_overlap(self.ip_prefix, pattern, limit)
+                if overlap == -1:
+                    self.hit = 0
+                else:
                     if match_type == RouteMapType.PERMIT:
                         self.hit = 1
+                        self.ip_prefix = self.equal_two_symbolic_ip(self.ip_prefix, overlap)
+                        if log.DEBUG:
+                            logger.debug("self.ip_prefix %s should have the same prefix mask as overlap %s" % (self.ip_prefix.prefix_mask, overlap.prefix_mask) )
                     else:
-                        self.hit = 0
-                        # everything is denied
+                        # set hit to 1 if we want to append it to the output, as long as if its not exactly the same
+                        # deny case
+                        self.hit = 1
+                        self.ip_prefix_deny = self.ip_prefix_deny + [overlap]
+
+                    next.ip_prefix_deny = next.ip_prefix_deny + [overlap]
 
-                elif pattern.prefix_type == FilterType.GE:
-                    self.logger.debug("Entering GE filtering")
-                    # partially overlap
-                    overlap = self.check_ge_le_overlap(self.next_hop, pattern, limit)
+            elif pattern.prefix_type == FilterType.EQUAL:
+                if log.DEBUG:
+                    logger.debug("Entering EQUAL filtering")
+                # check below may not be necessary since ip prefix mask overlap check is passed at the beginning
+                # could combine equal and GE
+                if self.ip_prefix.prefix_mask[0] <= pattern.prefix_mask[0] <= self.ip_prefix.prefix_mask[1]:
+                    overlap = self.check_ge_le_overlap(self.ip_prefix, pattern, limit)
                     if overlap == -1:
                         self.hit = 0
-                        self.logger.debug("next_hop_hit is a miss")
                     else:
                         if match_type == RouteMapType.PERMIT:
                             self.hit = 1
-                            self.equal_two_symbolic_ip(self.next_hop, overlap)
+                            self.ip_prefix = self.equal_two_symbolic_ip(self.ip_prefix, overlap)
                         else:
-                            # deny case
                             self.hit = 1
-                            self.next_hop_deny.append(overlap)
-
-                        next.next_hop_deny.append(overlap)
-                        self.logger.debug("next hop deny has %d items" % len(next.next_hop_deny))
-
-            self.logger.debug('After: Next hop - %s' % (self.next_hop,))
-            pass
-
-        elif field == RouteAnnouncementFields.MED:
-            deny = 0
-            if len(self.med_deny) > 0:
-                for x in self.med_deny:
-                    if pattern == x:
-                        deny = 1
-                        break
-            if deny == 0 : # also includes the case where len(self.med_deny) == 0
-                if self.med == pattern:
-                    if match_type == RouteMapType.PERMIT:
-                        self.med = pattern
-                        self.hit = 1
-                        self.logger.debug("next.med :%s | self.med %s " % (next.med, self.med))
-                    else:
-                        # deny case
-                        print("Deny hit")
-                        self.hit = 0
-                        self.med_deny.append(pattern)
-                    next.med_deny.append(pattern)
-
-            # if self.med == pattern :
-            #     if match_type == RouteMapType.PERMIT:
-            #         self.med = pattern
-            #         self.hit = 1
-            #     else:
-            #         # deny case
-            #         self.hit = 1
-            #         self.med_deny.append(pattern)
-            #
-            #     self.logger.debug("next.med :%s | self.med %s " % (next.med, self.med))
-            #     # next.med_deny.append(pattern)
-
-            if self.med == 'x' and self.med_deny == []:  # a specific med or fully symbolic route
-                if match_type == RouteMapType.PERMIT:
-                    self.med = pattern
-                    self.hit = 1
-                else:
-                    # deny case
-                    self.hit = 1
-                    self.med_deny.append(pattern)
+                            self.ip_prefix_deny = self.ip_prefix_deny + [overlap]
 
-                self.logger.debug("next.med :%s | self.med %s " % (next.med, self.med))
-                next.med_deny.append(pattern)
+                        next.ip_prefix_deny = next.ip_prefix_deny + [overlap]
 
-        # No matching to local pref
-        # elif field == RouteAnnouncementFields.LOCAL_PREF:
-        #     pass
+        return self, next
 
-        elif field == RouteAnnouncementFields.COMMUNITIES:
-            community_match = self.communities.match_community_values_and(pattern)
-            self.hit = 0
-            self.logger.debug("match_community_value_and : %s" % community_match)
-            zero, zero_position = self.check_zero(community_match, 16)
-            if zero == 1:
-                # match miss
-                self.hit = 0
-            # else:
-            #     # if self.communities.check_community_superset(pattern) == 1:
-            #     #     # pattern is equal to or a superset of current community
-            #     #     self.drop_next_announcement = 1
-            #     #     if match_type == RouteMapType.PERMIT:
-            #     #         self.hit = 1
-            #     #     else:
-            #     #         # deny because pattern is a superset or equal ot
-            #     #         self.hit = 0
-            #     #         # update current list
-            #     # # pattern list is a subset of current pattern, check if its in the deny list
-            elif match_type == RouteMapType.PERMIT:
-                self.hit = 1
-                self.communities.community_bitarray = BitArray(hex=str(community_match))
+    def check_prefix_list(self, pattern):
+        """
+        Returns the deciding entry of the prefix list (None if no entry matches) and its state (see check_entry), the
+        entries whose prefix is in the deny list have been split off already
+        """
+        value, length, lo, hi = PrefixList.get_range(self.ip_prefix)
+        denied = set(ip_prefix.fingerprint() for ip_prefix in self.ip_prefix_deny)
+        for entry in pattern.candidates(value, length):
+            if denied and entry.field.fingerprint() in denied:
+                continue
+            state = PrefixList.check_entry(entry, value, length, lo, hi)
+            if state is not ABSENT:
+                return entry, state
+        return None, ABSENT
+
+    def filter_prefix_list(self, match_type, pattern):
+        """
+        Matches a prefix list with several entries, the announcement has to be split by split_prefix_list before,
+        such that the deciding entry is the same for every prefix it describes. As nothing remains once the list has
+        matched, next is None and the next announcement is dropped then.
+        """
+        entry, state = self.check_prefix_list(pattern)
+        if state is AMBIGUOUS:
+            logger.error("Prefix list %s matched without splitting the announcement first." % (pattern, ))
+            entry = None
+
+        entry_type = entry.type if entry is not None else None
+        self.hit = 1 if (entry_type == RouteMapType.PERMIT) == (match_type == RouteMapType.PERMIT) else 0
+        if self.hit == 1:
+            self.drop_next_announcement = 1
+            return self, None
+        self.drop_next_announcement = 0
+        return self, self.copy()
+
+    def split_prefix_list(self, pattern):
+        """
+        Splits the announcement into disjoint announcements whose prefixes are each decided by the same entry of the
+        prefix list (or by none of them). The entries are visited in a single pass, each part only excludes the
+        entries before it that overlap with it. There is no part for an entry that an entry before it contains.
+        """
+        announcements = list()
+        value, length, lo, hi = PrefixList.get_range(self.ip_prefix)
+        denied = set(ip_prefix.fingerprint() for ip_prefix in self.ip_prefix_deny)
+
+        # index of the entry -> entry, for all entries that have been split off
+        split_entries = dict()
+        for entry in pattern.candidates(value, length):
+            if denied and entry.field.fingerprint() in denied:
+                continue
+            state = PrefixList.check_entry(entry, value, length, lo, hi)
+            if state is ABSENT:
+                continue
+            if state is PRESENT:
+                break
+
+            announcement = self.copy()
+            announcement.ip_prefix = PrefixList.intersect(entry, value, length, lo, hi)
+            part_value, part_length, part_lo, part_hi = PrefixList.get_range(announcement.ip_prefix)
+            overlapping = list()
+            for other in pattern.candidates(part_value, part_length):
+                if other.index not in split_entries:
+                    continue
+                state = PrefixList.check_entry(other, part_value, part_length, part_lo, part_hi)
+                if state is PRESENT:
+                    # an earlier entry contains the whole part, the entry is never reached
+                    break
+                if state is AMBIGUOUS:
+                    overlapping.append(other.field)
             else:
-                # it is a symbolic link at the beginning
-                if self.communities.community_bitarray == BitArray('int:32=-1') and len(self.communities_deny) == 0:
+                if overlapping:
+                    announcement.ip_prefix_deny = self.ip_prefix_deny + overlapping
+                announcements.append(announcement)
+
+            split_entries[entry.index] = entry
+
+        remaining = self.copy()
+        if split_entries:
+            remaining.ip_prefix_deny = self.ip_prefix_deny + [entry.field for _, entry in sorted(split_entries.items())]
+        announcements.append(remaining)
+        return announcements
+
+    def filter_next_hop(self, match_type, pattern):
+        next = self.copy()
+
+        if log.DEBUG:
+            logger.debug('Before: Next hop - %s | Pattern - %s' % (self.next_hop, pattern))
+        self.hit = 0
+        self.drop_next_announcement = 0
+        if log.DEBUG:
+            logger.debug("prefix_mask of ip1 %s" % self.next_hop.prefix_mask[0])
+        limit = self.check_ip_range_overlap(self.next_hop.prefix_mask, pattern.prefix_mask)
+        if log.DEBUG:
+            logger.debug("prefix_mask_intersect %s" % limit)
+        # no overlaps between two ips, or the pattern to be matched is already in the deny list
+        if limit[0] == -1 or self.check_subset_deny(self.next_hop_deny, pattern) == 1:
+            self.hit = 0
+            if log.DEBUG:
+                logger.debug("pattern is a subset of the deny list or no intersection")
+        # if pattern is a superset of the current ip
+        else:
+            if self.check_subset(pattern, self.next_hop) == 1:
+                if log.DEBUG:
+                    logger.debug(
+                                 "pattern is a superset of the current ip. Pattern: %s | Self: %s" % (pattern, self.next_hop))
+                # no leftovers from current match to be passed to the next
+                self.drop_next_announcement = 1
+                if match_type == RouteMapType.PERMIT:
                     self.hit = 1
-                    self.communities_deny.append(pattern) # deny list is [16:1, 16:2]
-                    self.logger.debug("Deny community pattern: %s and self.hit is %s" % (pattern, self.hit))
                 else:
                     self.hit = 0
-            next.communities_deny.append(pattern)
-
-        elif field == RouteAnnouncementFields.AS_PATH:
-            # check if pattern is disjoint from the current as_path
-            self.hit = 0
-            pattern_regex = parse(pattern)
-
-            pattern_fsm = pattern_regex.to_fsm()
-            # comment it out for performance testing purpose
-            # try:
-            #     regex = lego.from_fsm(self.as_path.as_path_fsm)
-            #     print("self.self.as_path.as_path_fsm converts to regex" % regex)
-            # except Exception:
-            #     print ("unable to produce a regex from current self.as_path.as_path_fsm")
-            self.logger.debug("as path ' 3 4 ' is contained in the self as path fsm %s" % self.as_path.as_path_fsm.accepts(" 3 4 "))
-
-            if pattern_fsm.isdisjoint(self.as_path.as_path_fsm):
-                self.hit = 0
-                self.logger.debug("no overlap between current as path and pattern")
-            else:
-                intersect_fsm = self.as_path.as_path_fsm.intersection(pattern_fsm)
-                if pattern_fsm.issuperset(self.as_path.as_path_fsm) is True:
-                    self.logger.debug("current pattern is a superset of current as path fsm")
-                    self.drop_next_announcement = 1
+                    # everything is denied
+
+            elif pattern.prefix_type == FilterType.GE:
+                if log.DEBUG:
+                    logger.debug("Entering GE filtering")
+                # partially overlap
+                overlap = self.check_ge_le_overlap(self.next_hop, pattern, limit)
+                if overlap == -1:
+                    self.hit = 0
+                    if log.DEBUG:
+                        logger.debug("next_hop_hit is a miss")
+                else:
                     if match_type == RouteMapType.PERMIT:
                         self.hit = 1
+                        self.next_hop = self.equal_two_symbolic_ip(self.next_hop, overlap)
                     else:
-                        self.hit = 0
-                else:
-                    if match_type == RouteMapType.PERMIT:
+                        # deny case
                         self.hit = 1
-                        if self.as_path.as_path_fsm.issuperset(pattern_fsm):
-                            self.logger.debug("current as path is a supperset of matching pattern")
+                        self.next_hop_deny = self.next_hop_deny + [overlap]
 
-                        self.as_path.as_path_fsm = intersect_fsm
-                        self.as_path.update_regex()
+                    next.next_hop_deny = next.next_hop_deny + [overlap]
+                    if log.DEBUG:
+                        logger.debug("next hop deny has %d items" % len(next.next_hop_deny))
 
-                    else:
-                        # deny case, update as path fsm to be the difference of patter
-                        self.hit = 1
-                        # should be the same as setting self.as_path.as_path_fsm.difference(intersect_fsm)
-                        self.as_path.as_path_fsm = self.as_path.as_path_fsm.difference(pattern_fsm)
-                        self.as_path.update_regex()
-                    # next.as_path.check_fsm('next announcement')
-                    next.as_path.as_path_fsm = self.as_path.as_path_fsm.difference(pattern_fsm)
+        if log.DEBUG:
+            logger.debug('After: Next hop - %s' % (self.next_hop,))
+        pass
+
+        return self, next
+
+    def filter_med(self, match_type, pattern):
+        return self.filter_metric('med', match_type, pattern)
+
+    def filter_local_pref(self, match_type, pattern):
+        return self.filter_metric('local_pref', match_type, pattern)
+
+    def filter_metric(self, attribute, match_type, pattern):
+        """
+        Matches the MED or local pref (attribute) against a value or an IntervalSet. The values that are matched by a
+        permit (or not matched by a deny) stay with this announcement, the others are passed on in next. If nothing
+        remains for the next match, next is None and the next announcement is dropped.
+        """
+        values = getattr(self, attribute)
+        if not isinstance(pattern, IntervalSet):
+            pattern = IntervalSet.point(int(pattern), METRIC_END)
 
-                    next.as_path.update_regex()
-                self.logger.debug("self.drop_next_announcement %s" % self.drop_next_announcement)
+        matched = values.intersection(pattern)
+        rest = values.difference(pattern)
+        if match_type != RouteMapType.PERMIT:
+            matched, rest = rest, matched
 
+        if log.DEBUG:
+            logger.debug("%s: %s | pattern: %s | matched: %s | rest: %s", attribute, values, pattern, matched, rest)
+
+        next = self.copy()
+        if matched.is_empty():
+            self.hit = 0
+            self.drop_next_announcement = 0
+            return self, next
+
+        self.hit = 1
+        setattr(self, attribute, matched)
+        if rest.is_empty():
+            self.drop_next_announcement = 1
+            return self, None
+
+        self.drop_next_announcement = 0
+        setattr(next, attribute, rest)
+        return self, next
+
+    def filter_communities(self, match_type, pattern):
+        if isinstance(pattern, CommunityList):
+            return self.filter_community_list(match_type, pattern)
+
+        next = self.copy()
+
+        community_match = self.communities.match_community_values_and(pattern)
+        self.hit = 0
+        if log.DEBUG:
+            logger.debug("match_community_value_and : %s", community_match)
+        if community_match.has_impossible():
+            # match miss
+            self.hit = 0
+        # else:
+        #     # if self.communities.check_community_superset(pattern) == 1:
+        #     #     # pattern is equal to or a superset of current community
+        #     #     self.drop_next_announcement = 1
+        #     #     if match_type == RouteMapType.PERMIT:
+        #     #         self.hit = 1
+        #     #     else:
+        #     #         # deny because pattern is a superset or equal ot
+        #     #         self.hit = 0
+        #     #         # update current list
+        #     # # pattern list is a subset of current pattern, check if its in the deny list
+        elif match_type == RouteMapType.PERMIT:
+            self.hit = 1
+            self.communities = self.communities.copy()
+            self.communities.community_vector = community_match
         else:
-            self.logger.error('Tried to set unknown field %s with value %s' % (field, pattern))
+            # it is a symbolic link at the beginning
+            if self.communities.is_wildcard() and len(self.communities_deny) == 0:
+                self.hit = 1
+                self.communities_deny = self.communities_deny + [pattern] # deny list is [16:1, 16:2]
+                if log.DEBUG:
+                    logger.debug("Deny community pattern: %s and self.hit is %s" % (pattern, self.hit))
+            else:
+                self.hit = 0
+        next.communities_deny = next.communities_deny + [pattern]
+
+        return self, next
+
+    def filter_community_list(self, match_type, pattern):
+        """
+        Matches a community list with several entries, the first entry whose communities are all carried by the
+        announcement decides. The announcement has to be split by split_community_list before, such that the entry
+        is the same for every route it describes. As nothing remains once the list has matched, next is None and the
+        next announcement is dropped then.
+        """
+        entry_type = self.communities.match_community_list(pattern, self.communities_deny)
+        if entry_type is AMBIGUOUS:
+            logger.error("Community list %s matched without splitting the announcement first." % (pattern, ))
+            entry_type = None
+
+        self.hit = 1 if (entry_type == RouteMapType.PERMIT) == (match_type == RouteMapType.PERMIT) else 0
+        if self.hit == 1:
+            self.drop_next_announcement = 1
+            return self, None
+        self.drop_next_announcement = 0
+        return self, self.copy()
+
+    def split_community_list(self, pattern):
+        """
+        Splits the announcement into disjoint announcements that are each decided by the same entry of the community
+        list (or by none of them): the i-th carries the communities of the i-th entry, but not all of those of the
+        entries before.
+        """
+        announcements = list()
+        remaining = self
+        for entry_type, communities in pattern.entries:
+            state = remaining.communities.check_community_entry(communities, remaining.communities_deny)
+            if state is ABSENT:
+                continue
+            if state is PRESENT:
+                announcements.append(remaining)
+                return announcements
+
+            announcement = remaining.copy()
+            announcement.communities = remaining.communities.copy()
+            announcement.communities.community_vector = remaining.communities.match_community_values_and(communities)
+            announcements.append(announcement)
+
+            remaining = remaining.copy()
+            remaining.communities_deny = remaining.communities_deny + [communities]
+
+        announcements.append(remaining)
+        return announcements
+
+    def filter_as_path(self, match_type, pattern):
+        next = self.copy()
+
+        # check if pattern is disjoint from the current as_path
+        self.hit = 0
+        # the pattern is compiled only once, all automata come from (and are cached by) the fsm store
+        pattern_fsm = fsm_store.compile(pattern)
+        # comment it out for performance testing purpose
+        # try:
+        #     regex = lego.from_fsm(self.as_path.as_path_fsm)
+        #     print("self.self.as_path.as_path_fsm converts to regex" % regex)
+        # except Exception:
+        #     print ("unable to produce a regex from current self.as_path.as_path_fsm")
+        if log.DEBUG:
+            logger.debug("as path ' 3 4 ' is contained in the self as path fsm %s" % self.as_path.as_path_fsm.accepts(" 3 4 "))
+
+        if fsm_store.isdisjoint(pattern_fsm, self.as_path.as_path_fsm):
+            self.hit = 0
+            if log.DEBUG:
+                logger.debug("no overlap between current as path and pattern")
+        else:
+            if fsm_store.issuperset(pattern_fsm, self.as_path.as_path_fsm) is True:
+                if log.DEBUG:
+                    logger.debug("current pattern is a superset of current as path fsm")
+                self.drop_next_announcement = 1
+                if match_type == RouteMapType.PERMIT:
+                    self.hit = 1
+                else:
+                    self.hit = 0
+            else:
+                if match_type == RouteMapType.PERMIT:
+                    self.hit = 1
+                    if fsm_store.issuperset(self.as_path.as_path_fsm, pattern_fsm):
+                        if log.DEBUG:
+                            logger.debug("current as path is a supperset of matching pattern")
+
+                    intersect_fsm = fsm_store.intersection(self.as_path.as_path_fsm, pattern_fsm)
+                    self.as_path = self.as_path.derive(intersect_fsm)
+
+                else:
+                    # deny case, update as path fsm to be the difference of patter
+                    self.hit = 1
+                    # should be the same as setting self.as_path.as_path_fsm.difference(intersect_fsm)
+                    self.as_path = self.as_path.derive(fsm_store.difference(self.as_path.as_path_fsm, pattern_fsm))
+                next.as_path = next.as_path.derive(fsm_store.difference(self.as_path.as_path_fsm, pattern_fsm))
+            if log.DEBUG:
+                logger.debug("self.drop_next_announcement %s" % self.drop_next_announcement)
 
         return self, next
 
 
 class AsPath(object):
+    __slots__ = ('as_path_list', 'as_path_fsm')
+
     def __init__(self, regex=None):
         self.as_path_list = list()
-        if regex:
-            self.as_path_regex = parse(regex)
-        else:
+        if not regex:
             # represent any pattern
-            self.as_path_regex = parse(".*")
+            regex = ".*"
 
-        self.as_path_fsm = self.as_path_regex.to_fsm()
-        # print ("initialize as path fsm from regex %s" % self.as_path_regex)
+        # only the automaton is kept, the regex is derived from it on demand
+        self.as_path_fsm = fsm_store.compile(regex)
         # print ("initialized as path fsm accepts ' 3 4' %s" % self.as_path_fsm.accepts(" 3 4 "))
 
-        self. as_path_regex_outdated = False
+    @property
+    def as_path_regex(self):
+        return fsm_store.get_regex(self.as_path_fsm)
 
     def check_fsm(self, caller='main'):
+        regex = self.as_path_regex
+        if regex is None:
+            debug("%s as path fsm has no regex that could be reconstructed" % caller)
+            return
         debug ("%s as path fsm is the corresponding fsm to the regex %s"
-               % (caller, self.as_path_fsm.equivalent(self.as_path_regex.to_fsm())))
+               % (caller, self.as_path_fsm.equivalent(regex.to_fsm())))
+
+    def copy(self):
+        clone = AsPath.__new__(AsPath)
+        clone.as_path_list = self.as_path_list
+        clone.as_path_fsm = self.as_path_fsm
+        return clone
+
+    def fingerprint(self):
+        return fsm_store.get_id(self.as_path_fsm), freeze(self.as_path_list)
+
+    def derive(self, fsm):
+        # as paths are shared between announcements, a new automaton always goes into a new object
+        as_path = self.copy()
+        as_path.as_path_fsm = fsm
+        return as_path
 
     def prepend_as_path(self, element):
         new_list = [element] + self.as_path_list
         self.as_path_list = new_list[:]
 
-    def update_regex(self):
-        # self.as_path_regex_outdated = False
-        try:
-            self.as_path_regex = lego.from_fsm(self.as_path_fsm)
-            self.as_path_regex_outdated = False
-        except RuntimeError:
-            self.as_path_regex_outdated = True
+    def __str__(self):
+        if self.as_path_fsm.empty():
+            return "as path list: %s, no as paths" % self.as_path_list
+
+        regex = self.as_path_regex
+        if regex is not None:
+            return "as path list: %s, as path regex: %s" % (self.as_path_list, regex)
+
+        # the regex is too expensive to reconstruct, show some of the accepted as paths instead
+        return "as path list: %s, sample as paths: %s" % (self.as_path_list, fsm_store.get_samples(self.as_path_fsm))
+
+
+# communities tuple -> CommunityUniverse, announcements over the same communities share the universe
+community_universes = dict()
+
+
+def get_community_universe(communities):
+    communities = tuple(communities)
+    universe = community_universes.get(communities)
+    if universe is None:
+        universe = CommunityUniverse(communities)
+        community_universes[communities] = universe
+    return universe
+
+
+class CommunityUniverse(object):
+    """
+    All the communities that can appear in a network, every community is assigned a position in the community vectors.
+    The masks of the community lists used in route maps are computed once and cached.
+    """
+
+    def __init__(self, communities):
+        self.communities = tuple(communities)
+        self.length = len(self.communities)
+        self.positions = dict((community, i) for i, community in enumerate(self.communities))
+        self.masks = dict()
+
+    def __reduce__(self):
+        # unpickling returns the universe of the process, such that announcements can keep comparing universes by id
+        return get_community_universe, (self.communities, )
+
+    def __len__(self):
+        return self.length
+
+    def mask(self, communities):
+        """
+        Returns an integer with the bits of the communities set (position 0 is the most significant bit of the vector)
+        """
+        key = tuple(communities)
+        mask = self.masks.get(key)
+        if mask is None:
+            mask = 0
+            for community in key:
+                mask |= 1 << (self.length - 1 - self.positions[community])
+            self.masks[key] = mask
+        return mask
+
+    def deny_masks(self, communities_deny):
+        return set(self.mask(communities) for communities in communities_deny)
+
+
+# states of a community list entry with respect to a community vector
+PRESENT = 'present'
+ABSENT = 'absent'
+AMBIGUOUS = 'ambiguous'
+
+
+class CommunityList(object):
+    """
+    Pattern of a community list with several entries, a list of (permit or deny, communities). The communities of an
+    entry are ANDed, the entries are ORed: the first entry whose communities are all carried decides.
+    """
+
+    def __init__(self, entries):
+        self.entries = [(entry_type, list(communities)) for entry_type, communities in entries]
+
+    def fingerprint(self):
+        return tuple((entry_type, tuple(communities)) for entry_type, communities in self.entries)
+
+    def split(self, announcement):
+        return announcement.split_community_list(self)
 
-    # TODO figure out how to print sample as paths
     def __str__(self):
-        print("as path list is: %s" % self.as_path_list)
-        if self.as_path_fsm.empty() is False:
-            print("As path regex contains non-zero as paths")
-            try:
-                if self.as_path_regex_outdated is True:
-                    print(lego.from_fsm(self.as_path_fsm))
-                else:
-                    print(self.as_path_regex)
-            except RuntimeError:
-                print("regex is not reducible or printable, try testing as paths with fsm.accepts()")
+        return ' | '.join('%s %s' % (entry_type, ' '.join(communities)) for entry_type, communities in self.entries)
 
 
-class Community(object):
-    def __init__(self, AS_community_list):
-        self.community_bitarray = BitArray('int:32=-1')
+# an entry of a prefix list: the prefixes of a length in [lo, hi] that lie within value/length (field is the same as
+# a symbolic prefix), index is the position of the entry in the list
+PrefixListEntry = namedtuple('PrefixListEntry', ('index', 'type', 'value', 'length', 'lo', 'hi', 'field'))
 
-        self.AS_community_list = AS_community_list[:]
 
-        # self.logger = get_logger('Community', 'DEBUG')
+class PrefixTrieNode(object):
+    __slots__ = ('children', 'entries')
 
-    def match_community_values_and(self, match_list):  # match_list = ['16:1', '16:8']
-        match_bit_string = BitArray('int:32=-1')
+    def __init__(self):
+        self.children = [None, None]
+        self.entries = list()
 
-        match_item_index = list()
-        for i in match_list:
-            # represent the position of the second bit of '10'
-            match_item_index.append(self.AS_community_list.index(i) * 2 + 1)
 
-        # setting second bit to '0' to represent the match items and leave the first bit to 1
-        match_bit_string.set(False, match_item_index)
+class PrefixList(object):
+    """
+    Pattern of a prefix list with several entries (or ge and le at the same time). Every entry describes the prefixes
+    of a length in [lo, hi] that lie within value/length, the first entry that contains a prefix decides. The entries
+    are stored in a binary trie over the prefix bits, such that the entries that overlap with a (symbolic) prefix are
+    found in a single traversal.
+    """
 
-        # carry out AND operation between current bitstring and match items
-        and_match_bit_string = match_bit_string & self.community_bitarray
+    def __init__(self, entries):
+        # entries is a list of (permit or deny, prefix, ge, le) in the order of the sequence numbers, they are kept as
+        # PrefixListEntry
+        self.entries = list()
+        self.root = PrefixTrieNode()
+        for index, (entry_type, str_prefix, ge, le) in enumerate(entries):
+            field = SymbolicField.create_from_prefix(str_prefix, RouteAnnouncementFields.IP_PREFIX)
+            length = field.prefixlen
+            lo = int(ge) if ge else length
+            hi = int(le) if le else (32 if ge else length)
+
+            field.prefix_mask = [lo, hi]
+            field.prefix_type = FilterType.EQUAL if lo == hi else FilterType.GE
+
+            entry = PrefixListEntry(index, entry_type, field.ternary.prefix_value(length), length, lo, hi, field)
+            self.entries.append(entry)
+
+            node = self.root
+            for bit in range(length):
+                branch = (entry.value >> (31 - bit)) & 1
+                if node.children[branch] is None:
+                    node.children[branch] = PrefixTrieNode()
+                node = node.children[branch]
+            node.entries.append(entry)
+
+    def fingerprint(self):
+        return tuple((entry.type, entry.value, entry.length, entry.lo, entry.hi) for entry in self.entries)
+
+    def split(self, announcement):
+        return announcement.split_prefix_list(self)
 
-        # returns a bit string
-        return and_match_bit_string
+    def __str__(self):
+        return ' | '.join('%s %s ge %d le %d' % (entry.type, entry.field.str_ip_prefix, entry.lo, entry.hi)
+                          for entry in self.entries)
+
+    def candidates(self, value, length):
+        """
+        Returns the entries whose prefix is on the path to value/length or below it, in the order of the list
+        """
+        entries = list()
+        node = self.root
+        for bit in range(length):
+            entries.extend(node.entries)
+            node = node.children[(value >> (31 - bit)) & 1]
+            if node is None:
+                break
+        else:
+            nodes = [node]
+            while nodes:
+                node = nodes.pop()
+                entries.extend(node.entries)
+                nodes.extend(child for child in node.children if child is not None)
 
-    def set_community_values_and(self, set_list):  # set_list = ['16:1', '16:2']
+        entries.sort()
+        return entries
+
+    @staticmethod
+    def get_range(ip_prefix):
+        # value/length and the range of prefix lengths that the symbolic prefix describes, the prefix ends at the first
+        # wildcard bit (prefixlen is not maintained for the fully symbolic prefix)
+        length = ip_prefix.ternary.first_wildcard()
+        return ip_prefix.ternary.prefix_value(length), length, max(ip_prefix.prefix_mask[0], length), \
+            ip_prefix.prefix_mask[1]
+
+    @staticmethod
+    def check_entry(entry, value, length, lo, hi):
+        """
+        Returns whether all the prefixes of value/length with a length in [lo, hi] are in the entry (PRESENT), none
+        of them (ABSENT) or some of them (AMBIGUOUS)
+        """
+        shift = 32 - min(length, entry.length)
+        if value >> shift != entry.value >> shift:
+            return ABSENT
+        if max(lo, entry.lo, entry.length) > min(hi, entry.hi):
+            return ABSENT
+        if entry.length <= length and entry.lo <= lo and hi <= entry.hi:
+            return PRESENT
+        return AMBIGUOUS
+
+    @staticmethod
+    def intersect(entry, value, length, lo, hi):
+        """
+        Returns the symbolic prefix of the prefixes of value/length with a length in [lo, hi] that are in the entry
+        """
+        if entry.length > length:
+            value, length = entry.value, entry.length
+        lo = max(lo, entry.lo, length)
+        hi = min(hi, entry.hi)
 
-        set_item_index_true = list()
-        set_item_index_false = list()
-        for i in set_list:
-            set_item_index_true.append(self.AS_community_list.index(i) * 2)
-            set_item_index_false.append(self.AS_community_list.index(i) * 2 +1)
+        ip_prefix = SymbolicField.create_from_int(value, length, RouteAnnouncementFields.IP_PREFIX)
+        ip_prefix.prefix_mask = [lo, hi]
+        ip_prefix.prefix_type = FilterType.EQUAL if lo == hi else FilterType.GE
+        return ip_prefix
 
-        self.community_bitarray.set(True, set_item_index_true)
-        self.community_bitarray.set(False, set_item_index_false)
+
+class Community(object):
+    """
+    The communities of an announcement as a ternary vector with one position per community of the universe: 1 if the
+    announcement carries the community, 0 if it does not and * if it might (see TernaryVector)
+    """
+
+    __slots__ = ('universe', 'community_vector')
+
+    def __init__(self, AS_community_list):
+        self.universe = get_community_universe(AS_community_list)
+        self.community_vector = TernaryVector.wildcard(len(self.universe))
+
+    @property
+    def AS_community_list(self):
+        return list(self.universe.communities)
+
+    def copy(self):
+        # the vector is never changed in place, so the copy can share it (and the universe)
+        clone = Community.__new__(Community)
+        clone.universe = self.universe
+        clone.community_vector = self.community_vector
+        return clone
+
+    def fingerprint(self):
+        return self.community_vector, id(self.universe)
+
+    def is_wildcard(self):
+        return self.community_vector == TernaryVector.wildcard(len(self.universe))
+
+    def covers(self, other):
+        """
+        Returns True if every combination of communities allowed by the other vector is also allowed by this one
+        """
+        if self.universe is not other.universe:
+            return False
+        vector, other_vector = self.community_vector, other.community_vector
+        return (vector.ones | other_vector.ones) == vector.ones and (vector.zeros | other_vector.zeros) == vector.zeros
+
+    def match_community_values_and(self, match_list):  # match_list = ['16:1', '16:8']
+        # the matched communities have to be present, i.e., they cannot be 0 anymore
+        mask = self.universe.mask(match_list)
+        vector = self.community_vector
+        return TernaryVector(vector.length, vector.ones, vector.zeros & ~mask)
+
+    def check_community_entry(self, communities, communities_deny):
+        """
+        Returns whether all the communities are PRESENT in every route of the vector, ABSENT (at least one of them)
+        in every route or AMBIGUOUS. The deny list holds community lists that are not carried (all together).
+        """
+        mask = self.universe.mask(communities)
+        vector = self.community_vector
+        if mask & ~vector.ones:
+            return ABSENT
+        # a route that carries all the communities also carries every denied list that is a subset of them
+        if communities_deny and any(deny_mask & ~mask == 0 for deny_mask in self.universe.deny_masks(communities_deny)):
+            return ABSENT
+        if mask & vector.zeros:
+            return AMBIGUOUS
+        return PRESENT
+
+    def match_community_list(self, community_list, communities_deny):
+        """
+        Returns the type of the entry of the community list that decides for the vector, None if no entry matches and
+        AMBIGUOUS if the entry depends on the route
+        """
+        for entry_type, communities in community_list.entries:
+            state = self.check_community_entry(communities, communities_deny)
+            if state is PRESENT:
+                return entry_type
+            if state is AMBIGUOUS:
+                return AMBIGUOUS
+        return None
+
+    def set_community_values_and(self, set_list):  # set_list = ['16:1', '16:2']
+        mask = self.universe.mask(set_list)
+        vector = self.community_vector
+        self.community_vector = TernaryVector(vector.length, vector.ones | mask, vector.zeros & ~mask)
 
     def check_community_superset(self, pattern_list): # check if pattern is superset of self community
-        self_community_list = self.hsa_convert_to_list(self.community_bitarray)
+        self_community_list = self.hsa_convert_to_list()
         if set(self_community_list).issubset(pattern_list):
             return 1
         else:
             return 0
 
     def hsa_convert_to_list(self):
-        contained_communities = list()
-        for i in range(16):
-            if (self.community_bitarray[i * 2] is True) and (self.community_bitarray[i * 2 + 1] is False):
-                contained_communities.append(self.AS_community_list[i])
-        return contained_communities
-
-
+        contained = self.community_vector.ones & ~self.community_vector.zeros
+        length = len(self.universe)
+        return [community for i, community in enumerate(self.universe.communities) if (contained >> (length - 1 - i)) & 1]
 
     def __str__(self):
-        contained_communities = list()
-        for i in range(16):
-            if (self.community_bitarray[i*2] is True) and (self.community_bitarray[i*2 +1] is False):
-                contained_communities.append(self.AS_community_list[i])
-
-        return ','.join(contained_communities)
+        return ','.join(self.hsa_convert_to_list())
 
 
 class SymbolicField(object):
-    def __init__(self, field_type, length):
-        # TODO efficiently detect if there is an impossible bit in the bitarray
+    __slots__ = ('field_type', 'ternary', 'str_ip_prefix', 'prefix_mask', 'prefix_type', 'prefixlen')
 
-        self.logger = get_logger('SymbolicField', 'DEBUG')
-        self.logger.disabled = True
+    def __init__(self, field_type, length):
         self.field_type = field_type
         #self.original_length = length
-        # initialize BitArray to all 1s
-        self.bitarray = BitArray('int:%d=-1' % (2*32, ))
+        # initialize all bits to wildcards
+        self.ternary = TernaryVector.wildcard(length)
         if field_type == RouteAnnouncementFields.IP_PREFIX or field_type == RouteAnnouncementFields.NEXT_HOP:
             self.str_ip_prefix = '0.0.0.0/0'
             self.prefix_mask = [0, 32]
             self.prefix_type = FilterType.GE
             self.prefixlen = 32
+        else:
+            self.str_ip_prefix = None
+            self.prefix_mask = None
+            self.prefix_type = None
+            self.prefixlen = None
 
-        # we use twice the length as we want to represent every bit by 2 bits to additionally allow
-        # for wildcard and impossible bits
-        # Z -> 00 > impossible bit
-        # 0 -> 01 > 0 bit
-        # 1 -> 10 > 1 bit
-        # * -> 11 > wildcard bit
+        # every bit is a ternary bit that additionally allows for wildcard and impossible bits
+        # (see TernaryVector for the encoding)
 
     def __len__(self):
-        return len(self.bitarray)
+        return len(self.ternary)
+
+    def copy(self):
+        clone = SymbolicField.__new__(SymbolicField)
+        clone.field_type = self.field_type
+        clone.ternary = self.ternary
+        clone.str_ip_prefix = self.str_ip_prefix
+        clone.prefix_mask = self.prefix_mask
+        clone.prefix_type = self.prefix_type
+        clone.prefixlen = self.prefixlen
+        return clone
 
     def __deepcopy__(self, memo):
-        return deepcopy_with_sharing(self, shared_attribute_names=['logger'], memo=memo)
+        return self.copy()
+
+    def fingerprint(self):
+        return (self.field_type, self.ternary, self.prefixlen, tuple(self.prefix_mask), self.prefix_type,
+                self.str_ip_prefix)
 
     def __str__(self):
-        if self.field_type == RouteAnnouncementFields.IP_PREFIX or self.field_type == RouteAnnouncementFields.NEXT_HOP:  # convert HSA bit array to human-readable ip-prefix
-            fip = self.bitarray
-
-            ip_prefix = ''
-            prefix_len = 32
-            for i in range(0, 32):
-                # Z -> 00
-                if not fip[2 * i] and not fip[2 * i + 1]:
-                    print('ERROR: invalid bit found')
-                # 0 -> 01
-                elif not fip[2 * i] and fip[2 * i + 1]:
-                    ip_prefix += '0'
-                # 1 -> 10
-                elif fip[2 * i] and not fip[2 * i + 1]:
-                    ip_prefix += '1'
-                else:
-                    #  map 11 t0 wildcard character 0
-                    prefix_len = i
-                    ip_prefix += '0' * (32 - prefix_len)
-                    break
+        if self.field_type == RouteAnnouncementFields.IP_PREFIX or self.field_type == RouteAnnouncementFields.NEXT_HOP:  # convert ternary vector to human-readable ip-prefix
+            fip = self.ternary
 
-            prefix = '%s/%d' % ('.'.join(['%d' % int('0b%s' % ip_prefix[j * 8:(j + 1) * 8], 2) for j in range(0, 4)]), prefix_len)
-            return prefix
+            # the prefix ends at the first wildcard bit
+            prefix_len = fip.first_wildcard()
+            if fip.first_impossible() < prefix_len:
+                print('ERROR: invalid bit found')
 
-        else:
-            return str(self.bitarray)
+            return self.format_ip_prefix(fip.prefix_value(prefix_len), prefix_len)
 
+        else:
+            return str(self.ternary)
 
+    @staticmethod
+    def format_ip_prefix(ip_value, prefixlen):
+        return '%d.%d.%d.%d/%d' % ((ip_value >> 24) & 0xff, (ip_value >> 16) & 0xff, (ip_value >> 8) & 0xff,
+                                   ip_value & 0xff, prefixlen)
 
-    def ip_str_of_smaller_prefix_len(self, ip2):
-        self.logger.debug("comparing two prefixes, prefix_mask 1: %s and prefix_mask2: %s and ip2.str_ip_prefix is %s" % (self.prefix_mask, ip2.prefix_mask, ip2.str_ip_prefix))
+    def ip_of_smaller_prefix_len(self, ip2):
+        if log.DEBUG:
+            logger.debug("comparing two prefixes, prefix_mask 1: %s and prefix_mask2: %s and ip2.str_ip_prefix is %s" % (self.prefix_mask, ip2.prefix_mask, ip2.str_ip_prefix))
         if self.prefix_mask[1] < ip2.prefix_mask[1]:
-            return self.str_ip_prefix
+            return self
         else:
-            return ip2.str_ip_prefix
+            return ip2
 
     @staticmethod
     def create_from_prefix(str_ip_prefix, type):
-        logger = get_logger('SymbolicField_create_from_prefix', 'DEBUG')
-        logger.disabled = True
         ip_prefix = IPNetwork(str_ip_prefix)
-        logger.debug('create from prefix: ip prefix object is - %s and prefix length - %s' % (ip_prefix, ip_prefix.prefixlen))
-
-        # take binary representation of prefix without the leading '0b'
-        bin_ip_prefix = ip_prefix.ip.bin[2:]
-        logger.debug('bin_ip_prefix - %s and length is %s' % (bin_ip_prefix, len(bin_ip_prefix)))
-        if len(bin_ip_prefix) < 32:
-            bin_ip_prefix = '0' * (32-len(bin_ip_prefix)) + bin_ip_prefix
-
-        # create a new bitstring by translating bits to the four bit representation
-        formatted_ip_prefix_bin = '0b'
-        for i in range(0, ip_prefix.prefixlen):
-            if bin_ip_prefix[i] == '1':
-                formatted_ip_prefix_bin += '10'
-            else:
-                formatted_ip_prefix_bin += '01'
-
-        # fill the end with wildcard bits
-        formatted_ip_prefix_bin += '11' * (32 - ip_prefix.prefixlen)
-        logger.debug('Convert ip prefix to HSA representation %s and there are %s wildcards' % (formatted_ip_prefix_bin,
-                                                                                                (32-ip_prefix.prefixlen)))
-        # convert an ip to a bit-array
-        if type == RouteAnnouncementFields.IP_PREFIX:
-            symbolic_field = SymbolicField(RouteAnnouncementFields.IP_PREFIX, 32)
-            # symbolic bit array is 1111111 wild cards AND with specified ip-converted bit array
-        elif type == RouteAnnouncementFields.NEXT_HOP:
-            symbolic_field = SymbolicField(RouteAnnouncementFields.NEXT_HOP, 32)
-        symbolic_field.bitarray &= BitArray(formatted_ip_prefix_bin)
-
-        symbolic_field.prefixlen = ip_prefix.prefixlen
-        symbolic_field.str_ip_prefix = str_ip_prefix
-        # print('symbolic_field.bitarray is %s and bitarray_mask length is %s' % (symbolic_field.bitarray,
-        #                                                                                symbolic_field.prefixlen))
-        return symbolic_field
-
-
-def deepcopy_with_sharing(obj, shared_attribute_names, memo=None):
-    '''
-    Deepcopy an object, except for a given list of attributes, which should
-    be shared between the original object and its copy.
+        if log.DEBUG:
+            logger.debug('create from prefix: ip prefix object is - %s and prefix length - %s' % (ip_prefix, ip_prefix.prefixlen))
 
-    obj is some object
-    shared_attribute_names: A list of strings identifying the attributes that
-        should be shared between the original and its copy.
-    memo is the dictionary passed into __deepcopy__.  Ignore this argument if
-        not calling from within __deepcopy__.
-    '''
-    assert isinstance(shared_attribute_names, (list, tuple))
-    shared_attributes = {k: getattr(obj, k) for k in shared_attribute_names}
+        # the first prefixlen bits are taken from the address, the rest are wildcard bits
+        ternary = TernaryVector.from_prefix(int(ip_prefix.ip), ip_prefix.prefixlen)
 
-    if hasattr(obj, '__deepcopy__'):
-        # Do hack to prevent infinite recursion in call to deepcopy
-        deepcopy_method = obj.__deepcopy__
-        obj.__deepcopy__ = None
+        return SymbolicField.create_from_ternary(ternary, ip_prefix.prefixlen, str_ip_prefix, type)
 
-    for attr in shared_attribute_names:
-        del obj.__dict__[attr]
-
-    clone = copy.deepcopy(obj)
-
-    for attr, val in shared_attributes.items():
-        setattr(obj, attr, val)
-        setattr(clone, attr, val)
+    @staticmethod
+    def create_from_int(ip_value, prefixlen, type):
+        ternary = TernaryVector.from_prefix(ip_value, prefixlen)
 
-    if hasattr(obj, '__deepcopy__'):
-        # Undo hack
-        obj.__deepcopy__ = deepcopy_method
-        del clone.__deepcopy__
+        return SymbolicField.create_from_ternary(ternary, prefixlen, SymbolicField.format_ip_prefix(ip_value, prefixlen),
+                                                 type)
 
-    return clone
+    @staticmethod
+    def create_from_field(ip, type):
+        # fresh field with the same prefix as ip, but with the default prefix mask and type
+        return SymbolicField.create_from_ternary(ip.ternary, ip.prefixlen, ip.str_ip_prefix, type)
 
+    @staticmethod
+    def create_from_ternary(ternary, prefixlen, str_ip_prefix, type):
+        symbolic_field = SymbolicField(type, 32)
+        symbolic_field.ternary = ternary
 
+        symbolic_field.prefixlen = prefixlen
+        symbolic_field.str_ip_prefix = str_ip_prefix
+        return symbolic_field
@@ -0,0 +1,275 @@
+#!/usr/bin/env python
+# Author: Ruediger Birkner (Networked Systems Group at ETH Zurich)
+
+import numpy as np
+
+from model.announcement import RouteAnnouncementFields, RouteMapType, FilterType, IntervalSet, SymbolicField, \
+    METRIC_END
+from model.fsm_store import fsm_store
+
+
+# the prefixes are ternary vectors of 32 positions
+IP_LENGTH = 32
+IP_FULL = np.uint64((1 << IP_LENGTH) - 1)
+
+# the community vectors fit into machine words up to this many communities, beyond they are stored as python integers
+MAX_WORD_COMMUNITIES = 63
+
+# kind of the announcement a match passes on to the next item
+NO_NEXT = 0
+SAME_NEXT = 1     # equal to the input of the item
+CHANGED_NEXT = 2  # restricted by the match, e.g., with an additional deny entry
+
+# drop next announcement is left as it is by the match
+KEEP_DROP = -1
+
+
+def get_bit_length(values):
+    # bit_length of every value (< 2^53), frexp returns the exponent e with value = m * 2^e and 0.5 <= m < 1
+    return np.frexp(values.astype(np.float64))[1]
+
+
+class MatchOutcome(object):
+    """
+    The outcome of a route map match for every announcement of a batch. Where the outcome is decided, hit, drop and
+    next are what the filter of the announcement would set: hit, drop next announcement (KEEP_DROP if the filter does
+    not touch it) and the kind of the announcement passed on to the next item.
+    """
+
+    def __init__(self, size):
+        self.decided = np.zeros(size, dtype=bool)
+        self.hit = np.zeros(size, dtype=bool)
+        self.drop = np.full(size, KEEP_DROP, dtype=np.int8)
+        self.next = np.full(size, SAME_NEXT, dtype=np.int8)
+
+    def set(self, mask, hit, drop, next_kind):
+        self.decided |= mask
+        self.hit[mask] = hit
+        self.drop[mask] = drop
+        self.next[mask] = next_kind
+
+
+class AnnouncementBatch(object):
+    """
+    N announcements stored as parallel arrays, such that a route map can decide for all of them at once which of its
+    items they hit (see RouteMap.apply_batch):
+        prefixes and next hops -> ones and zeros of the ternary vectors, prefix mask bounds, non-empty deny list
+        communities -> ones and zeros of the community vectors (see Community), non-empty deny list
+        MED -> lowest and highest value (half-open) of the set, empty set
+        AS path -> id of the automaton in the automata store
+    The announcements themselves are kept as well, the route maps return the resulting announcement objects.
+    """
+
+    def __init__(self, announcements):
+        self.announcements = list(announcements)
+        self.size = len(self.announcements)
+
+        self.ip_prefix = self.get_prefix_columns('ip_prefix', 'ip_prefix_deny')
+        self.next_hop = self.get_prefix_columns('next_hop', 'next_hop_deny')
+
+        # the masks of the community lists only apply to announcements over the same communities as the first one
+        self.universe = self.announcements[0].communities.universe if self.announcements else None
+        dtype = np.uint64 if self.universe is None or len(self.universe) <= MAX_WORD_COMMUNITIES else object
+        vectors = [ann.communities.community_vector for ann in self.announcements]
+        self.community_ones = np.array([vector.ones for vector in vectors], dtype=dtype)
+        self.community_zeros = np.array([vector.zeros for vector in vectors], dtype=dtype)
+        self.community_deny = np.array([bool(ann.communities_deny) for ann in self.announcements], dtype=bool)
+        self.community_universe = np.array([ann.communities.universe is self.universe for ann in self.announcements],
+                                           dtype=bool)
+
+        bounds = [ann.med.bounds for ann in self.announcements]
+        self.med_lo = np.array([med[0] if med else 0 for med in bounds], dtype=np.int64)
+        self.med_hi = np.array([med[-1] if med else 0 for med in bounds], dtype=np.int64)
+        self.med_empty = np.array([not med for med in bounds], dtype=bool)
+
+        self.as_path = np.array([fsm_store.get_id(ann.as_path.as_path_fsm) for ann in self.announcements],
+                                dtype=np.int64)
+
+        self.drop = np.array([ann.drop_next_announcement for ann in self.announcements], dtype=np.int8)
+
+    def __len__(self):
+        return self.size
+
+    def get_prefix_columns(self, attribute, deny_attribute):
+        fields = [getattr(ann, attribute) for ann in self.announcements]
+        return {
+            'ones': np.array([field.ternary.ones for field in fields], dtype=np.uint64),
+            'zeros': np.array([field.ternary.zeros for field in fields], dtype=np.uint64),
+            'lo': np.array([field.prefix_mask[0] for field in fields], dtype=np.int64),
+            'hi': np.array([field.prefix_mask[1] for field in fields], dtype=np.int64),
+            'deny': np.array([bool(getattr(ann, deny_attribute)) for ann in self.announcements], dtype=bool),
+        }
+
+    def match(self, match):
+        """
+        Returns the MatchOutcome of the match for all announcements, the outcome is only decided where the filter would
+        neither split nor narrow the announcement (besides the community deny lists it adds to the next announcement)
+        """
+        outcome = MatchOutcome(self.size)
+        if match.field == RouteAnnouncementFields.IP_PREFIX and isinstance(match.pattern, SymbolicField):
+            self.match_prefix(outcome, self.ip_prefix, match.type, match.pattern, False)
+        elif match.field == RouteAnnouncementFields.NEXT_HOP and isinstance(match.pattern, SymbolicField):
+            self.match_prefix(outcome, self.next_hop, match.type, match.pattern, True)
+        elif match.field == RouteAnnouncementFields.COMMUNITIES and isinstance(match.pattern, list):
+            self.match_communities(outcome, match.type, match.pattern)
+        elif match.field == RouteAnnouncementFields.MED:
+            self.match_med(outcome, match.type, match.pattern)
+        return outcome
+
+    def match_prefix(self, outcome, columns, match_type, pattern, next_hop):
+        """
+        Follows filter_ip_prefix and filter_next_hop: no overlap of the prefix masks is a miss, a pattern that covers
+        the prefix is a hit for permit (and a miss for deny) that drops the next announcement. Of the partial overlaps,
+        only those without a common prefix are decided (a miss), everything else narrows the prefix.
+        """
+        lo, hi = columns['lo'], columns['hi']
+        pattern_lo, pattern_hi = pattern.prefix_mask
+
+        limit_lo = np.maximum(lo, pattern_lo)
+        limit_hi = np.minimum(hi, pattern_hi)
+        disjoint = limit_lo > limit_hi
+
+        # position of the first bit in which the prefix and the pattern differ (see TernaryVector.first_impossible)
+        impossible = IP_FULL & ~((columns['ones'] & np.uint64(pattern.ternary.ones)) |
+                                 (columns['zeros'] & np.uint64(pattern.ternary.zeros)))
+        zero_position = IP_LENGTH - get_bit_length(impossible)
+
+        # check_subset(pattern, prefix)
+        covered = (pattern_lo <= lo) & (pattern_hi >= hi)
+        subset = np.zeros(self.size, dtype=bool)
+        if pattern_hi == IP_LENGTH:
+            subset |= covered & (zero_position + 1 > pattern_lo)
+        if pattern_lo == 0:
+            subset |= covered & (zero_position + 1 > hi)
+
+        # the deny lists are only checked by the filter if the masks overlap
+        open_prefixes = ~disjoint & ~columns['deny']
+        covered = open_prefixes & subset
+        rest = open_prefixes & ~subset
+
+        if next_hop:
+            if pattern.prefix_type == FilterType.GE:
+                miss = zero_position + 1 <= limit_lo
+            else:
+                miss = np.ones(self.size, dtype=bool)
+        elif pattern.prefix_type == FilterType.LE:
+            # check_le_overlap if both are LE, otherwise check_ge_le_overlap always overlaps (or fails)
+            miss = (limit_lo == 0) & ~((limit_lo < zero_position) & (zero_position < limit_hi)) & \
+                (zero_position != IP_LENGTH)
+        elif pattern.prefix_type == FilterType.GE:
+            miss = zero_position + 1 <= limit_lo
+        elif pattern.prefix_type == FilterType.EQUAL:
+            miss = ~((lo <= pattern_lo) & (pattern_lo <= hi)) | (zero_position + 1 <= pattern_lo)
+        else:
+            miss = np.ones(self.size, dtype=bool)
+
+        outcome.set(disjoint | (rest & miss), False, 0, SAME_NEXT)
+        outcome.set(covered, match_type == RouteMapType.PERMIT, 1, SAME_NEXT)
+
+    def match_communities(self, outcome, match_type, pattern):
+        """
+        Follows filter_communities: if one of the communities cannot be carried, it is a miss. Otherwise, a permit
+        always hits, a deny only if the communities are still fully symbolic. Either way, the next announcement denies
+        the communities.
+        """
+        if self.universe is None:
+            return
+
+        length = len(self.universe)
+        full = (1 << length) - 1
+        mask = self.universe.mask(pattern)
+        if self.community_ones.dtype != object:
+            full, mask = np.uint64(full), np.uint64(mask)
+
+        ones, zeros = self.community_ones, self.community_zeros
+        impossible = (full & ~(ones | (zeros & ~mask))) != 0
+        impossible = impossible.astype(bool)
+
+        known = self.community_universe
+        outcome.set(known & impossible, False, KEEP_DROP, CHANGED_NEXT)
+        if match_type == RouteMapType.PERMIT:
+            outcome.set(known & ~impossible, True, KEEP_DROP, CHANGED_NEXT)
+        else:
+            wildcard = ((ones == full) & (zeros == full)).astype(bool) & ~self.community_deny
+            outcome.set(known & ~impossible & wildcard, True, KEEP_DROP, CHANGED_NEXT)
+            outcome.set(known & ~impossible & ~wildcard, False, KEEP_DROP, CHANGED_NEXT)
+
+    def match_med(self, outcome, match_type, pattern):
+        """
+        Follows filter_metric: the values that are matched stay with the announcement, the rest is passed on. It is
+        decided if either all or none of the values are matched, which only takes the lowest and highest value.
+        """
+        if not isinstance(pattern, IntervalSet):
+            pattern = IntervalSet.point(int(pattern), METRIC_END)
+        if len(pattern.bounds) != 2:
+            return
+        pattern_lo, pattern_hi = pattern.bounds
+
+        inside = ~self.med_empty & (self.med_lo >= pattern_lo) & (self.med_hi <= pattern_hi)
+        outside = ~self.med_empty & ((self.med_hi <= pattern_lo) | (self.med_lo >= pattern_hi))
+        if match_type != RouteMapType.PERMIT:
+            inside, outside = outside, inside
+
+        outcome.set(self.med_empty | outside, False, 0, SAME_NEXT)
+        outcome.set(inside, True, 1, NO_NEXT)
+
+    def process(self, plan):
+        """
+        Runs the announcements through the plan of a route map (see RouteMap.process) and returns the resulting
+        announcements of each announcement, None for the announcements whose outcome could not be decided. Where all
+        the matches that are reached are decided, an announcement goes on to the next item unchanged (possibly
+        several times) or not at all, hence, only the items that it hits have to be applied to it.
+        """
+        results = [list() for _ in range(0, self.size)]
+        undecided = np.zeros(self.size, dtype=bool)
+        # number of copies of the announcement that reach the current item
+        copies = np.ones(self.size, dtype=np.int64)
+
+        for seq, route_map_item, permit in plan:
+            active = (copies > 0) & ~undecided
+            if not active.any():
+                break
+
+            reached = active.copy()
+            drop = self.drop.copy()
+            overall_drop = np.ones(self.size, dtype=bool)
+            same_next = np.zeros(self.size, dtype=np.int64)
+            changed_next = np.zeros(self.size, dtype=bool)
+            # field -> announcements in which an earlier match of the item has changed the field (the columns are stale)
+            changed = dict()
+
+            for match in route_map_item.matches:
+                outcome = self.match(match)
+                field_changed = changed.get(match.field, np.zeros(self.size, dtype=bool))
+                decided = outcome.decided & ~field_changed
+                undecided |= reached & ~decided
+                reached &= decided
+
+                drop = np.where(reached & (outcome.drop != KEEP_DROP), outcome.drop, drop)
+                overall_drop &= ~(reached & (drop == 0))
+
+                same_next += reached & (outcome.next == SAME_NEXT)
+                changed_next |= reached & (outcome.next == CHANGED_NEXT)
+
+                # the item stops at the first match that misses
+                reached &= outcome.hit
+                changed[match.field] = field_changed | (reached & (outcome.next == CHANGED_NEXT))
+
+            hit = reached
+            decided = active & ~undecided
+
+            # the announcements that are passed on with restrictions are not followed, unless the item drops them
+            undecided |= decided & hit & changed_next & ~overall_drop
+            decided &= ~undecided
+
+            if permit:
+                outputs = np.flatnonzero(decided & hit)
+                for i, number in zip(outputs.tolist(), copies[outputs].tolist()):
+                    announcement = self.announcements[i]
+                    for _ in range(0, number):
+                        results[i].append(route_map_item.apply(announcement)[0])
+
+            copies = np.where(decided & hit, copies * same_next, copies)
+            copies = np.where(decided & overall_drop, 0, copies)
+
+        return [None if skip else result for skip, result in zip(undecided.tolist(), results)]
@@ -0,0 +1,347 @@
+#!/usr/bin/env python
+# Author: Ruediger Birkner (Networked Systems Group at ETH Zurich)
+
+import re
+import socket
+
+from netaddr import IPNetwork
+
+from model.announcement import RouteAnnouncementFields, RouteMapType, SymbolicField, IntervalSet, CommunityList, \
+    PrefixList, METRIC_END
+from utils.logger import get_logger
+
+
+logger = get_logger('ConcreteRoute', 'DEBUG')
+
+# local pref of the routes that do not carry one (e.g., in the dumps of eBGP sessions)
+DEFAULT_LOCAL_PREF = 100
+
+# the routes of a RIB dump share few distinct next hops, community sets and AS paths, the parsed values and the outcome
+# of the AS path matches are cached up to this many entries (each)
+MAX_CACHE_SIZE = 100000
+
+# next hop string -> integer and communities string -> frozenset of the routes parsed so far
+next_hops = dict()
+community_sets = dict()
+
+
+def ip_to_int(address):
+    return int.from_bytes(socket.inet_aton(address), 'big')
+
+
+def int_to_ip(value):
+    return socket.inet_ntoa(value.to_bytes(4, 'big'))
+
+
+class ConcreteRoute(object):
+    """
+    A single route with all fields fully specified, as it appears in a RIB dump: the prefix and the next hop as
+    integers, the AS path as a string of AS numbers separated by whitespace (as in the dump, it may contain AS sets), the
+    MED and the local pref as integers and the communities as a frozenset of community strings. Routes are never changed
+    once they have been passed on, the route maps change copies.
+    """
+
+    __slots__ = ('prefix', 'prefixlen', 'next_hop', 'as_path', 'med', 'local_pref', 'communities')
+
+    def __init__(self, prefix, prefixlen, next_hop=0, as_path='', med=0, local_pref=DEFAULT_LOCAL_PREF,
+                 communities=frozenset()):
+        self.prefix = prefix
+        self.prefixlen = prefixlen
+        self.next_hop = next_hop
+        self.as_path = as_path
+        self.med = med
+        self.local_pref = local_pref
+        self.communities = communities
+
+    def copy(self):
+        clone = ConcreteRoute.__new__(ConcreteRoute)
+        clone.prefix = self.prefix
+        clone.prefixlen = self.prefixlen
+        clone.next_hop = self.next_hop
+        clone.as_path = self.as_path
+        clone.med = self.med
+        clone.local_pref = self.local_pref
+        clone.communities = self.communities
+        return clone
+
+    def fingerprint(self):
+        return self.prefix, self.prefixlen, self.next_hop, self.as_path, self.med, self.local_pref, self.communities
+
+    def __str__(self):
+        # the same columns as read by parse_route
+        return '%s/%d|%s|%s|%d|%d|%s' % (int_to_ip(self.prefix), self.prefixlen, self.as_path,
+                                         int_to_ip(self.next_hop), self.local_pref, self.med,
+                                         ' '.join(sorted(self.communities)))
+
+    def __repr__(self):
+        return 'ConcreteRoute(%s)' % self
+
+
+def parse_route(line):
+    """
+    Parses a line of a RIB dump and returns (peer, route), None if the line does not hold an IPv4 route. Two formats
+    are read:
+        the output of bgpdump -m: TABLE_DUMP2|time|B|peer ip|peer as|prefix|as path|origin|next hop|local pref|med|
+            communities|... (the peer is the ip of the neighbor the route has been received from)
+        the format of ConcreteRoute: prefix|as path|next hop|local pref|med|communities (without a peer, None)
+    """
+    fields = line.rstrip('\r\n').split('|')
+    if fields[0].startswith('TABLE_DUMP'):
+        if len(fields) < 12:
+            return None
+        peer = fields[3]
+        str_prefix, str_as_path, str_next_hop, str_local_pref, str_med, str_communities = \
+            fields[5], fields[6], fields[8], fields[9], fields[10], fields[11]
+    elif len(fields) == 6:
+        peer = None
+        str_prefix, str_as_path, str_next_hop, str_local_pref, str_med, str_communities = fields
+    else:
+        return None
+
+    if ':' in str_prefix or ':' in str_next_hop:
+        # IPv6
+        return None
+
+    try:
+        address, _, str_prefixlen = str_prefix.partition('/')
+        prefix = ip_to_int(address)
+        prefixlen = int(str_prefixlen) if str_prefixlen else 32
+
+        next_hop = next_hops.get(str_next_hop)
+        if next_hop is None:
+            next_hop = ip_to_int(str_next_hop) if str_next_hop else 0
+            if len(next_hops) < MAX_CACHE_SIZE:
+                next_hops[str_next_hop] = next_hop
+
+        med = int(str_med) if str_med else 0
+        local_pref = int(str_local_pref) if str_local_pref and str_local_pref != '0' else DEFAULT_LOCAL_PREF
+    except (OSError, ValueError):
+        return None
+
+    communities = community_sets.get(str_communities)
+    if communities is None:
+        communities = frozenset(str_communities.split())
+        if len(community_sets) < MAX_CACHE_SIZE:
+            community_sets[str_communities] = communities
+
+    return peer, ConcreteRoute(prefix, prefixlen, next_hop, ' '.join(str_as_path.split()), med, local_pref,
+                               communities)
+
+
+def format_as_path(as_path):
+    # the as paths of the automata are the AS numbers separated by whitespace, with a leading and a trailing whitespace
+    return ' %s ' % as_path
+
+
+def compile_match(match):
+    """
+    Returns (contains, permit) of the match: contains decides whether a concrete route is in the pattern, the route
+    hits the match if that is equal to permit. As the filters of RouteAnnouncement, a permit match hits the routes in
+    the pattern and a deny match all the other routes (e.g., as-path access-list 1 deny _100_ hits the
+    routes without 100 on the path). Of a list with several entries, the first entry that contains the route decides.
+    """
+    field, pattern = match.field, match.pattern
+    permit = match.type == RouteMapType.PERMIT
+
+    if field in (RouteAnnouncementFields.MED, RouteAnnouncementFields.LOCAL_PREF):
+        if not isinstance(pattern, IntervalSet):
+            pattern = IntervalSet.point(int(pattern), METRIC_END)
+        attribute = 'med' if field == RouteAnnouncementFields.MED else 'local_pref'
+
+        def contains_metric(route):
+            return getattr(route, attribute) in pattern
+
+        contains = contains_metric
+    elif isinstance(pattern, PrefixList):
+        contains = compile_prefix_list(pattern)
+    elif isinstance(pattern, CommunityList):
+        contains = compile_community_list(pattern)
+    else:
+        contains = compile_pattern(field, pattern)
+
+    return contains, permit
+
+
+def compile_pattern(field, pattern):
+    """
+    Returns a function that decides whether a concrete route is in the pattern of a single entry
+    """
+    if field == RouteAnnouncementFields.IP_PREFIX and isinstance(pattern, SymbolicField):
+        length = pattern.prefixlen
+        value = pattern.ternary.prefix_value(length)
+        lo, hi = pattern.prefix_mask
+
+        def contains_prefix(route):
+            prefixlen = route.prefixlen
+            if prefixlen < lo or prefixlen > hi:
+                return False
+            shift = 32 - min(prefixlen, length)
+            return route.prefix >> shift == value >> shift
+
+        return contains_prefix
+
+    if field == RouteAnnouncementFields.NEXT_HOP and isinstance(pattern, SymbolicField):
+        # the next hop is a single address, it only has to be within the prefix of the pattern
+        shift = 32 - pattern.prefixlen
+        value = pattern.ternary.prefix_value(pattern.prefixlen) >> shift
+
+        def contains_next_hop(route):
+            return route.next_hop >> shift == value
+
+        return contains_next_hop
+
+    if field == RouteAnnouncementFields.COMMUNITIES:
+        communities = frozenset(pattern)
+
+        def contains_communities(route):
+            return communities <= route.communities
+
+        return contains_communities
+
+    if field == RouteAnnouncementFields.AS_PATH:
+        regex = re.compile(pattern)
+        # as path -> whether the regex matches it
+        results = dict()
+
+        def contains_as_path(route):
+            as_path = route.as_path
+            result = results.get(as_path)
+            if result is None:
+                result = regex.fullmatch(format_as_path(as_path)) is not None
+                if len(results) < MAX_CACHE_SIZE:
+                    results[as_path] = result
+            return result
+
+        return contains_as_path
+
+    logger.error("Concrete routes cannot be matched on %s with the pattern %s." % (field, pattern))
+    return lambda route: False
+
+
+def compile_prefix_list(pattern):
+    """
+    Returns a function that decides whether the deciding entry of the prefix list permits a concrete route: the entries
+    containing the prefix lie on the path of the prefix through the trie of the list, the one with the lowest index
+    decides
+    """
+    root = pattern.root
+
+    def contains_prefix_list(route):
+        prefix, prefixlen = route.prefix, route.prefixlen
+        deciding = None
+        node = root
+        bit = 0
+        while True:
+            for entry in node.entries:
+                if entry.lo <= prefixlen <= entry.hi and (deciding is None or entry.index < deciding.index):
+                    deciding = entry
+            if bit == prefixlen:
+                break
+            node = node.children[(prefix >> (31 - bit)) & 1]
+            if node is None:
+                break
+            bit += 1
+
+        return deciding is not None and deciding.type == RouteMapType.PERMIT
+
+    return contains_prefix_list
+
+
+def compile_community_list(pattern):
+    """
+    Returns a function that decides whether the first entry of the community list whose communities are all carried by
+    a concrete route permits it
+    """
+    entries = [(entry_type == RouteMapType.PERMIT, frozenset(communities))
+               for entry_type, communities in pattern.entries]
+
+    def contains_community_list(route):
+        communities = route.communities
+        for entry_permit, entry_communities in entries:
+            if entry_communities <= communities:
+                return entry_permit
+        return False
+
+    return contains_community_list
+
+
+def compile_action(action):
+    """
+    Returns a function that applies the action to (a copy of) a concrete route, as the set methods of
+    RouteAnnouncement do: the communities are added to the ones of the route and the AS numbers are prepended
+    """
+    field, pattern = action.field, action.pattern
+
+    if field == RouteAnnouncementFields.NEXT_HOP:
+        next_hop = int(IPNetwork(pattern).ip)
+
+        def set_next_hop(route):
+            route.next_hop = next_hop
+
+        return set_next_hop
+
+    if field == RouteAnnouncementFields.LOCAL_PREF:
+        local_pref = int(pattern)
+
+        def set_local_pref(route):
+            route.local_pref = local_pref
+
+        return set_local_pref
+
+    if field == RouteAnnouncementFields.MED:
+        med = int(pattern)
+
+        def set_med(route):
+            route.med = med
+
+        return set_med
+
+    if field == RouteAnnouncementFields.AS_PATH:
+        prepended = ' '.join(str(asn) for asn in pattern)
+
+        def set_as_path(route):
+            route.as_path = '%s %s' % (prepended, route.as_path) if route.as_path else prepended
+
+        return set_as_path
+
+    if field == RouteAnnouncementFields.COMMUNITIES:
+        communities = frozenset(pattern)
+
+        def set_communities(route):
+            route.communities = route.communities | communities
+
+        return set_communities
+
+    if field != RouteAnnouncementFields.IP_PREFIX:
+        logger.error('Tried to set unknown field "%s with value "%s"' % (field, pattern))
+
+    # as set_ip_prefix, the prefix is never changed
+    return lambda route: None
+
+
+def compile_route_map(plan):
+    """
+    Returns a function that applies the plan of a route map (see RouteMap.compile) to a concrete route and returns the
+    resulting route, None if the route map drops it. The first item whose matches all hit decides: a permit item
+    applies its actions (to a copy), a deny item drops the route. A route that no item hits is dropped as well.
+    """
+    items = [(permit, [compile_match(match) for match in item.matches],
+              [compile_action(action) for action in item.actions]) for _, item, permit in plan]
+
+    def apply_route_map(route):
+        for permit, matches, actions in items:
+            for contains, match_permit in matches:
+                if contains(route) != match_permit:
+                    break
+            else:
+                if not permit:
+                    return None
+                if actions:
+                    route = route.copy()
+                    for action in actions:
+                        action(route)
+                return route
+        return None
+
+    return apply_route_map
+
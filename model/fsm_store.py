@@ -0,0 +1,233 @@
+#!/usr/bin/env python
+# Author: Ruediger Birkner (Networked Systems Group at ETH Zurich)
+
+import signal
+import threading
+import time
+
+from collections import OrderedDict
+from contextlib import contextmanager
+
+from greenery.fsm import anything_else
+from greenery.lego import parse, from_fsm
+
+
+# smallest delay a timer of the caller is re-armed with, setitimer with a delay of 0 would disarm it
+MIN_TIMER_DELAY = 1e-6
+
+
+class RegexTimeout(Exception):
+    pass
+
+
+@contextmanager
+def time_budget(seconds):
+    """
+    Raises RegexTimeout in the block if it runs longer than seconds. Signals can only be used in the main thread,
+    elsewhere the budget is not enforced. A timer of the caller that is pending is re-armed afterwards with the time it
+    had left (it fires right away if it has run out in the block).
+    """
+    if not seconds or threading.current_thread() is not threading.main_thread():
+        yield
+        return
+
+    def handler(signum, frame):
+        raise RegexTimeout()
+
+    previous = signal.signal(signal.SIGALRM, handler)
+    start_time = time.monotonic()
+    previous_delay, previous_interval = signal.setitimer(signal.ITIMER_REAL, seconds)
+    try:
+        yield
+    finally:
+        signal.setitimer(signal.ITIMER_REAL, 0)
+        signal.signal(signal.SIGALRM, previous)
+        if previous_delay > 0:
+            remaining = max(previous_delay - (time.monotonic() - start_time), MIN_TIMER_DELAY)
+            signal.setitimer(signal.ITIMER_REAL, remaining, previous_interval)
+
+
+class FSMStore(object):
+    """
+    Canonicalizing store for the automata that represent AS paths.
+
+    Every regex is parsed and compiled only once. All automata handed out by the store are minimized and interned by
+    their structure, i.e., two automata with the same structure are the very same object and share an id. The results
+    of the set operations between two automata are kept in a bounded LRU cache keyed by (fsm id, operation, fsm id).
+
+    The regex of an automaton is only reconstructed on demand (e.g., for printing) and memoized per automaton. As the
+    conversion is exponential in the worst case, it is skipped for large automata and aborted after a time budget.
+    """
+
+    def __init__(self, cache_size=4096, regex_max_states=64, regex_timeout=1.0):
+        self.cache_size = cache_size
+        self.regex_max_states = regex_max_states
+        self.regex_timeout = regex_timeout
+
+        # regex -> parsed regex (lego) and regex -> interned fsm
+        self.regexes = dict()
+        self.patterns = dict()
+
+        # canonical structure -> interned fsm and id(interned fsm) -> fsm id. The store keeps all interned automata
+        # alive, hence, the python ids of the interned automata are stable.
+        self.automata = dict()
+        self.ids = dict()
+
+        # fsm id -> regex (lego), None if the regex could not be reconstructed within the budget
+        self.fsm_regexes = dict()
+
+        self.operations = OrderedDict()
+        self.hits = 0
+        self.misses = 0
+
+    def clear(self):
+        self.regexes.clear()
+        self.patterns.clear()
+        self.automata.clear()
+        self.ids.clear()
+        self.fsm_regexes.clear()
+        self.operations.clear()
+        self.hits = 0
+        self.misses = 0
+
+    def parse(self, regex):
+        if regex not in self.regexes:
+            self.regexes[regex] = parse(regex)
+        return self.regexes[regex]
+
+    def compile(self, regex):
+        """
+        Returns the interned automaton of the regex
+        """
+        fsm = self.patterns.get(regex)
+        if fsm is None:
+            fsm = self.intern(self.parse(regex).to_fsm())
+            self.patterns[regex] = fsm
+            # the regex that the automaton has been compiled from is the cheapest way to describe it
+            self.fsm_regexes.setdefault(self.ids[id(fsm)], self.parse(regex))
+        return fsm
+
+    def intern(self, fsm):
+        """
+        Returns the interned automaton that has the same structure as the minimized fsm
+        """
+        if id(fsm) in self.ids:
+            return fsm
+
+        fsm = fsm.reduce()
+        key = self.get_structure(fsm)
+        if key not in self.automata:
+            self.automata[key] = fsm
+            self.ids[id(fsm)] = len(self.automata)
+        return self.automata[key]
+
+    def get_id(self, fsm):
+        return self.ids[id(self.intern(fsm))]
+
+    def get_regex(self, fsm):
+        """
+        Returns the regex (lego) of the automaton, or None if it is too large or the conversion runs out of time
+        """
+        fsm = self.intern(fsm)
+        fsm_id = self.ids[id(fsm)]
+        if fsm_id not in self.fsm_regexes:
+            regex = None
+            if len(fsm.states) <= self.regex_max_states:
+                try:
+                    with time_budget(self.regex_timeout):
+                        regex = from_fsm(fsm)
+                except (RuntimeError, RegexTimeout):
+                    regex = None
+            self.fsm_regexes[fsm_id] = regex
+        return self.fsm_regexes[fsm_id]
+
+    def get_samples(self, fsm, count=3):
+        """
+        Returns up to count of the shortest AS paths accepted by the automaton, symbols outside of the alphabet are
+        shown as '?'
+        """
+        fsm = self.intern(fsm)
+        alphabet = sorted(fsm.alphabet, key=str)
+
+        # breadth-first search, the first path to every final state is one of the shortest accepted paths
+        parents = {fsm.initial: None}
+        queue = [fsm.initial]
+        samples = list()
+        for state in queue:
+            if state in fsm.finals:
+                path = list()
+                current = state
+                while parents[current] is not None:
+                    current, symbol = parents[current]
+                    path.append('?' if symbol == anything_else else str(symbol))
+                samples.append(''.join(reversed(path)))
+                if len(samples) >= count:
+                    break
+            for symbol in alphabet:
+                next_state = fsm.map.get(state, {}).get(symbol)
+                if next_state is not None and next_state not in parents:
+                    parents[next_state] = (state, symbol)
+                    queue.append(next_state)
+
+        return samples
+
+    @staticmethod
+    def get_structure(fsm):
+        # relabel the states in the order in which they are reached from the initial state (following the symbols in
+        # a fixed order), so that automata that only differ in the naming of their states get the same structure
+        alphabet = sorted(fsm.alphabet, key=str)
+
+        labels = {fsm.initial: 0}
+        queue = [fsm.initial]
+        transitions = list()
+        for state in queue:
+            next_states = list()
+            for symbol in alphabet:
+                next_state = fsm.map.get(state, {}).get(symbol)
+                if next_state is None:
+                    next_states.append(-1)
+                    continue
+                if next_state not in labels:
+                    labels[next_state] = len(labels)
+                    queue.append(next_state)
+                next_states.append(labels[next_state])
+            transitions.append((state in fsm.finals, tuple(next_states)))
+
+        return tuple(str(symbol) for symbol in alphabet), tuple(transitions)
+
+    def intersection(self, fsm1, fsm2):
+        return self.apply('intersection', fsm1, fsm2)
+
+    def difference(self, fsm1, fsm2):
+        return self.apply('difference', fsm1, fsm2)
+
+    def isdisjoint(self, fsm1, fsm2):
+        return self.apply('isdisjoint', fsm1, fsm2)
+
+    def issuperset(self, fsm1, fsm2):
+        return self.apply('issuperset', fsm1, fsm2)
+
+    def apply(self, operation, fsm1, fsm2):
+        fsm1 = self.intern(fsm1)
+        fsm2 = self.intern(fsm2)
+        key = (self.ids[id(fsm1)], operation, self.ids[id(fsm2)])
+
+        if key in self.operations:
+            self.hits += 1
+            self.operations.move_to_end(key)
+            return self.operations[key]
+
+        self.misses += 1
+        result = getattr(fsm1, operation)(fsm2)
+        if operation == 'intersection' or operation == 'difference':
+            result = self.intern(result)
+
+        self.operations[key] = result
+        if len(self.operations) > self.cache_size:
+            self.operations.popitem(last=False)
+
+        return result
+
+
+# all AS path automata of the model are taken from this store
+fsm_store = FSMStore()
@@ -0,0 +1,118 @@
+#!/usr/bin/env python
+# Author: Ruediger Birkner (Networked Systems Group at ETH Zurich)
+
+from bisect import bisect_left, bisect_right
+
+
+class IntervalSet(object):
+    """
+    An immutable set of integers in [0, end) stored as a sorted tuple of interval bounds.
+
+    The bounds (lo1, hi1, lo2, hi2, ...) describe the disjoint, non-adjacent half-open intervals [lo1, hi1),
+    [lo2, hi2), ... of the set. A value is in the set if an odd number of bounds is smaller than or equal to it, hence,
+    membership as well as cutting the set at a range of values only takes a binary search over the bounds.
+    """
+
+    __slots__ = ('bounds', 'end')
+
+    def __init__(self, bounds, end):
+        self.bounds = bounds
+        self.end = end
+
+    @staticmethod
+    def full(end):
+        return IntervalSet((0, end), end)
+
+    @staticmethod
+    def point(value, end):
+        return IntervalSet((value, value + 1), end)
+
+    @staticmethod
+    def range(lo, hi, end):
+        """
+        Returns the set of the values from lo to hi (both included)
+        """
+        if lo > hi:
+            return IntervalSet((), end)
+        return IntervalSet((lo, hi + 1), end)
+
+    def __eq__(self, other):
+        return isinstance(other, IntervalSet) and self.bounds == other.bounds and self.end == other.end
+
+    def __ne__(self, other):
+        return not self.__eq__(other)
+
+    def __hash__(self):
+        return hash((self.bounds, self.end))
+
+    def __copy__(self):
+        return self
+
+    def __deepcopy__(self, memo):
+        return self
+
+    def __contains__(self, value):
+        return bisect_right(self.bounds, value) % 2 == 1
+
+    def is_empty(self):
+        return not self.bounds
+
+    def is_full(self):
+        return self.bounds == (0, self.end)
+
+    def get_value(self):
+        """
+        Returns the only value of the set, or None if the set does not contain exactly one value
+        """
+        if len(self.bounds) == 2 and self.bounds[1] - self.bounds[0] == 1:
+            return self.bounds[0]
+        return None
+
+    def _cut(self, lo, hi):
+        # bounds of the intersection with [lo, hi)
+        if lo >= hi:
+            return ()
+        i = bisect_right(self.bounds, lo)
+        j = bisect_left(self.bounds, hi)
+        bounds = self.bounds[i:j]
+        if i % 2 == 1:
+            bounds = (lo, ) + bounds
+        if j % 2 == 1:
+            bounds = bounds + (hi, )
+        return bounds
+
+    def intersection(self, other):
+        bounds = ()
+        for k in range(0, len(other.bounds), 2):
+            bounds += self._cut(other.bounds[k], other.bounds[k + 1])
+        return IntervalSet(bounds, self.end)
+
+    def difference(self, other):
+        result = self
+        for k in range(0, len(other.bounds), 2):
+            lo, hi = other.bounds[k], other.bounds[k + 1]
+            result = IntervalSet(result._cut(0, lo) + result._cut(hi, self.end), self.end)
+        return result
+
+    def issuperset(self, other):
+        return other.difference(self).is_empty()
+
+    def complement(self):
+        return IntervalSet.full(self.end).difference(self)
+
+    def get_intervals(self):
+        """
+        Returns the (lo, hi) of every interval of the set, both included
+        """
+        return [(self.bounds[k], self.bounds[k + 1] - 1) for k in range(0, len(self.bounds), 2)]
+
+    def __str__(self):
+        if self.is_full():
+            return 'x'
+        intervals = list()
+        for lo, hi in self.get_intervals():
+            intervals.append(str(lo) if lo == hi else '%d-%d' % (lo, hi))
+        return ','.join(intervals)
+
+    def __repr__(self):
+        return 'IntervalSet(%s)' % self
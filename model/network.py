@@ -4,20 +4,21 @@
 import sys
 import networkx as nx
 from collections import defaultdict
+from concurrent.futures import ProcessPoolExecutor
 
 from model.router import InternalBGPRouter, ExternalBGPRouter, RouteMapDirection
 from model.announcement import RouteAnnouncement
+from utils import logger as log
 from utils.logger import get_logger
 
 
+logger = get_logger('NetworkTopology', 'DEBUG')
+
+
 class NetworkTopology(nx.Graph):
     def __init__(self, name):
         super(NetworkTopology, self).__init__()
 
-        # initialize logging
-        self.logger = get_logger('NetworkTopology', 'DEBUG')
-        self.logger.disabled = True
-
         self.name = name
 
         # dict of router id to router
@@ -29,6 +30,23 @@ class NetworkTopology(nx.Graph):
 
         self.AS_community_list = list()
 
+        # information parsed from the config of each router, if the network has been loaded from configs
+        self.parsed_configs = dict()
+
+        # outcome of the last propagation from each neighbor (by name) and the sessions it went through, such that
+        # only the propagations that went through a changed session have to be repeated
+        self.outcomes = dict()
+        self.traversed_sessions = dict()
+        self.outcomes_community_list = None
+
+    def __getstate__(self):
+        # the outcomes are only a cache, e.g., the workers of propagate_all do not need them
+        state = self.__dict__.copy()
+        state['outcomes'] = dict()
+        state['traversed_sessions'] = dict()
+        state['outcomes_community_list'] = None
+        return state
+
     def add_community_list(self, community_list):
         self.AS_community_list = community_list[:]
 
@@ -66,9 +84,14 @@ class NetworkTopology(nx.Graph):
         if self.has_node(r1_id) and self.has_node(r2_id):
             super(NetworkTopology, self).add_edge(r1_id, r2_id, **attributes)
         else:
-            self.logger.error('Either %s or %s do not exist' % (r1_id, r2_id))
+            logger.error('Either %s or %s do not exist' % (r1_id, r2_id))
 
-    def propagate_announcement(self, neighbor, announcement=None, as_community_list=None):
+    def propagate_announcement(self, neighbor, announcement=None, as_community_list=None, sessions=None):
+        """
+        Propagates a symbolic announcement from the neighbor through the network and returns a dict of neighbor name to
+        the announcements that arrive there. If a set of sessions is supplied, the (router name, direction, neighbor)
+        of every session that the propagation goes through is added to it.
+        """
         # TODO add proper copies of the announcements in the graph traversal, absolutely necessary for anything but my trivial example.
 
         # TODO properly handle announcements, every route-map is a mapping from a single announcement to multiple announcements - this has to be considered
@@ -100,24 +123,33 @@ class NetworkTopology(nx.Graph):
         ingress_router = ingress_routers[0]
 
         if len(ingress_routers) > 1:
-            self.logger.debug('Looks like that neighboring router is connected to multiple internal routers. '
-                              'That should not be the case.')
+            if log.DEBUG:
+                logger.debug('Looks like that neighboring router is connected to multiple internal routers. '
+                             'That should not be the case.')
 
         # starting from the ingress router perform a graph traversal until we end at another external router
         remaining_edges = [(neighbor_id, ingress_router, announcement)]
 
+        # announcements that have been put on each edge so far, an announcement that is equal to or subsumed by one
+        # of them leads to the same (or a subset of the) outcome and is not propagated again
+        edge_announcements = defaultdict(AnnouncementSet)
+        edge_announcements[(neighbor_id, ingress_router)].add(announcement)
+
+        # announcements that arrived at each of the neighbors
+        received_announcements = defaultdict(AnnouncementSet)
+
         # performing a DFS on the BGP topology graph, starting with the entry point
         while remaining_edges:
-            # print('remaining edges: ', remaining_edges)
             prev_router_id, curr_router_id, announcement = remaining_edges.pop()
             curr_router = self.routers[curr_router_id]  # .routers is a dict of internal BGP routers indexed by ip addr
 
+            if sessions is not None:
+                sessions.add((curr_router.name, RouteMapDirection.IN, prev_router_id))
+
             # pass announcement through import filter (if it exists)
             if (RouteMapDirection.IN, prev_router_id) in curr_router.route_maps:
                 in_map = curr_router.route_maps[(RouteMapDirection.IN, prev_router_id)]
-                # print('before applying route_map_in, the announcement is', announcement)
                 local_announcements = in_map.apply(announcement, RouteMapDirection.IN)
-                # print('assigning route-mapping-in to local_announcement', local_announcements)
             else:
                 local_announcements = [announcement]
 
@@ -127,32 +159,169 @@ class NetworkTopology(nx.Graph):
 
                 for neighbor_id in self.neighbors(curr_router_id):
                     if neighbor_id == prev_router_id:
-                        self.logger.debug("Don't send an announcement back to where it came from (%s)." % neighbor_id)
+                        if log.DEBUG:
+                            logger.debug("Don't send an announcement back to where it came from (%s)." % neighbor_id)
                         continue
                     else:
+                        if sessions is not None:
+                            sessions.add((curr_router.name, RouteMapDirection.OUT, neighbor_id))
+
                         if (RouteMapDirection.OUT, neighbor_id) in curr_router.route_maps:
                             out_map = curr_router.route_maps[(RouteMapDirection.OUT, neighbor_id)]
-                            # print('going to apply OUT_MAP')
                             export_announcements = out_map.apply(local_announcement, RouteMapDirection.OUT)
-
-                            # print('OUT route map filtering', export_announcements)
                         else:
                             export_announcements = [local_announcement]
 
                         if neighbor_id in self.peers:
-                            external_routers[self.router_id_to_name[neighbor_id]].extend(export_announcements)
-                            # print('{} : {}'.format(self.router_id_to_name[neighbor_id], export_announcements))
-                        elif prev_router_id in self.peers:
-                            # make sure that only routes received over eBGP are sent to iBGP neighbors
+                            announcements = received_announcements[self.router_id_to_name[neighbor_id]]
+                            for export_announcement in export_announcements:
+                                announcements.add(export_announcement, replace=True)
+                        elif prev_router_id in self.peers or curr_router.reflects(prev_router_id, neighbor_id):
+                            # make sure that only routes received over eBGP (or reflected ones) are sent to iBGP
+                            # neighbors
+                            announcements = edge_announcements[(curr_router_id, neighbor_id)]
                             for export_announcement in export_announcements:
-                                remaining_edges.append((curr_router_id, neighbor_id, export_announcement))
-                                # print('remaining edges.append(curr_router_id, neighbor_id, export_announcement)',
-                                #       curr_router_id, neighbor_id, export_announcement)
+                                if announcements.add(export_announcement):
+                                    remaining_edges.append((curr_router_id, neighbor_id, export_announcement))
                         else:
-                            self.logger.debug("Don't send internal announcement to internal neighbor: %s." % neighbor_id)
+                            if log.DEBUG:
+                                logger.debug("Don't send internal announcement to internal neighbor: %s." % neighbor_id)
+
+        for name, announcements in received_announcements.items():
+            external_routers[name] = announcements.announcements
+
+        return external_routers
+
+    def propagate_routes(self, neighbor, routes):
+        """
+        Propagates concrete routes (see ConcreteRoute) from the neighbor through the network along the same sessions as
+        propagate_announcement, but without any of the symbolic machinery. All the routes are passed on together, edge
+        by edge. Returns a dict of neighbor name to a list of (index of the route in routes, resulting route) of the
+        routes that arrive there.
+        """
+        external_routers = defaultdict(list)
+
+        neighbor_id = self.get_router_id(neighbor)
+        ingress_router = next(iter(self.neighbors(neighbor_id)))
+
+        remaining_edges = [(neighbor_id, ingress_router, list(enumerate(routes)))]
+
+        # (index, fingerprint) of the routes that have been put on each edge so far, equal routes are not propagated
+        # again. Without route reflection, only the ingress router passes the routes on to its internal neighbors, hence,
+        # the routes can only arrive twice at neighbors with several sessions.
+        edge_routes = defaultdict(set)
+        reflection = any(router.route_reflector_clients for router in self.routers.values())
+
+        while remaining_edges:
+            prev_router_id, curr_router_id, edge_batch = remaining_edges.pop()
+            curr_router = self.routers[curr_router_id]
+
+            in_map = curr_router.route_maps.get((RouteMapDirection.IN, prev_router_id))
+            if in_map is not None:
+                edge_batch = in_map.apply_concrete(edge_batch, RouteMapDirection.IN)
+            if not edge_batch:
+                continue
+
+            for neighbor_id in self.neighbors(curr_router_id):
+                if neighbor_id == prev_router_id:
+                    continue
+
+                to_peer = neighbor_id in self.peers
+                # only routes received over eBGP (or reflected ones) are sent to iBGP neighbors
+                if not to_peer and not (prev_router_id in self.peers or
+                                        curr_router.reflects(prev_router_id, neighbor_id)):
+                    continue
+
+                out_map = curr_router.route_maps.get((RouteMapDirection.OUT, neighbor_id))
+                if out_map is not None:
+                    export_batch = out_map.apply_concrete(edge_batch, RouteMapDirection.OUT)
+                else:
+                    export_batch = edge_batch
+
+                if reflection or (to_peer and self.degree(neighbor_id) > 1):
+                    seen = edge_routes[(curr_router_id, neighbor_id)]
+                    new_batch = list()
+                    for index, route in export_batch:
+                        key = (index, route.fingerprint())
+                        if key not in seen:
+                            seen.add(key)
+                            new_batch.append((index, route))
+                else:
+                    new_batch = export_batch
+
+                if to_peer:
+                    external_routers[self.router_id_to_name[neighbor_id]].extend(new_batch)
+                elif new_batch:
+                    remaining_edges.append((curr_router_id, neighbor_id, new_batch))
 
         return external_routers
 
+    def propagate_all(self, neighbors=None, as_community_list=None, processes=None):
+        """
+        Propagates a symbolic announcement from each of the neighbors (all external routers by default) and returns a
+        dict of neighbor name to the announcements that made it through to the other neighbors (as returned by
+        propagate_announcement). The propagations are independent and run in a pool of worker processes, each of which
+        receives the network only once. The outcomes are kept for propagate_changed.
+        """
+        if neighbors is None:
+            neighbors = self.get_external_routers()
+        neighbors = sorted(self.router_id_to_name[self.get_router_id(neighbor)] for neighbor in neighbors)
+
+        if as_community_list is None:
+            as_community_list = self.AS_community_list
+
+        if as_community_list != self.outcomes_community_list:
+            self.outcomes.clear()
+            self.traversed_sessions.clear()
+            self.outcomes_community_list = as_community_list[:]
+
+        results = dict()
+        if processes == 1 or len(neighbors) <= 1:
+            for neighbor in neighbors:
+                sessions = set()
+                results[neighbor] = self.propagate_announcement(neighbor, None, as_community_list, sessions)
+                self.outcomes[neighbor] = results[neighbor]
+                self.traversed_sessions[neighbor] = sessions
+            return results
+
+        with ProcessPoolExecutor(max_workers=processes, initializer=init_worker, initargs=(self, )) as executor:
+            futures = [(neighbor, executor.submit(propagate_in_worker, neighbor, as_community_list))
+                       for neighbor in neighbors]
+            for neighbor, future in futures:
+                results[neighbor], self.traversed_sessions[neighbor] = future.result()
+                self.outcomes[neighbor] = results[neighbor]
+
+        return results
+
+    def propagate_changed(self, sessions, as_community_list=None, processes=None):
+        """
+        Repeats only the propagations that went through one of the changed sessions (router name, direction, neighbor)
+        since they have been run by propagate_all, the outcomes of all other neighbors are taken over as they are.
+        Returns the outcomes of all neighbors (as propagate_all) and the names of the neighbors that were propagated
+        again.
+        """
+        if as_community_list is None:
+            as_community_list = self.AS_community_list
+
+        sessions = set(sessions)
+        neighbors = list()
+        for neighbor_id in self.get_external_routers():
+            neighbor = self.router_id_to_name[neighbor_id]
+            if as_community_list != self.outcomes_community_list or neighbor not in self.outcomes or \
+                    not self.traversed_sessions[neighbor].isdisjoint(sessions):
+                neighbors.append(neighbor)
+
+        if log.DEBUG:
+            logger.debug("Propagating again from %d neighbors: %s" % (len(neighbors), ", ".join(sorted(neighbors))))
+
+        if neighbors:
+            self.propagate_all(neighbors, as_community_list, processes)
+
+        results = dict((self.router_id_to_name[neighbor_id], self.outcomes[self.router_id_to_name[neighbor_id]])
+                       for neighbor_id in self.get_external_routers())
+
+        return results, sorted(neighbors)
+
     def get_router_id(self, identifier):
         if identifier in self.name_to_router_id:
             router_id = self.name_to_router_id[identifier]
@@ -160,8 +329,79 @@ class NetworkTopology(nx.Graph):
         elif identifier in self.router_id_to_name:
             return identifier
         else:
-            self.logger.error('Unknown router: %s.' % (identifier, ))
+            logger.error('Unknown router: %s.' % (identifier, ))
             sys.exit(0)
 
     def get_external_routers(self):
         return self.peers.keys()
+
+    def get_route_map_sessions(self):
+        """
+        Returns the (router name, direction, neighbor) of all the route maps in the network
+        """
+        sessions = set()
+        for router_id, router in self.routers.items():
+            for direction, neighbor in router.route_maps:
+                sessions.add((self.router_id_to_name[router_id], direction, neighbor))
+        return sessions
+
+    def get_router_sessions(self, router_id):
+        """
+        Returns the (router name, direction, neighbor) of all the sessions of the router, independent of route maps
+        """
+        sessions = set()
+        if router_id in self.routers:
+            name = self.router_id_to_name[router_id]
+            for neighbor_id in self.neighbors(router_id):
+                sessions.add((name, RouteMapDirection.IN, neighbor_id))
+                sessions.add((name, RouteMapDirection.OUT, neighbor_id))
+        return sessions
+
+
+class AnnouncementSet(object):
+    """
+    List of announcements without redundancy: announcements that are equal to or subsumed by an announcement of the set
+    are not added
+    """
+
+    def __init__(self):
+        self.announcements = list()
+        self.fingerprints = set()
+
+    def add(self, announcement, replace=False):
+        """
+        Adds the announcement unless it is redundant, returns whether it has been added. With replace, announcements
+        of the set that are subsumed by the new announcement are removed.
+        """
+        fingerprint = announcement.fingerprint()
+        if fingerprint in self.fingerprints:
+            return False
+        for other in self.announcements:
+            if other.subsumes(announcement):
+                return False
+
+        if replace:
+            remaining = [other for other in self.announcements if not announcement.subsumes(other)]
+            if len(remaining) != len(self.announcements):
+                self.announcements = remaining
+                self.fingerprints = set(other.fingerprint() for other in remaining)
+
+        self.announcements.append(announcement)
+        self.fingerprints.add(fingerprint)
+        return True
+
+
+# network of the worker process, set once when the worker of propagate_all is started
+worker_network = None
+
+
+def init_worker(network):
+    global worker_network
+    worker_network = network
+
+
+def propagate_in_worker(neighbor, as_community_list):
+    # a plain dict, the defaultdict factory is not needed outside of propagate_announcement
+    sessions = set()
+    outcome = dict(worker_network.propagate_announcement(neighbor, None, as_community_list, sessions))
+    return outcome, sessions
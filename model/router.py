@@ -1,11 +1,18 @@
 #!/usr/bin/env python
 # Author: Ruediger Birkner (Networked Systems Group at ETH Zurich)
 
+from collections import OrderedDict
 from enum import Enum
+from utils import logger as log
 from utils.logger import get_logger
+from utils.profiler import profiler
 
-from model.announcement import FilterType, RouteAnnouncementFields, RouteMapType, RouteAnnouncement
-import copy
+from model.announcement import FilterType, RouteAnnouncementFields, RouteMapType, RouteAnnouncement, FILTER_METHODS, \
+    SET_METHODS, FILTER_ATTRIBUTES, CommunityList, PrefixList, freeze
+from model.concrete import compile_route_map
+
+
+logger = get_logger('RouteMap', 'DEBUG')
 
 
 class RouterType(Enum):
@@ -19,6 +26,8 @@ class RouteMapDirection(Enum):
 
 
 class BGPRouter(object):
+    __slots__ = ('id', 'name', 'as_number', 'type', 'interfaces')
+
     def __init__(self, router_id, name, as_number, router_type):
         self.id = router_id
         self.name = name
@@ -31,6 +40,8 @@ class BGPRouter(object):
 
 
 class InternalBGPRouter(BGPRouter):
+    __slots__ = ('route_maps', 'next_hop_self', 'route_reflector_clients')
+
     def __init__(self, router_id, name, as_number):
         super(InternalBGPRouter, self).__init__(router_id, name, as_number, RouterType.INTERNAL)
         self.route_maps = dict()
@@ -38,24 +49,48 @@ class InternalBGPRouter(BGPRouter):
 
         self.next_hop_self = router_id
 
+        # internal neighbors that are route reflector clients of this router
+        self.route_reflector_clients = set()
+
     def add_route_map(self, route_map, direction, neighbor):
         tag = (direction, neighbor)
         self.route_maps[tag] = route_map
 
+    def add_route_reflector_client(self, neighbor):
+        self.route_reflector_clients.add(neighbor)
+
+    def reflects(self, from_neighbor, to_neighbor):
+        """
+        Returns True if a route received from an internal neighbor is sent on to another internal neighbor: routes of
+        clients are reflected to all internal neighbors, routes of non-clients only to the clients
+        """
+        return from_neighbor in self.route_reflector_clients or to_neighbor in self.route_reflector_clients
+
 
 class ExternalBGPRouter(BGPRouter):
+    __slots__ = ()
+
     def __init__(self, router_id, name, as_number):
         super(ExternalBGPRouter, self).__init__(router_id, name, as_number, RouterType.EXTERNAL)
 
 
 class RouteMap(object):
-    def __init__(self, name, rm_type):
+    def __init__(self, name, rm_type, cache_size=1024):
         self.name = name
         self.sequence = list()
         self.items = dict()
         self.type = rm_type  # permit or deny
-        self.logger = get_logger('RouteMap', 'DEBUG')
-        self.logger.disabled = True
+        # items in the order of ascending sequence number, compiled on the first apply after a change
+        self.plan = None
+        self.versions = None
+        # function that applies the plan to a concrete route, compiled on the first apply_concrete after a change
+        self.concrete_plan = None
+
+        # LRU cache of announcement fingerprint -> resulting announcements, valid as long as the plan is
+        self.cache_size = cache_size
+        self.results = OrderedDict()
+        self.hits = 0
+        self.misses = 0
 
     def __str__(self):
         output = ""
@@ -64,55 +99,136 @@ class RouteMap(object):
             output += "route-map %s %s %d\n%s\n" % (self.name, self.items[seq].type, seq, self.items[seq])
         return output
 
+    def __getstate__(self):
+        # the plan is rebuilt on demand, e.g., after the route map has been sent to another process. The cached results
+        # are dropped as the fingerprints contain ids of automata that are only valid in this process.
+        state = self.__dict__.copy()
+        state['plan'] = None
+        state['concrete_plan'] = None
+        state['results'] = OrderedDict()
+        return state
+
+    def fingerprint(self):
+        """
+        Returns a hashable value that is equal for two route maps with the same items (independent of their name)
+        """
+        return self.type, tuple((seq, self.items[seq].fingerprint()) for seq in sorted(self.sequence))
+
     def add_item(self, item, seq_number):
         self.sequence.append(seq_number)
         self.items[seq_number] = item
+        self.plan = None
 
     def clear(self):
         self.items.clear()
         self.sequence = list()
+        self.plan = None
+
+    def compile(self):
+        """
+        Returns the plan of the route map: a list of (sequence number, item, permit) in the order in which the items are
+        applied
+        """
+        # items can still be changed after they have been added to the route map
+        if self.plan is not None and self.versions != tuple(item.version for _, item, _ in self.plan):
+            self.plan = None
+
+        if self.plan is None:
+            self.plan = [(seq, self.items[seq], self.items[seq].type == RouteMapType.PERMIT)
+                         for seq in sorted(self.sequence)]
+            self.versions = tuple(item.version for _, item, _ in self.plan)
+            self.concrete_plan = None
+            self.results.clear()
+        return self.plan
 
     def apply(self, announcement, route_map_direction):
+        plan = self.compile()
+
+        # if the route map is empty, let everything pass through
+        if len(plan) == 0:
+            if log.DEBUG:
+                logger.debug("route map is empty, let everything pass through")
+            return [announcement]
+
+        # the resulting announcements are never changed in place, hence, they can be shared between the callers
+        key = announcement.fingerprint()
+        if key in self.results:
+            self.hits += 1
+            self.results.move_to_end(key)
+            return list(self.results[key])
+
+        self.misses += 1
+        processed_announcements = self.process(announcement, plan)
+
+        self.results[key] = processed_announcements
+        if len(self.results) > self.cache_size:
+            self.results.popitem(last=False)
+
+        return list(processed_announcements)
+
+    def apply_batch(self, batch, route_map_direction):
+        """
+        Applies the route map to all announcements of an AnnouncementBatch and returns the resulting announcements of
+        each of them (as apply). The items that the announcements hit are decided on the whole batch at once, only the
+        announcements that the route map splits or narrows go through apply one by one.
+        """
+        plan = self.compile()
+
+        if len(plan) == 0:
+            return [[announcement] for announcement in batch.announcements]
+
+        results = batch.process(plan)
+        for i, result in enumerate(results):
+            if result is None:
+                results[i] = self.apply(batch.announcements[i], route_map_direction)
+
+        return results
+
+    def apply_concrete(self, routes, route_map_direction):
+        """
+        Applies the route map to a list of (index, concrete route) and returns (index, resulting route) of the routes
+        that it permits. Concrete routes are never split, the first item that a route hits decides (see
+        compile_route_map).
+        """
+        plan = self.compile()
+
+        if len(plan) == 0:
+            return routes
+
+        if self.concrete_plan is None:
+            self.concrete_plan = compile_route_map(plan)
+        apply_route_map = self.concrete_plan
+
+        results = list()
+        for index, route in routes:
+            route = apply_route_map(route)
+            if route is not None:
+                results.append((index, route))
+        return results
+
+    def process(self, announcement, plan):
         processed_announcements = list()
+        announcement_list = [announcement]
+        last_seq = plan[-1][0]
 
         # process announcements in the order of ascending sequence number
-        self.sequence.sort()
-        list_to_be_processed_ann = list()
-
-        announcement_list = list()
-        announcement_list.append(announcement)
-
-        # if the route map is empty, let everything pass through
-        if len(self.sequence) == 0:
-            self.logger.debug("route map is empty, let everything pass through")
-            processed_announcements = [announcement]
-        for i in self.sequence:
-            route_map_item = self.items[i]
-
-            list_to_be_processed_ann.clear()
-            self.logger.debug("len of announcement_list is %s" % len(announcement_list))
+        for seq, route_map_item, permit in plan:
+            list_to_be_processed_ann = list()
+            # the next items are skipped only if nothing remains of any of the announcements (or their split parts)
+            drop_next = True
             for ann in announcement_list:
-                self.logger.debug('Going to apply item seq %s in route map %s | current announcement is %s' % (
-                i, self.name, ann))
-                processed_ann, to_be_processed_ann = route_map_item.apply(ann)
-                # to_be_processed_ann is a list
-                if processed_ann.hit == 1 and route_map_item.type == RouteMapType.PERMIT:
-                    processed_announcements.append(processed_ann)
-                    # print('Routemap item %s applied, appending processed ann %s' % (i, processed_ann))
-                for to_be_ann in to_be_processed_ann:
-                    list_to_be_processed_ann.append(to_be_ann)
-                    self.logger.debug("append %s to list_to_be_processed" % to_be_ann)
-            # if route_map_item != self.items[-1]:
-            if i != self.sequence[-1]:
-                # announcement_list = copy.deepcopy(list_to_be_processed_ann)
-                announcement_list = list_to_be_processed_ann[:]
-                listA = list()
-                for i in list_to_be_processed_ann:
-                    listA.append(str(i))
-                    self.logger.debug("announcement list is: %s" % (" ,".join(listA)))
-
-            if processed_ann.drop_next_announcement == 1:
-                # print("break from routemapapply ")
+                for processed_ann, to_be_processed_ann in route_map_item.apply_all(ann):
+                    # to_be_processed_ann is a list
+                    if processed_ann.hit == 1 and permit:
+                        processed_announcements.append(processed_ann)
+                    list_to_be_processed_ann.extend(to_be_processed_ann)
+                    if processed_ann.drop_next_announcement == 0:
+                        drop_next = False
+
+            if seq != last_seq:
+                announcement_list = list_to_be_processed_ann
+
+            if drop_next:
                 break
 
         return processed_announcements
@@ -123,9 +239,13 @@ class RouteMapItems(object):
         self.matches = list()
         self.actions = list()
         self.type = type
-
-        self.logger = get_logger('RouteMapItems', 'DEBUG')
-        self.logger.disabled = True
+        # (match function, attributes passed on to the next item) per match, set function per action and the community
+        # and prefix lists with several entries by which the announcements are split
+        self.plan = None
+        # version of the profiler the plan has been compiled for, as the profiler replaces the compiled methods
+        self.plan_version = None
+        # incremented on every change, the route maps containing the item recompile when it changes
+        self.version = 0
 
     def __str__(self):
         match_str = "\n\t".join([str(match) for match in self.matches])
@@ -133,169 +253,189 @@ class RouteMapItems(object):
         output = "\t%s\n\t%s" % (match_str, action_str)
         return output
 
+    def __getstate__(self):
+        # the compiled closures cannot be pickled
+        state = self.__dict__.copy()
+        state['plan'] = None
+        return state
+
+    def fingerprint(self):
+        return (self.type,
+                tuple((match.type, match.field, freeze(match.pattern)) for match in self.matches),
+                tuple((action.field, freeze(action.pattern)) for action in self.actions))
+
     def add_match(self, match_type, field, pattern, filter_type):
-        self.logger.debug('adding a match with match_type %s | field: %s | pattern: %s| filter_type: %s' % (match_type, field, pattern, filter_type))
+        if log.DEBUG:
+            logger.debug('adding a match with match_type %s | field: %s | pattern: %s| filter_type: %s' % (match_type, field, pattern, filter_type))
         tmp_rm_match = RouteMapMatch(match_type, field, pattern)
 
-        if field == RouteAnnouncementFields.IP_PREFIX:
-            self.logger.debug('Entered field : %s == RouteAnnouncementFields.IP_PREFIX and filter_type: %s ' % (field, filter_type))
+        if field == RouteAnnouncementFields.IP_PREFIX and not isinstance(pattern, PrefixList):
+            if log.DEBUG:
+                logger.debug('Entered field : %s == RouteAnnouncementFields.IP_PREFIX and filter_type: %s ' % (field, filter_type))
 
             if filter_type == FilterType.EQUAL:
-                self.logger.debug('Entered filter_type == filtertype.equal if')
+                if log.DEBUG:
+                    logger.debug('Entered filter_type == filtertype.equal if')
 
                 pattern.prefix_mask = [pattern.prefixlen, pattern.prefixlen]
                 pattern.prefix_type = FilterType.EQUAL
 
             if filter_type == FilterType.GE:
-                self.logger.debug('Entered filter_type == filtertype.ge if')
+                if log.DEBUG:
+                    logger.debug('Entered filter_type == filtertype.ge if')
 
                 pattern.prefix_mask = [pattern.prefixlen, 32]
                 pattern.prefix_type = FilterType.GE
 
             if filter_type == FilterType.LE:
-                self.logger.debug('Entered filter_type == filtertype.le if')
+                if log.DEBUG:
+                    logger.debug('Entered filter_type == filtertype.le if')
                 pattern.prefix_mask = [0, pattern.prefixlen]
                 pattern.prefix_type = FilterType.LE
-                self.logger.debug('pattern prefix mask is now %s' % pattern.prefix_mask)
+                if log.DEBUG:
+                    logger.debug('pattern prefix mask is now %s' % pattern.prefix_mask)
 
         if field == RouteAnnouncementFields.NEXT_HOP:
-            self.logger.debug('Entered field : %s == RouteAnnouncementFields.NEXT_HOP and filter_type: %s and match '
-                              'type is %s' % (field, filter_type, match_type))
+            if log.DEBUG:
+                logger.debug('Entered field : %s == RouteAnnouncementFields.NEXT_HOP and filter_type: %s and match '
+                             'type is %s' % (field, filter_type, match_type))
 
             # if filter_type != FilterType.GE:
             #     print("NEXT_HOP matches are restricted to longest prefix match, filter type should be GE")
-            #     self.logger.error("NEXT_HOP matches are restricted to longest prefix match, filter type should be GE")
+            #     logger.error("NEXT_HOP matches are restricted to longest prefix match, filter type should be GE")
             # else:
             # Correct user input
             filter_type = FilterType.GE
             pattern.prefix_mask = [pattern.prefixlen, 32]
             pattern.prefix_type = FilterType.GE
-            self.logger.debug("Add next hop match, pattern is %s and prefix mask is %s" % (pattern, pattern.prefix_mask))
+            if log.DEBUG:
+                logger.debug("Add next hop match, pattern is %s and prefix mask is %s" % (pattern, pattern.prefix_mask))
 
         self.matches.append(tmp_rm_match)
+        self.plan = None
+        self.version += 1
 
     def add_action(self, field, pattern):
         tmp_rm_action = RouteMapAction(field, pattern)
 
         self.actions.append(tmp_rm_action)
+        self.plan = None
+        self.version += 1
+
+    def compile(self):
+        if self.plan is None or self.plan_version != profiler.version:
+            matches = [(match.compile(), FILTER_ATTRIBUTES.get(match.field, ())) for match in self.matches]
+            actions = [action.compile() for action in self.actions]
+            splits = [match.pattern for match in self.matches if isinstance(match.pattern, (CommunityList, PrefixList))]
+            self.plan = (matches, actions, splits)
+            self.plan_version = profiler.version
+        return self.plan
+
+    def apply_all(self, announcement):
+        """
+        Applies the item to the announcement and returns a list of (processed announcement, next announcements). If
+        the item matches community or prefix lists with several entries, the announcement is split first, such that
+        each part is matched by a single entry.
+        """
+        _, _, splits = self.compile()
+        if not splits:
+            return [self.apply(announcement)]
+
+        announcements = [announcement]
+        for pattern in splits:
+            announcements = [part for ann in announcements for part in pattern.split(ann)]
+
+        return [self.apply(ann) for ann in announcements]
 
     def apply(self, announcement):
-        # announcement.as_path.check_fsm("Before copy announcement")
-        original_fsm = announcement.as_path.as_path_fsm
-        tmp_announcement = copy.deepcopy(announcement)
-        tmp_announcement.as_path.as_path_fsm = original_fsm
-        # tmp_announcement.as_path.check_fsm("After copy tmp announcement")
-
-        # Applying the matches
-        self.logger.debug("Read to apply routemap item, match list length: %s" % len(self.matches))
+        matches, actions, _ = self.compile()
+
+        # announcements are copy-on-write, the copies share all fields that are not changed by the matches
+        tmp_announcement = announcement.copy()
+
         overall_hit = 0
         overall_drop = 1
 
         item_next_announcements = list()
 
-        for match in self.matches:
-            # don't want to directly apply the original announcement as we need to revert back to it if over match is zero
-            # TODO for future improvement: assign the returned value to tmp_ann each time, instead of tmp_announcement, this way no need to make
-            # copies after each match, just append tmp_ann to item_next_announcement! Should greatly simply the code
-            #
-            tmp_announcement, next_announcement = match.apply(tmp_announcement)
+        for match, attributes in matches:
+            tmp_announcement, next_announcement = match(tmp_announcement)
 
-            self.logger.debug("after apply match on field %s, tmp_announcement: %s| next_announcement: %s" % (match.field, tmp_announcement, next_announcement))
+            # the next item only sees the fields changed by this match, everything else is taken from the input. There
+            # is no next announcement if nothing remains after the match.
+            if next_announcement is not None:
+                item_next_announcement = announcement.copy()
+                for attribute in attributes:
+                    setattr(item_next_announcement, attribute, getattr(next_announcement, attribute))
+                item_next_announcements.append(item_next_announcement)
 
-            if match.field == RouteAnnouncementFields.IP_PREFIX:
-                item_next_announcement = copy.deepcopy(announcement)
-                item_next_announcement.ip_prefix = next_announcement.ip_prefix
-                item_next_announcement.ip_prefix_deny = next_announcement.ip_prefix_deny
-
-            if match.field == RouteAnnouncementFields.NEXT_HOP:
-                item_next_announcement = copy.deepcopy(announcement)
-                item_next_announcement.next_hop = next_announcement.next_hop
-                item_next_announcement.next_hop_deny = next_announcement.next_hop_deny
-
-            if match.field == RouteAnnouncementFields.MED:
-                item_next_announcement = copy.deepcopy(announcement)
-                item_next_announcement.med = next_announcement.med
-                item_next_announcement.med_deny = next_announcement.med_deny
-
-            if match.field == RouteAnnouncementFields.COMMUNITIES:
-                item_next_announcement = copy.deepcopy(announcement)
-                item_next_announcement.communities = next_announcement.communities
-                item_next_announcement.communities_deny = next_announcement.communities_deny
-                item_next_announcement.AS_community_list = next_announcement.AS_community_list
-
-            if match.field == RouteAnnouncementFields.AS_PATH:
-                item_next_announcement = copy.deepcopy(announcement)
-                item_next_announcement.as_path = next_announcement.as_path
-
-            if match.field != RouteAnnouncementFields.AS_PATH:
-                # restore changes brought by deepcopy
-                item_next_announcement.as_path.as_path_fsm = original_fsm
-                # item_next_announcement.as_path.check_fsm("After copy item next announcement")
-
-            item_next_announcements.append(item_next_announcement)
-
-            self.logger.debug("after apply match on field %s, item_next_announcement: %s" % (
-                match.field, item_next_announcement))
-
-            # if announcement.drop_next_announcement == 0:
             if tmp_announcement.drop_next_announcement == 0:
                 # next announcement would only be dropped if all matches with the same seq # have drop next announcement set to 1
                 overall_drop = 0
 
-            self.logger.debug("announcement hit: %s and tmp_announcement hit: %s" % (announcement.hit, tmp_announcement.hit))
-
             # this needs to be checked after drop next announcement, otherwise a deny clause would result in dropping the next announcement because
             #  of break statement
-            # if announcement.hit == 0:
             if tmp_announcement.hit == 0:
                 overall_hit = 0
                 break
             else:
                 overall_hit = 1
 
-        listA= list()
-        for i in item_next_announcements:
-            listA.append(str(i))
-            self.logger.debug("item_next_announcement list: %s" % (" ,".join(listA)))
-
-        # announcement.hit = overall_hit
         tmp_announcement.hit = overall_hit
 
         if tmp_announcement.hit == 0:
             # if one of match fails, next announcement is the same as the unprocessed announcement
-            self.logger.debug("Overall hit is zero, No match for item" )
-            item_next_announcements.clear()
-            item_next_announcements.append(announcement)
-            tmp_announcement = announcement
+            if log.DEBUG:
+                logger.debug("Overall hit is zero, No match for item" )
+            item_next_announcements = [announcement]
+            # the input announcement might be shared (e.g., with cached route map results), it is never changed
+            tmp_announcement = announcement.copy()
             tmp_announcement.hit = 0
 
-        # announcement.drop_next_announcement = overall_drop
         tmp_announcement.drop_next_announcement = overall_drop
         # Applying the actions if all matches match or there is no match
-        if overall_hit == 1 or len(self.matches) == 0:
+        if overall_hit == 1 or len(matches) == 0:
 
             tmp_announcement.hit = 1
-            for action in self.actions:
-                action.apply(tmp_announcement)
+            for action in actions:
+                action(tmp_announcement)
 
         return tmp_announcement, item_next_announcements
 
 
 class RouteMapMatch(object):
+    __slots__ = ('type', 'field', 'pattern')
+
     def __init__(self, match_type, field, pattern):
         self.type = match_type  # permit or deny
         self.field = field
         self.pattern = pattern
-        self.logger = get_logger('RouteMapMatch', 'DEBUG')
-        self.logger.disabled = True
         #self.filter_type = filter_type # equal, ge, le
 
+    def compile(self):
+        """
+        Returns a function that applies the match to an announcement, specialized to the field of the match
+        """
+        if self.field not in FILTER_METHODS:
+            # the generic filter reports the unknown field
+            return self.apply
+
+        filter_function = getattr(RouteAnnouncement, FILTER_METHODS[self.field])
+        match_type = self.type
+        pattern = self.pattern
+
+        def apply_match(announcement):
+            return filter_function(announcement, match_type, pattern)
+
+        return apply_match
+
     def apply(self, announcement):
 
         # self.logger.debug('Going to filter pattern: %s|pattern bitarray: %s| field: %s| match_type: %s' % (self.pattern, self.pattern.bitarray, self.field, self.type))
         processed_ann, to_be_processed_ann = announcement.filter(self.type, self.field, self.pattern)
 
-        self.logger.debug('Has filtered pattern: %s' % self.pattern)
+        if log.DEBUG:
+            logger.debug('Has filtered pattern: %s' % self.pattern)
 
         return processed_ann, to_be_processed_ann
 
@@ -305,6 +445,8 @@ class RouteMapMatch(object):
 
 
 class RouteMapAction(object):
+    __slots__ = ('field', 'pattern')
+
     def __init__(self, field, pattern):
         self.field = field
         self.pattern = pattern
@@ -316,6 +458,21 @@ class RouteMapAction(object):
         announcement.set_field(self.field, self.pattern)
         return
 
+    def compile(self):
+        """
+        Returns a function that applies the action to an announcement, specialized to the field of the action
+        """
+        if self.field not in SET_METHODS:
+            return self.apply
+
+        set_function = getattr(RouteAnnouncement, SET_METHODS[self.field])
+        pattern = self.pattern
+
+        def apply_action(announcement):
+            set_function(announcement, pattern)
+
+        return apply_action
+
     def __str__(self):
         output = "set %s %s" % (self.field, self.pattern)
         return output
@@ -0,0 +1,112 @@
+#!/usr/bin/env python
+# Author: Ruediger Birkner (Networked Systems Group at ETH Zurich)
+
+
+class TernaryVector(object):
+    """
+    A fixed-length vector of ternary bits stored as two integers.
+
+    Position 0 is the most significant bit. Every position is described by one bit in each of the two masks: `ones`
+    is set if the position can be 1 and `zeros` is set if the position can be 0. This is the HSA two-bit encoding
+    used throughout the model, just split into two machine words instead of interleaved in a bit string:
+        Z -> ones 0, zeros 0 > impossible bit
+        0 -> ones 0, zeros 1 > 0 bit
+        1 -> ones 1, zeros 0 > 1 bit
+        * -> ones 1, zeros 1 > wildcard bit
+
+    Vectors are immutable, all operations return a new vector.
+    """
+
+    __slots__ = ('length', 'ones', 'zeros')
+
+    def __init__(self, length, ones, zeros):
+        self.length = length
+        self.ones = ones
+        self.zeros = zeros
+
+    @staticmethod
+    def wildcard(length):
+        full = (1 << length) - 1
+        return TernaryVector(length, full, full)
+
+    @staticmethod
+    def from_prefix(value, prefixlen, length=32):
+        """
+        Creates a vector whose first prefixlen positions are the corresponding bits of value, the rest are wildcards
+        """
+        full = (1 << length) - 1
+        host = full >> prefixlen
+        net = full ^ host
+        value &= net
+        return TernaryVector(length, value | host, (net ^ value) | host)
+
+    def __len__(self):
+        return self.length
+
+    def __and__(self, other):
+        return TernaryVector(self.length, self.ones & other.ones, self.zeros & other.zeros)
+
+    def __eq__(self, other):
+        return isinstance(other, TernaryVector) and self.length == other.length and \
+               self.ones == other.ones and self.zeros == other.zeros
+
+    def __ne__(self, other):
+        return not self.__eq__(other)
+
+    def __hash__(self):
+        return hash((self.length, self.ones, self.zeros))
+
+    def __copy__(self):
+        return self
+
+    def __deepcopy__(self, memo):
+        return self
+
+    def _first_set(self, mask):
+        # position of the most significant set bit in mask, or length if mask is empty
+        if mask:
+            return self.length - mask.bit_length()
+        return self.length
+
+    def impossible_mask(self):
+        return ((1 << self.length) - 1) & ~(self.ones | self.zeros)
+
+    def has_impossible(self):
+        return (self.ones | self.zeros) != (1 << self.length) - 1
+
+    def first_impossible(self):
+        """
+        Returns the position of the first impossible bit, or the length of the vector if there is none
+        """
+        return self._first_set(self.impossible_mask())
+
+    def first_wildcard(self):
+        """
+        Returns the position of the first wildcard bit, or the length of the vector if there is none
+        """
+        return self._first_set(self.ones & self.zeros)
+
+    def prefix_value(self, prefixlen):
+        """
+        Returns the integer formed by the bits that are fixed to 1 within the first prefixlen positions
+        """
+        full = (1 << self.length) - 1
+        return self.ones & ~self.zeros & (full ^ (full >> prefixlen))
+
+    def __str__(self):
+        output = ''
+        for i in range(self.length - 1, -1, -1):
+            one = (self.ones >> i) & 1
+            zero = (self.zeros >> i) & 1
+            if one and zero:
+                output += '*'
+            elif one:
+                output += '1'
+            elif zero:
+                output += '0'
+            else:
+                output += 'z'
+        return output
+
+    def __repr__(self):
+        return 'TernaryVector(%s)' % self
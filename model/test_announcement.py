@@ -0,0 +1,119 @@
+#!/usr/bin/env python
+# Author: Ruediger Birkner (Networked Systems Group at ETH Zurich)
+
+import unittest
+
+from model.announcement import RouteAnnouncement, RouteAnnouncementFields, RouteMapType, FilterType, CommunityList, \
+    PrefixList, SymbolicField, IntervalSet, METRIC_END
+from model.router import RouteMap, RouteMapItems, RouteMapDirection
+
+
+def apply_list_match(field, pattern, announcement):
+    """
+    Applies a route map with a single permit item that matches the list to the announcement
+    """
+    route_map = RouteMap('TEST', RouteMapType.PERMIT)
+    rm_items = RouteMapItems(RouteMapType.PERMIT)
+    rm_items.add_match(RouteMapType.PERMIT, field, pattern, FilterType.EQUAL)
+    route_map.add_item(rm_items, 10)
+    return route_map.apply(announcement, RouteMapDirection.IN)
+
+
+def apply_chained_match(field, pattern, announcement):
+    """
+    Applies two route maps to the announcement, as on the way from one neighbor to another: the first one permits all
+    prefixes (which leaves drop next announcement set), the second one has a permit item that matches the pattern
+    and a permit item that sets the local pref to 200
+    """
+    in_map = RouteMap('IN', RouteMapType.PERMIT)
+    rm_items = RouteMapItems(RouteMapType.PERMIT)
+    rm_items.add_match(RouteMapType.PERMIT, RouteAnnouncementFields.IP_PREFIX,
+                       SymbolicField.create_from_prefix('0.0.0.0/0', RouteAnnouncementFields.IP_PREFIX), FilterType.GE)
+    in_map.add_item(rm_items, 10)
+
+    out_map = RouteMap('OUT', RouteMapType.PERMIT)
+    rm_items = RouteMapItems(RouteMapType.PERMIT)
+    rm_items.add_match(RouteMapType.PERMIT, field, pattern, FilterType.EQUAL)
+    out_map.add_item(rm_items, 10)
+    rm_items = RouteMapItems(RouteMapType.PERMIT)
+    rm_items.add_action(RouteAnnouncementFields.LOCAL_PREF, '200')
+    out_map.add_item(rm_items, 20)
+
+    return [result for ann in in_map.apply(announcement, RouteMapDirection.IN)
+            for result in out_map.apply(ann, RouteMapDirection.OUT)]
+
+
+def get_local_pref_200(results):
+    return [ann for ann in results if ann.local_pref == IntervalSet.point(200, METRIC_END)]
+
+
+class CommunityListTest(unittest.TestCase):
+    def test_shadowed_entry(self):
+        # every route with 1:1 and 1:2 carries 1:1 and is denied by the first entry
+        pattern = CommunityList([(RouteMapType.DENY, ['1:1']), (RouteMapType.PERMIT, ['1:1', '1:2'])])
+        announcement = RouteAnnouncement(AS_community_list=['1:1', '1:2', '1:3'])
+        self.assertEqual(apply_list_match(RouteAnnouncementFields.COMMUNITIES, pattern, announcement), [])
+
+    def test_later_entry(self):
+        pattern = CommunityList([(RouteMapType.DENY, ['1:1', '1:2']), (RouteMapType.PERMIT, ['1:1'])])
+        announcement = RouteAnnouncement(AS_community_list=['1:1', '1:2', '1:3'])
+        results = apply_list_match(RouteAnnouncementFields.COMMUNITIES, pattern, announcement)
+        self.assertEqual(len(results), 1)
+        self.assertEqual(results[0].communities_deny, [['1:1', '1:2']])
+
+    def test_chained_route_maps(self):
+        # the routes without 1:1 miss the list and reach the second item, although the first map set drop next
+        pattern = CommunityList([(RouteMapType.DENY, ['1:2']), (RouteMapType.PERMIT, ['1:1'])])
+        announcement = RouteAnnouncement(AS_community_list=['1:1', '1:2', '1:3'])
+        results = apply_chained_match(RouteAnnouncementFields.COMMUNITIES, pattern, announcement)
+        self.assertEqual(len(results), len(get_local_pref_200(results)) + 1)
+        self.assertNotEqual(get_local_pref_200(results), [])
+
+
+class PrefixListTest(unittest.TestCase):
+    def test_shadowed_entry(self):
+        # every prefix of the second entry is in the first one, so the list permits nothing
+        pattern = PrefixList([(RouteMapType.DENY, '10.0.0.0/8', None, '32'),
+                              (RouteMapType.PERMIT, '10.1.0.0/16', None, '24')])
+        self.assertEqual(apply_list_match(RouteAnnouncementFields.IP_PREFIX, pattern, RouteAnnouncement()), [])
+
+    def test_overlapping_entry(self):
+        pattern = PrefixList([(RouteMapType.DENY, '10.1.0.0/16', None, '32'),
+                              (RouteMapType.PERMIT, '10.0.0.0/8', None, '24')])
+        results = apply_list_match(RouteAnnouncementFields.IP_PREFIX, pattern, RouteAnnouncement())
+        self.assertEqual(len(results), 1)
+        self.assertEqual(str(results[0].ip_prefix), '10.0.0.0/8')
+        self.assertEqual(results[0].ip_prefix.prefix_mask, [8, 24])
+        self.assertEqual([str(ip_prefix) for ip_prefix in results[0].ip_prefix_deny], ['10.1.0.0/16'])
+
+    def test_chained_route_maps(self):
+        pattern = PrefixList([(RouteMapType.PERMIT, '10.0.0.0/8', None, '24'),
+                              (RouteMapType.PERMIT, '20.0.0.0/8', None, None)])
+        results = apply_chained_match(RouteAnnouncementFields.IP_PREFIX, pattern, RouteAnnouncement())
+        local_pref_200 = get_local_pref_200(results)
+        self.assertEqual(len(local_pref_200), 1)
+        self.assertEqual(sorted(str(ip_prefix) for ip_prefix in local_pref_200[0].ip_prefix_deny),
+                         ['10.0.0.0/8', '20.0.0.0/8'])
+
+    def test_chained_route_maps_last_part_decided(self):
+        # the last part (all prefixes but 10.0.0.0/8) is decided by the list, the first one still reaches the next item
+        pattern = PrefixList([(RouteMapType.DENY, '10.0.0.0/8', None, '32'),
+                              (RouteMapType.PERMIT, '0.0.0.0/0', None, '32')])
+        results = apply_chained_match(RouteAnnouncementFields.IP_PREFIX, pattern, RouteAnnouncement())
+        local_pref_200 = get_local_pref_200(results)
+        self.assertEqual(len(results), 2)
+        self.assertEqual(len(local_pref_200), 1)
+        self.assertEqual(str(local_pref_200[0].ip_prefix), '10.0.0.0/8')
+
+
+class MetricTest(unittest.TestCase):
+    def test_chained_route_maps(self):
+        results = apply_chained_match(RouteAnnouncementFields.MED, '50', RouteAnnouncement())
+        self.assertEqual(len(results), 2)
+        local_pref_200 = get_local_pref_200(results)
+        self.assertEqual(len(local_pref_200), 1)
+        self.assertNotIn(50, local_pref_200[0].med)
+
+
+if __name__ == '__main__':
+    unittest.main()
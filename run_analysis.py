@@ -12,7 +12,9 @@ from model.test_networks import get_simple_network, get_double_network, get_test
     get_matchmed_network, get_matchapply_network, get_matchcommunity_network, get_matchaspath1_network, get_matchaspath2_network, \
     get_matchaspath3_network, get_matchaspath4_network, get_test_communities_network, get_test_next_hop_network, get_test_med_network
 
-from utils.config_parser import load_network_from_configs
+from utils.config_parser import load_network_from_configs, reload_network_from_configs
+from utils.logger import set_debug
+from utils.profiler import profiler
 
 
 class TestSuite(cmd.Cmd):
@@ -23,6 +25,7 @@ class TestSuite(cmd.Cmd):
         # current network
         self.network = None
         self.neighbor = None
+        self.config_path = None
 
         self.prompt = '> '
         # self.intro = 'Hi, '
@@ -39,6 +42,42 @@ class TestSuite(cmd.Cmd):
         else:
             self.network = load_network_from_configs(line)
             self.neighbor = None
+            self.config_path = line
+
+    def do_reload(self, line=''):
+        """reload [processes]: Reload the configurations of the parsed network and only propagate the announcements
+        again from the neighbors that are affected by the changes"""
+        if not self.config_path:
+            print('You need to parse a network from configurations before you can reload it.')
+            return
+
+        processes = int(line) if line else None
+
+        self.network, touched = reload_network_from_configs(self.network, self.config_path, processes=processes)
+        outcomes, neighbors = self.network.propagate_changed(touched, self.network.AS_community_list, processes)
+
+        print("%d sessions changed, propagated again from: %s" % (len(touched), ", ".join(neighbors)))
+        for neighbor in neighbors:
+            self.print_outcome(neighbor, outcomes[neighbor])
+
+    def do_profile(self, line=''):
+        """profile on|off|reset|report|dump FILE: Record the calls and the time spent in the hot paths of the symbolic
+        execution (only in this process, use "run all 1" to profile all neighbors), print them or write them as JSON"""
+        args = line.split()
+        command = args[0] if args else 'report'
+
+        if command == 'on':
+            profiler.enable()
+        elif command == 'off':
+            profiler.disable()
+        elif command == 'reset':
+            profiler.reset()
+        elif command == 'report':
+            print(profiler.get_report())
+        elif command == 'dump' and len(args) > 1:
+            profiler.dump(args[1])
+        else:
+            print('Unknown profile command: %s' % line)
 
     def do_load(self, line=''):
         """load: Load one of the provided network models or create a new one from configurations"""
@@ -102,6 +141,7 @@ class TestSuite(cmd.Cmd):
             return
 
         self.neighbor = "in_neighbor"
+        self.config_path = None
 
         print('Loaded %s topology with %d nodes and %d edges.' % (self.network.name, len(self.network.nodes), len(self.network.edges)))
 
@@ -122,8 +162,20 @@ class TestSuite(cmd.Cmd):
             print('You need to load a network model before you can display its neighbors.')
 
     def do_run(self, line=''):
-        """run: Run an analysis on the loaded network model by propagating a symbolic announcement"""
+        """run [all [processes]]: Run an analysis on the loaded network model by propagating a symbolic announcement
+        from the current neighbor, or from all neighbors in parallel"""
         if self.network:
+            args = line.split()
+            if args and args[0] == 'all':
+                processes = int(args[1]) if len(args) > 1 else None
+
+                print("Propagate announcements from all neighbors with AS community list :%s" % self.network.AS_community_list)
+                outcomes = self.network.propagate_all(None, self.network.AS_community_list, processes)
+
+                for neighbor, outcome in sorted(outcomes.items(), key=lambda x: x[0]):
+                    self.print_outcome(neighbor, outcome)
+                return
+
             if not self.neighbor:
                 self.neighbor = random.choice(list(self.network.get_external_routers()))
                 print("No neighbor specified, picked %s randomly." % self.neighbor)
@@ -132,20 +184,23 @@ class TestSuite(cmd.Cmd):
             print("Propagate announcement with AS community list :%s" % self.network.AS_community_list)
             outcome = self.network.propagate_announcement(self.neighbor, None, self.network.AS_community_list)
 
-            output = 'From %s the following announcements make it through to the other neighbors:\n\n' % (self.neighbor, )
-            for neighbor, announcements in sorted(outcome.items(), key=lambda x: x[0]):
-                neighbor_id = self.network.get_router_id(neighbor)
+            self.print_outcome(self.neighbor, outcome)
+        else:
+            print('You need to load a network model before you can run the symbolic execution.')
+
+    def print_outcome(self, source, outcome):
+        output = 'From %s the following announcements make it through to the other neighbors:\n\n' % (source, )
+        for neighbor, announcements in sorted(outcome.items(), key=lambda x: x[0]):
+            neighbor_id = self.network.get_router_id(neighbor)
 
-                output += '\t%s (%s):\n' % (neighbor, neighbor_id)
+            output += '\t%s (%s):\n' % (neighbor, neighbor_id)
 
-                for i, announcement in enumerate(announcements):
-                    output += '\t\t(%d): %s\n' % (i + 1, announcement)
+            for i, announcement in enumerate(announcements):
+                output += '\t\t(%d): %s\n' % (i + 1, announcement)
 
-                # Disable as path testing during time measurement
-                # self.test_as_path(announcement)
-            print(output)
-        else:
-            print('You need to load a network model before you can run the symbolic execution.')
+            # Disable as path testing during time measurement
+            # self.test_as_path(announcement)
+        print(output)
 
     def test_as_path(self, announcement):
         for announcement_element in announcement:
@@ -171,5 +226,6 @@ if __name__ == "__main__":
     args = parser.parse_args()
 
     debug = args.debug
+    set_debug(debug)
 
     TestSuite()
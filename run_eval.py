@@ -1,8 +1,60 @@
 #!/usr/bin/env python
 # Author: Ruediger Birkner (Networked Systems Group at ETH Zurich)
 
+import argparse
+import json
+import sys
+
+from benchmark.scenarios import get_benchmarks, DEFAULT_CONFIG_PATH
+from benchmark.store import ResultStore, DEFAULT_STORE_PATH
+from benchmark.suite import BenchmarkSuite
+from utils.profiler import profiler
 
-from evaluation.eval_time import run_eval
 
 if __name__ == "__main__":
-    run_eval("TestScenario", "Alpha", 50)
+    parser = argparse.ArgumentParser(description='Run the timing benchmarks of the symbolic execution.')
+    parser.add_argument('-s', '--scenario', help='scenario to run (FieldTest, ItemSizeTest, RoutemapSizeTest, '
+                                                 'NetworkSizeTest, ConfigParseTest, ConfigTest, ScalingTest, '
+                                                 'BatchTest), all by default', action='append')
+    parser.add_argument('-f', '--filter', help='only run the benchmarks whose name contains this string', default='')
+    parser.add_argument('-r', '--repetitions', help='timed runs per benchmark', type=int, default=10)
+    parser.add_argument('-w', '--warmup', help='untimed runs per benchmark before the timed ones', type=int, default=2)
+    parser.add_argument('--seed', help='seed of the randomly generated route maps', type=int, default=0)
+    parser.add_argument('-c', '--configs', help='directory with the config scenarios', default=DEFAULT_CONFIG_PATH)
+    parser.add_argument('-o', '--output', help='write the results as JSON to this file instead of stdout')
+    parser.add_argument('--save', help='keep the results in the result store under this label (e.g., for '
+                                       'compare_eval.py)', metavar='LABEL')
+    parser.add_argument('--store', help='directory of the result store', default=DEFAULT_STORE_PATH)
+    parser.add_argument('-p', '--profile', help='profile the hot paths during the runs (adds overhead to the timings) '
+                                            'and write the calls and times as JSON to this file')
+    parser.add_argument('-m', '--memory', help='also measure the bytes per announcement and the peak RSS of every '
+                                           'benchmark (one extra run each in a fresh process)', action='store_true')
+    parser.add_argument('-l', '--list', help='only list the benchmarks', action='store_true')
+
+    args = parser.parse_args()
+
+    benchmarks = [benchmark for benchmark in get_benchmarks(args.scenario, args.configs)
+                  if args.filter in benchmark.name]
+
+    if args.list:
+        for benchmark in benchmarks:
+            print(benchmark)
+        sys.exit(0)
+
+    suite = BenchmarkSuite(benchmarks, args.repetitions, args.warmup, args.seed, args.memory)
+    if args.profile:
+        profiler.enable()
+    suite.run()
+
+    if args.profile:
+        profiler.disable()
+        profiler.dump(args.profile)
+        print(profiler.get_report())
+
+    if args.save:
+        print("Stored the results in %s" % ResultStore(args.store).save(suite.to_dict(), args.save))
+
+    if args.output:
+        suite.write_results(args.output)
+    elif not args.save:
+        print(json.dumps(suite.to_dict(), indent=2))
@@ -0,0 +1,166 @@
+#!/usr/bin/env python
+# Author: Ruediger Birkner (Networked Systems Group at ETH Zurich)
+
+import argparse
+import logging
+import os
+import sys
+import time
+from collections import defaultdict, deque
+from concurrent.futures import ProcessPoolExecutor
+from itertools import islice
+from operator import itemgetter
+
+import model.network
+from model.concrete import parse_route
+from model.network import init_worker
+from utils.config_parser import load_network_from_configs
+from utils.logger import set_debug
+
+
+# number of lines of the dump that are parsed and propagated at once (the routes of each neighbor together)
+DEFAULT_BATCH_SIZE = 10000
+
+
+def process_lines(network, first_number, lines, neighbor=None, output=True):
+    """
+    Parses the lines of a RIB dump (see parse_route), the first one has the given line number, and propagates the
+    routes through the network, a batch per neighbor. Each route is propagated from the neighbor it has been received
+    from or from the supplied neighbor. Returns the output (a line per route that arrives at another neighbor: line
+    number of the route | source neighbor | destination neighbor | resulting route), the numbers of routes read,
+    propagated and received and of the lines skipped, and the unknown neighbors.
+    """
+    stats = defaultdict(int)
+    unknown = set()
+    batches = defaultdict(list)
+
+    for number, line in enumerate(lines, first_number):
+        parsed = parse_route(line)
+        if parsed is None:
+            if line.strip():
+                stats['skipped'] += 1
+            continue
+
+        peer, route = parsed
+        stats['read'] += 1
+        batches[neighbor if neighbor is not None else peer].append((number, route))
+
+    output_lines = list()
+    for peer, batch in batches.items():
+        if peer not in network.name_to_router_id and peer not in network.router_id_to_name:
+            unknown.add(peer)
+            stats['skipped'] += len(batch)
+            continue
+
+        source = network.router_id_to_name[network.get_router_id(peer)]
+        outcome = network.propagate_routes(peer, [route for _, route in batch])
+        stats['propagated'] += len(batch)
+
+        for destination, routes in outcome.items():
+            stats['received'] += len(routes)
+            if output:
+                output_lines.extend((batch[index][0], '%d|%s|%s|%s\n' % (batch[index][0], source, destination, route))
+                                    for index, route in routes)
+
+    # the routes of different neighbors are written in the order of the dump
+    output_lines.sort(key=itemgetter(0))
+    return ''.join(output_line for _, output_line in output_lines), dict(stats), unknown
+
+
+def process_lines_in_worker(first_number, lines, neighbor, output):
+    return process_lines(model.network.worker_network, first_number, lines, neighbor, output)
+
+
+def stream_routes(network, infile, outfile=None, neighbor=None, batch_size=DEFAULT_BATCH_SIZE, processes=1):
+    """
+    Reads a RIB dump in batches of lines and propagates its routes through the network (see process_lines). With
+    several processes, the batches are handled by a pool of worker processes (each of which receives the network only
+    once) and their output is written in the order of the batches. Returns the summed up numbers of process_lines and
+    all unknown neighbors.
+    """
+    stats = defaultdict(int)
+    unknown = set()
+    output = outfile is not None
+
+    def collect(result):
+        text, batch_stats, batch_unknown = result
+        if output:
+            outfile.write(text)
+        for key, value in batch_stats.items():
+            stats[key] += value
+        unknown.update(batch_unknown)
+
+    def get_batches():
+        first_number = 1
+        while True:
+            lines = list(islice(infile, batch_size))
+            if not lines:
+                return
+            yield first_number, lines
+            first_number += len(lines)
+
+    if processes == 1:
+        for first_number, lines in get_batches():
+            collect(process_lines(network, first_number, lines, neighbor, output))
+        return stats, unknown
+
+    processes = processes or os.cpu_count()
+    with ProcessPoolExecutor(max_workers=processes, initializer=init_worker, initargs=(network, )) as executor:
+        # only a few batches per worker are read ahead, the dump does not have to fit into memory
+        futures = deque()
+        for first_number, lines in get_batches():
+            futures.append(executor.submit(process_lines_in_worker, first_number, lines, neighbor, output))
+            if len(futures) >= 2 * processes:
+                collect(futures.popleft().result())
+        while futures:
+            collect(futures.popleft().result())
+
+    return stats, unknown
+
+
+if __name__ == "__main__":
+    parser = argparse.ArgumentParser(description='Propagate the concrete routes of a RIB dump through a network loaded '
+                                                 'from configs, without the symbolic execution.')
+    parser.add_argument('config_path', help='directory with the configs of the network')
+    parser.add_argument('rib', help='RIB dump (bgpdump -m or the route columns of the output of this script) or - for '
+                                    'stdin')
+    parser.add_argument('-n', '--neighbor', help='propagate all routes from this neighbor (name or ip) instead of the '
+                                                 'peer of each line')
+    parser.add_argument('-o', '--output', help='write the routes that arrive at the other neighbors to this file '
+                                               '(- for stdout)')
+    parser.add_argument('-b', '--batch-size', help='lines of the dump that are propagated at once', type=int,
+                        default=DEFAULT_BATCH_SIZE)
+    parser.add_argument('-p', '--processes', help='worker processes that propagate the batches (all cores by default)',
+                        type=int)
+    parser.add_argument('-d', '--debug', help='enable debug output', action='store_true')
+
+    args = parser.parse_args()
+
+    set_debug(args.debug)
+    if not args.debug:
+        logging.disable(logging.INFO)
+
+    network = load_network_from_configs(args.config_path)
+
+    infile = sys.stdin if args.rib == '-' else open(args.rib)
+    if args.output == '-':
+        outfile = sys.stdout
+    elif args.output:
+        outfile = open(args.output, 'w')
+    else:
+        outfile = None
+
+    start_time = time.perf_counter()
+    stats, unknown = stream_routes(network, infile, outfile, args.neighbor, args.batch_size, args.processes)
+    duration = time.perf_counter() - start_time
+
+    if infile is not sys.stdin:
+        infile.close()
+    if outfile is not None and outfile is not sys.stdout:
+        outfile.close()
+
+    if unknown:
+        print("Skipped the routes of the unknown neighbors: %s" % ", ".join(sorted(unknown)), file=sys.stderr)
+    print("Propagated %d of %d routes (%d lines skipped) in %.2f s (%.0f routes/s), %d routes arrived at the other "
+          "neighbors." % (stats['propagated'], stats['read'], stats['skipped'], duration,
+                          stats['read'] / duration if duration > 0 else 0.0, stats['received']), file=sys.stderr)
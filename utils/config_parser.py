@@ -2,14 +2,18 @@
 # Author: Ruediger Birkner (Networked Systems Group at ETH Zurich)
 
 
+import hashlib
+import pickle
+import re
 import sys
 import os
 
 from collections import defaultdict
+from concurrent.futures import ProcessPoolExecutor
+from itertools import repeat
 
-from ciscoconfparse import CiscoConfParse
-
-from model.announcement import RouteMapType, RouteAnnouncementFields, SymbolicField, FilterType
+from model.announcement import RouteMapType, RouteAnnouncementFields, SymbolicField, FilterType, CommunityList, \
+    PrefixList
 from model.router import RouteMap, RouteMapItems, RouteMapDirection
 
 from model.network import NetworkTopology
@@ -18,27 +22,87 @@ from utils.logger import get_logger
 
 logger = get_logger('ConfigParser', 'DEBUG')
 
-
-def load_network_from_configs(config_path, scenario_name=""):
+# the parsed configs are cached in this sub-directory of the config path, bump the version whenever the parsed
+# information (or any of the model classes it contains) changes
+CACHE_DIRECTORY = '.parse_cache'
+CACHE_VERSION = 6
+
+# patterns of the top-level lines that are extracted from a config. A line that starts with one of the keywords, but
+# does not match the whole pattern is reported.
+TOP_LEVEL_PATTERNS = [
+    ('prefix-list', re.compile(r"^ip\sprefix-list\s(\w+)\sseq\s(\d{1,5})\s(deny|permit)\s"
+                               r"(\d{1,3}\.\d{1,3}\.\d{1,3}\.\d{1,3}/\d{1,2})(?:\sge\s(\d+))?(?:\sle\s(\d+))?$|"
+                               r"^ip\sprefix-list")),
+    ('community-list', re.compile(r"^ip\scommunity-list\s(standard\s)?(\w+)\s(deny|permit)\s(.*)$|^ip\scommunity-list")),
+    ('access-list', re.compile(r"^access-list\s(\w+)\s(deny|permit)\s(\d{1,3}\.\d{1,3}\.\d{1,3}\.\d{1,3}/\d{1,2})$|"
+                               r"^access-list\s")),
+    ('as-path-list', re.compile(r"^ip\sas-path\saccess-list\s(\w+)\s(deny|permit)\s(.*)$|^ip\sas-path\saccess-list\s")),
+    ('route-map', re.compile(r"^route-map\s(\w+)\s(permit|deny)\s(\d+)$")),
+    ('bgp', re.compile(r"^router\sbgp\s(\d+)$")),
+]
+
+LINE_TYPE_ATTRIBUTES = {
+    'prefix-list': 'prefix_lists',
+    'community-list': 'community_lists',
+    'access-list': 'access_lists',
+    'as-path-list': 'as_path_lists',
+    'route-map': 'route_maps',
+    'bgp': 'bgp_configs',
+}
+
+ROUTER_ID_REGEX = re.compile(r"^\sbgp\srouter-id\s")
+ROUTER_ID_VALUE_REGEX = re.compile(r"^\sbgp\srouter-id\s(\d{1,3}\.\d{1,3}\.\d{1,3}\.\d{1,3})$")
+
+NEIGHBOR_LINE_REGEX = re.compile(r"^\s*(neighbor)")
+NEIGHBOR_IP_REGEX = re.compile(r"^\s*neighbor\s(\d{1,3}\.\d{1,3}\.\d{1,3}\.\d{1,3})\s")
+NEIGHBOR_ROUTE_MAP_REGEX = re.compile(r"(route-map)")
+NEIGHBOR_ROUTE_MAP_NAME_REGEX = re.compile(r"route-map\s(\w+)\s(in|out)$")
+NEIGHBOR_OUT_REGEX = re.compile(r"(out)$")
+NEIGHBOR_REMOTE_AS_REGEX = re.compile(r"(remote-as)")
+NEIGHBOR_REMOTE_AS_NUMBER_REGEX = re.compile(r"remote-as\s(\d+)")
+NEIGHBOR_UPDATE_SOURCE_REGEX = re.compile(r"update-source\s(.+)")
+NEIGHBOR_NEXT_HOP_SELF_REGEX = re.compile(r"(next-hop-self)")
+
+MATCH_LINE_REGEX = re.compile(r"^\s*(match)")
+MATCH_FIELD_REGEX = re.compile(r"^\s*match\s(community|ip\saddress\sprefix-list|local-preference|metric|as-path)")
+MATCH_COMMUNITY_REGEX = re.compile(r"^\s*match\scommunity\s(\w+)")
+MATCH_PREFIX_LIST_REGEX = re.compile(r"^\s*match\sip\saddress\sprefix-list\s(\w+)")
+MATCH_NEXT_HOP_REGEX = re.compile(r"^\s*match\sip\snext-hop\saccess-list\s(\w+)")
+MATCH_AS_PATH_REGEX = re.compile(r"^\s*match\sas-path\s(\w+)")
+MATCH_METRIC_REGEX = re.compile(r"^\s*match\smetric\s(\d+)")
+MATCH_LOCAL_PREF_REGEX = re.compile(r"^\s*match\slocal-preference\s(\d+)")
+
+SET_LINE_REGEX = re.compile(r"^\s*(set)")
+SET_FIELD_REGEX = re.compile(r"^\s*set\s(community|ip\snext-hop|local-preference|as-path\sprepend|metric)")
+SET_COMMUNITY_REGEX = re.compile(r"^\s*set\scommunity\s(.+)$")
+SET_NEXT_HOP_REGEX = re.compile(r"^\s*set\sip\snext-hop\s(\d{1,3}\.\d{1,3}\.\d{1,3}\.\d{1,3})$")
+SET_LOCAL_PREF_REGEX = re.compile(r"^\s*set\slocal-preference\s(\d+)$")
+SET_AS_PATH_PREPEND_REGEX = re.compile(r"^\s*set\sas-path\sprepend\s((?:\d+\s?)+)$")
+SET_METRIC_REGEX = re.compile(r"^\s*set\smetric\s(\d+)$")
+
+
+def load_network_from_configs(config_path, scenario_name="", use_cache=True, cache_path=None, processes=None):
     """
     Creates a NetworkTopology by parsing all the supplied config files (configs) which are located in the config path.
+    Unless use_cache is False, the information extracted from each config is cached on disk (by default in a
+    sub-directory of the config path) and only parsed again when the config changes. The configs are parsed in
+    parallel by a pool of processes (a single process if processes is 1), only linking them is done sequentially.
     """
 
     if not scenario_name:
         scenario_name = os.path.basename(config_path)
 
-    # get all config files
-    all_files = os.listdir(config_path)
-
-    configs = list()
-    for file_name in all_files:
-        router, filetype = file_name.split('.')
-        if filetype == 'cfg' or filetype == 'conf':
-            configs.append(file_name)
+    configs = get_config_files(config_path)
 
     logger.debug("Starting to parse %d configurations as part of the %s scenario." % (len(configs), scenario_name))
 
-    parsed_configs = dict()
+    if not use_cache:
+        cache_path = None
+    elif not cache_path:
+        cache_path = os.path.join(config_path, CACHE_DIRECTORY)
+
+    config_file_paths = [os.path.join(config_path, config) for config in configs]
+    parsed_configs = read_configs(config_file_paths, cache_path, processes)
 
     routers = dict()
     route_maps = dict()
@@ -49,48 +113,26 @@ def load_network_from_configs(config_path, scenario_name=""):
 
     network = NetworkTopology(scenario_name)
 
-    for config in configs:
+    for config, parsed_config in zip(configs, parsed_configs):
         router_name = config.split(".")[0]
-        config_file_path = os.path.join(config_path, config)
-        parsed_configs[config] = CiscoConfParse(config=config_file_path)
+        network.parsed_configs[router_name] = parsed_config
 
         # add the internal router
-        router_id, asn = get_router_info(parsed_configs[config])
+        router_id, asn = parsed_config.router_id, parsed_config.asn
         routers[router_name] = network.add_internal_router(router_name, router_id, asn)
 
         logger.debug("Parsing the config of %s with id %s and ASN %d." % (router_name, router_id, asn))
 
-        # add all prefix-lists
-        prefix_lists = create_prefix_lists(parsed_configs[config])
-
-        # add all community-lists
-        community_lists, tmp_communities = create_community_lists(parsed_configs[config])
-
         # update the communities
-        communities |= tmp_communities
+        communities |= parsed_config.communities
 
-        # add all access-lists
-        access_lists = create_access_lists(parsed_configs[config])
-
-        # add all access-lists
-        as_path_lists = create_as_path_lists(parsed_configs[config])
-
-        # add all route-maps
-        route_maps[router_name], tmp_communities = create_route_maps(
-            parsed_configs[config], prefix_lists, community_lists, access_lists, as_path_lists
-        )
-
-        # update the communities
-        communities |= tmp_communities
-
-        # get BGP peerings
-        local_peerings, external_routers = get_bgp_peerings(parsed_configs[config])
+        route_maps[router_name] = parsed_config.route_maps
 
         # store peerings for later
-        peerings[router_name] = local_peerings
+        peerings[router_name] = parsed_config.peerings
 
         # add external routers
-        for external_router in external_routers:
+        for external_router in parsed_config.external_routers:
             neighbor_ip, neighbor_asn = external_router
             network.add_external_router('ext_router_%d' % num_external_routers, neighbor_ip, neighbor_asn)
             num_external_routers += 1
@@ -99,13 +141,13 @@ def load_network_from_configs(config_path, scenario_name=""):
         logger.debug(
             local_debug_output(
                 router_name,
-                prefix_lists,
-                community_lists,
-                access_lists,
-                as_path_lists,
-                route_maps[router_name],
-                local_peerings,
-                external_routers,
+                parsed_config.prefix_lists,
+                parsed_config.community_lists,
+                parsed_config.access_lists,
+                parsed_config.as_path_lists,
+                parsed_config.route_maps,
+                parsed_config.peerings,
+                parsed_config.external_routers,
             )
         )
 
@@ -134,61 +176,323 @@ def load_network_from_configs(config_path, scenario_name=""):
     return network
 
 
-def get_router_info(parsed_config):
-    bgp_configs = parsed_config.find_objects("^router\sbgp\s\d+$", exactmatch=True)
-    if bgp_configs:
-        asn = int(bgp_configs[0].re_match("^router\sbgp\s(\d+)$", group=1))
+def reload_network_from_configs(network, config_path, use_cache=True, cache_path=None, processes=None):
+    """
+    Updates a network that has been created by load_network_from_configs to the current configs in the config path.
+    As long as the routers and their external neighbors stay the same, only the changed route maps, peerings and the
+    community list are patched, otherwise the network is loaded from scratch. Returns the (new) network and the set of
+    (router name, direction, neighbor) whose route map has been touched, including all the sessions of the routers
+    whose links changed. The set can be passed on to NetworkTopology.propagate_changed.
+    """
+    configs = get_config_files(config_path)
+    router_names = [config.split(".")[0] for config in configs]
+
+    if not use_cache:
+        cache_path = None
+    elif not cache_path:
+        cache_path = os.path.join(config_path, CACHE_DIRECTORY)
+
+    config_file_paths = [os.path.join(config_path, config) for config in configs]
+    parsed_configs = dict(zip(router_names, read_configs(config_file_paths, cache_path, processes)))
+
+    if not check_same_routers(router_names, network.parsed_configs, parsed_configs):
+        logger.debug("The routers of %s have changed, loading the network from scratch." % network.name)
+        network = load_network_from_configs(config_path, network.name, use_cache, cache_path, processes)
+        return network, network.get_route_map_sessions()
+
+    touched = set()
+    for router_name in router_names:
+        old_config = network.parsed_configs[router_name]
+        new_config = parsed_configs[router_name]
+        if old_config.digest == new_config.digest:
+            continue
+
+        logger.debug("The config of %s has changed." % router_name)
+        router_id = network.get_router_id(router_name)
+        router = network.routers[router_id]
+
+        for neighbor in set(old_config.peerings) | set(new_config.peerings):
+            if neighbor not in new_config.peerings:
+                sessions = {RouteMapDirection.IN: "", RouteMapDirection.OUT: ""}
+
+                # the link stays as long as the neighbor still peers with the router
+                neighbor_config = parsed_configs.get(network.router_id_to_name.get(neighbor))
+                if not (neighbor_config and router_id in neighbor_config.peerings) and \
+                        network.has_edge(router_id, neighbor):
+                    touched |= get_link_sessions(network, router_id, neighbor)
+                    network.remove_edge(router_id, neighbor)
+            else:
+                sessions = new_config.peerings[neighbor]
+                if not network.has_edge(router_id, neighbor):
+                    network.add_peering(router_name, neighbor)
+                    touched |= get_link_sessions(network, router_id, neighbor)
+
+            for direction in [RouteMapDirection.IN, RouteMapDirection.OUT]:
+                old_route_map = router.route_maps.get((direction, neighbor))
+                new_route_map = new_config.route_maps[sessions[direction]] if sessions[direction] else None
+
+                if old_route_map is None and new_route_map is None:
+                    continue
+                if old_route_map is not None and new_route_map is not None and \
+                        old_route_map.fingerprint() == new_route_map.fingerprint():
+                    # keep the loaded route map, it might have cached results already
+                    continue
+
+                if new_route_map is None:
+                    del router.route_maps[(direction, neighbor)]
+                else:
+                    router.add_route_map(new_route_map, direction, neighbor)
+                touched.add((router_name, direction, neighbor))
+
+        network.parsed_configs[router_name] = new_config
+
+    communities = set()
+    for parsed_config in parsed_configs.values():
+        communities |= parsed_config.communities
+    communities = sorted(communities)
+    if communities != network.AS_community_list:
+        # the community list is part of every announcement, hence, all route maps are affected
+        logger.debug("Community List: %s" % ", ".join(communities))
+        network.add_community_list(communities)
+        touched = network.get_route_map_sessions()
+
+    return network, touched
+
+
+def get_link_sessions(network, router_id, neighbor):
+    """
+    Returns all the sessions of both ends of the link, when a link is added or removed, the announcements can take
+    different paths through both routers
+    """
+    return network.get_router_sessions(router_id) | network.get_router_sessions(neighbor)
+
+
+def check_same_routers(router_names, old_configs, new_configs):
+    """
+    Checks whether the configs describe the same routers with the same external neighbors, such that the network
+    built from the old configs can be patched
+    """
+    if list(old_configs.keys()) != router_names:
+        return False
+
+    for router_name in router_names:
+        old_config = old_configs[router_name]
+        new_config = new_configs[router_name]
+        if old_config.router_id != new_config.router_id or old_config.asn != new_config.asn or \
+                old_config.external_routers != new_config.external_routers:
+            return False
+
+    return True
+
+
+def get_config_files(config_path):
+    # get all config files
+    all_files = os.listdir(config_path)
+
+    configs = list()
+    for file_name in all_files:
+        router, filetype = file_name.split('.')
+        if filetype == 'cfg' or filetype == 'conf':
+            configs.append(file_name)
+
+    return configs
+
+
+class ParsedConfig(object):
+    """
+    Everything that is extracted from the config of a single router, before the routers are linked to a network
+    """
+
+    def __init__(self, config_file_path):
+        with open(config_file_path, 'rb') as config_file:
+            content = config_file.read()
+
+        # identifies the content of the config, a config with the same digest results in the same information
+        self.digest = hashlib.sha1(content).hexdigest()
+
+        config_lines = scan_config(content.decode().splitlines())
+
+        self.router_id, self.asn = get_router_info(config_lines)
+
+        self.prefix_lists = create_prefix_lists(config_lines)
+        self.community_lists, self.communities = create_community_lists(config_lines)
+        self.access_lists = create_access_lists(config_lines)
+        self.as_path_lists = create_as_path_lists(config_lines)
+
+        self.route_maps, tmp_communities = create_route_maps(
+            config_lines, self.prefix_lists, self.community_lists, self.access_lists, self.as_path_lists
+        )
+        self.communities |= tmp_communities
+
+        self.peerings, self.external_routers = get_bgp_peerings(config_lines)
+
+
+class ConfigLines(object):
+    """
+    The lines of a config that are relevant for the model, sorted by their type in a single pass over the config. The
+    prefix, community, access and as path lists are stored as the match of the corresponding pattern, the route maps
+    and BGP processes as the match of their first line and the text of their direct children.
+    """
+
+    def __init__(self):
+        self.prefix_lists = list()
+        self.community_lists = list()
+        self.access_lists = list()
+        self.as_path_lists = list()
+        self.route_maps = list()
+        self.bgp_configs = list()
+
+
+def scan_config(lines):
+    config_lines = ConfigLines()
+
+    # direct children of the current top-level line (None if they are not needed) and the indentation of the lines
+    # that are still open in the current block
+    children = None
+    indents = list()
+
+    for line in lines:
+        text = line.rstrip('\r\n')
+        stripped = text.lstrip()
+        if not stripped:
+            continue
+
+        indent = len(text) - len(stripped)
+        if indent > 0:
+            if stripped.startswith('!'):
+                continue
+            while indents and indents[-1] >= indent:
+                indents.pop()
+            if children is not None and not indents:
+                children.append(text)
+            indents.append(indent)
+            continue
+
+        # a new top-level line ends the current block
+        children = None
+        indents = list()
+
+        if text.startswith('!'):
+            continue
+
+        for line_type, regex in TOP_LEVEL_PATTERNS:
+            line_match = regex.match(text)
+            if line_match:
+                break
+        else:
+            continue
+
+        if line_type == 'route-map' or line_type == 'bgp':
+            children = list()
+            getattr(config_lines, LINE_TYPE_ATTRIBUTES[line_type]).append((line_match, children))
+        elif line_match.group(0) != text:
+            # only the keyword matched, but not the whole line
+            logger.error("UNKNOWN %s LINE: %s" % (line_type.upper(), text))
+        else:
+            getattr(config_lines, LINE_TYPE_ATTRIBUTES[line_type]).append(line_match)
+
+    return config_lines
+
+
+def parse_config(config_file_path):
+    return ParsedConfig(config_file_path)
+
+
+def read_config(config_file_path, cache_path=None):
+    if cache_path:
+        return load_config(config_file_path, cache_path)
+    return parse_config(config_file_path)
+
+
+def read_configs(config_file_paths, cache_path=None, processes=None):
+    """
+    Returns the ParsedConfig of each of the config files (in the same order), the configs are read by a pool of
+    processes as each of them only depends on a single file
+    """
+    if processes == 1 or len(config_file_paths) <= 1:
+        return [read_config(config_file_path, cache_path) for config_file_path in config_file_paths]
+
+    with ProcessPoolExecutor(max_workers=processes) as executor:
+        return list(executor.map(read_config, config_file_paths, repeat(cache_path)))
+
+
+def load_config(config_file_path, cache_path):
+    """
+    Returns the ParsedConfig of the config file, from the cache if the file has not changed since it was cached
+    """
+    with open(config_file_path, 'rb') as config_file:
+        content = config_file.read()
+    stat = os.stat(config_file_path)
+
+    key = (os.path.abspath(config_file_path), stat.st_size, stat.st_mtime_ns, hashlib.sha1(content).hexdigest())
+    cache_file_path = os.path.join(cache_path, '%s.pickle' % hashlib.sha1(key[0].encode()).hexdigest())
+
+    try:
+        with open(cache_file_path, 'rb') as cache_file:
+            version, cached_key, parsed_config = pickle.load(cache_file)
+        if version == CACHE_VERSION and cached_key == key:
+            logger.debug("Loaded the parsed config of %s from the cache." % config_file_path)
+            return parsed_config
+    except (OSError, EOFError, pickle.UnpicklingError, AttributeError, ImportError, ValueError):
+        pass
+
+    parsed_config = parse_config(config_file_path)
+
+    try:
+        os.makedirs(cache_path, exist_ok=True)
+        # write to a temporary file first, such that concurrent loads never see a partial cache entry
+        tmp_file_path = '%s.%d.tmp' % (cache_file_path, os.getpid())
+        with open(tmp_file_path, 'wb') as cache_file:
+            pickle.dump((CACHE_VERSION, key, parsed_config), cache_file, protocol=pickle.HIGHEST_PROTOCOL)
+        os.replace(tmp_file_path, cache_file_path)
+    except OSError as e:
+        logger.error("Could not cache the parsed config of %s: %s" % (config_file_path, e))
+
+    return parsed_config
+
+
+def get_router_info(config_lines):
+    if config_lines.bgp_configs:
+        asn = int(config_lines.bgp_configs[0][0].group(1))
     else:
         asn = -1
 
-    ri_configs = parsed_config.find_objects_w_parents(
-        "^router\sbgp\s\d+$",
-        "^\sbgp\srouter-id\s")
-    if ri_configs:
-        router_id = ri_configs[0].re_match("^\sbgp\srouter-id\s(\d{1,3}\.\d{1,3}\.\d{1,3}\.\d{1,3})$", group=1)
-    else:
-        router_id = "UNKNOWN"
+    router_id = "UNKNOWN"
+    for _, children in config_lines.bgp_configs:
+        ri_configs = [child for child in children if ROUTER_ID_REGEX.search(child)]
+        if ri_configs:
+            router_id = re_match(ROUTER_ID_VALUE_REGEX, ri_configs[0])
+            break
 
     return router_id, asn
 
 
-def create_prefix_lists(parsed_config):
+def create_prefix_lists(config_lines):
     prefix_lists = defaultdict(dict)
 
-    pl_regex = "^ip\sprefix-list\s(\w+)\sseq\s(\d{1,5})\s(deny|permit)\s" \
-               "(\d{1,3}\.\d{1,3}\.\d{1,3}\.\d{1,3}/\d{1,2})(?:\sle\s(\d+))?(?:\sge\s(\d+))?$"
-
-    pl_configs = parsed_config.find_objects("^ip\sprefix-list", exactmatch=False)
-    for pl_config in pl_configs:
-
-        pl_name = pl_config.re_match(pl_regex, group=1)
-        pl_seq = int(pl_config.re_match(pl_regex, group=2))
-        pl_type = get_match_type(pl_config.re_match(pl_regex, group=3))
-        pl_prefix = pl_config.re_match(pl_regex, group=4)
-        pl_le = pl_config.re_match(pl_regex, group=5)
-        pl_ge = pl_config.re_match(pl_regex, group=6)
+    for pl_config in config_lines.prefix_lists:
 
-        if pl_le and pl_ge:
-            # TODO implement
-            logger.error("At the moment, we only support LE, GE, or EQUAL match, but nothing more specific.")
+        pl_name = pl_config.group(1)
+        pl_seq = int(pl_config.group(2))
+        pl_type = get_match_type(pl_config.group(3))
+        pl_prefix = pl_config.group(4)
+        pl_ge = pl_config.group(5)
+        pl_le = pl_config.group(6)
 
         prefix_lists[pl_name][pl_seq] = (pl_type, pl_prefix, pl_le, pl_ge)
 
     return prefix_lists
 
 
-def create_community_lists(parsed_config):
+def create_community_lists(config_lines):
     community_lists = defaultdict(list)
     communities = set()
 
-    cl_regex = "^ip\scommunity-list\s(standard\s)?(\w+)\s(deny|permit)\s(.*)$"
+    for cl_config in config_lines.community_lists:
 
-    cl_configs = parsed_config.find_objects("^ip\scommunity-list", exactmatch=False)
-    for cl_config in cl_configs:
-
-        cl_name = cl_config.re_match(cl_regex, group=2)
-        cl_type = get_match_type(cl_config.re_match(cl_regex, group=3))
-        tmp_list = cl_config.re_match(cl_regex, group=4)
+        cl_name = cl_config.group(2)
+        cl_type = get_match_type(cl_config.group(3))
+        tmp_list = cl_config.group(4)
         cl_list = tmp_list.split()
         communities.update(cl_list)
 
@@ -197,34 +501,28 @@ def create_community_lists(parsed_config):
     return community_lists, communities
 
 
-def create_access_lists(parsed_config):
+def create_access_lists(config_lines):
     access_lists = defaultdict(list)
 
-    al_regex = "^access-list\s(\w+)\s(deny|permit)\s(\d{1,3}\.\d{1,3}\.\d{1,3}\.\d{1,3}/\d{1,2})$"
-
-    al_configs = parsed_config.find_objects("^access-list\s", exactmatch=False)
-    for al_config in al_configs:
+    for al_config in config_lines.access_lists:
 
-        al_name = al_config.re_match(al_regex, group=1)
-        al_type = get_match_type(al_config.re_match(al_regex, group=2))
-        al_prefix = al_config.re_match(al_regex, group=3)
+        al_name = al_config.group(1)
+        al_type = get_match_type(al_config.group(2))
+        al_prefix = al_config.group(3)
 
         access_lists[al_name].append((al_type, al_prefix))
 
     return access_lists
 
 
-def create_as_path_lists(parsed_config):
+def create_as_path_lists(config_lines):
     as_path_lists = defaultdict(list)
 
-    apl_regex = "^ip\sas-path\saccess-list\s(\w+)\s(deny|permit)\s(.*)$"
-
-    apl_configs = parsed_config.find_objects("^ip\sas-path\saccess-list\s", exactmatch=False)
-    for apl_config in apl_configs:
+    for apl_config in config_lines.as_path_lists:
 
-        apl_name = apl_config.re_match(apl_regex, group=1)
-        apl_type = get_match_type(apl_config.re_match(apl_regex, group=2))
-        apl_pattern = apl_config.re_match(apl_regex, group=3)
+        apl_name = apl_config.group(1)
+        apl_type = get_match_type(apl_config.group(2))
+        apl_pattern = apl_config.group(3)
 
         as_path_lists[apl_name].append((apl_type, map_pattern_to_regex(apl_pattern)))
 
@@ -237,85 +535,90 @@ def map_pattern_to_regex(pattern):
     return regex
 
 
-def create_route_maps(parsed_config, prefix_lists, community_lists, access_lists, as_path_lists):
+def create_route_maps(config_lines, prefix_lists, community_lists, access_lists, as_path_lists):
     route_maps = dict()
     communities = set()
 
-    rm_configs = parsed_config.find_objects("^route-map\s(\w+)\s(permit|deny)\s(\d+)$", exactmatch=True)
-    for rm_config in rm_configs:
+    for rm_config, children in config_lines.route_maps:
 
-        rm_regex = "^route-map\s(\w+)\s(permit|deny)\s(\d+)$"
-
-        rm_name = rm_config.re_match(rm_regex, group=1)
-        rm_type = get_match_type(rm_config.re_match(rm_regex, group=2))
+        rm_name = rm_config.group(1)
+        rm_type = get_match_type(rm_config.group(2))
 
         if rm_name not in route_maps:
             route_maps[rm_name] = RouteMap(rm_name, rm_type)
 
         rm_items = RouteMapItems(rm_type)
-        for child in rm_config.children:
-            if child.re_match("^\s*(match)"):
+        for child in children:
+            if MATCH_LINE_REGEX.search(child):
                 match_type, field, pattern, filter_type = parse_match(
                     child, prefix_lists, community_lists, access_lists, as_path_lists
                 )
                 rm_items.add_match(match_type, field, pattern, filter_type)
 
-            elif child.re_match("^\s*(set)"):
+            elif SET_LINE_REGEX.search(child):
                 field, pattern, tmp_communities = parse_action(child)
                 communities |= tmp_communities
 
                 rm_items.add_action(field, pattern)
 
             else:
-                logger.error("UNKNOWN ROUTE-MAP LINE: %s" % child.text)
+                logger.error("UNKNOWN ROUTE-MAP LINE: %s" % child)
 
-        rm_seq_number = int(rm_config.re_match(rm_regex, group=3))
+        rm_seq_number = int(rm_config.group(3))
         route_maps[rm_name].add_item(rm_items, rm_seq_number)
 
     return route_maps, communities
 
 
 def parse_match(config_line, prefix_lists, community_lists, access_lists, as_path_lists):
-    str_field = config_line.re_match(
-        "^\s*match\s(community|ip\saddress\sprefix-list|local-preference|metric|as-path)", group=1
-    )
+    str_field = re_match(MATCH_FIELD_REGEX, config_line)
 
     if str_field == "community":
         field = RouteAnnouncementFields.COMMUNITIES
-        cl_name = config_line.re_match("^\s*match\scommunity\s(\w+)", group=1)
+        cl_name = re_match(MATCH_COMMUNITY_REGEX, config_line)
 
         cl = community_lists[cl_name]
         if len(cl) > 1:
-            logger.error("At the moment, we only support community lists "
-                         "that consists of a conjunction of communities, and not disjunction.")
-
-        match_type, pattern = cl[0]
+            # the entries are ORed, the first one whose communities are all carried decides
+            # the entries keep their permit or deny, the match hits the routes that the list permits (always PERMIT)
+            match_type = RouteMapType.PERMIT
+            pattern = CommunityList(cl)
+        else:
+            match_type, pattern = cl[0]
         filter_type = FilterType.GE
 
     elif str_field == "ip address prefix-list":
         field = RouteAnnouncementFields.IP_PREFIX
-        pl_name = config_line.re_match("^\s*match\sip\saddress\sprefix-list\s(\w+)", group=1)
+        pl_name = re_match(MATCH_PREFIX_LIST_REGEX, config_line)
 
         pl = prefix_lists[pl_name]
-        if len(pl) > 1:
-            logger.error("At the moment, we only support prefix lists with a single prefix.")
-
         for match_type, pl_prefix, pl_le, pl_ge in pl.values():
             break
 
-        pattern = SymbolicField.create_from_prefix(pl_prefix, field)
-
-        # TODO add proper filter type parsing... add support for LE and GE at the same time
-        if pl_le and not pl_ge:
-            filter_type = FilterType.LE
-        elif not pl_le and pl_ge:
+        if len(pl) > 1 or (pl_le and pl_ge):
+            # the entries are matched in the order of their sequence numbers, the first one containing the prefix
+            # decides. As for community lists, the entries keep their permit or deny and the match hits the prefixes
+            # that the list permits (always PERMIT). A single entry with ge and le is a list, as SymbolicField only
+            # holds one of the bounds.
+            match_type = RouteMapType.PERMIT
+            pattern = PrefixList([(pl_type, pl_prefix, pl_ge, pl_le) for _, (pl_type, pl_prefix, pl_le, pl_ge)
+                                  in sorted(pl.items())])
             filter_type = FilterType.GE
+
         else:
-            filter_type = FilterType.EQUAL
+            pattern = SymbolicField.create_from_prefix(pl_prefix, field)
+
+            # TODO add proper filter type parsing
+            if pl_le and not pl_ge:
+                filter_type = FilterType.LE
+            elif not pl_le and pl_ge:
+                filter_type = FilterType.GE
+            else:
+                filter_type = FilterType.EQUAL
 
     elif str_field == "ip next-hop":
         field = RouteAnnouncementFields.NEXT_HOP
-        al_name = config_line.re_match("^\s*match\sip\snext-hop\saccess-list\s(\w+)", group=1)
+        al_name = re_match(MATCH_NEXT_HOP_REGEX, config_line)
 
         al = access_lists[al_name]
         if len(al) > 1:
@@ -329,7 +632,7 @@ def parse_match(config_line, prefix_lists, community_lists, access_lists, as_pat
 
     elif str_field == "as-path":
         field = RouteAnnouncementFields.AS_PATH
-        apl_name = config_line.re_match("^\s*match\sas-path\s(\w+)", group=1)
+        apl_name = re_match(MATCH_AS_PATH_REGEX, config_line)
 
         apl = as_path_lists[apl_name]
         if len(apl) > 1:
@@ -343,17 +646,17 @@ def parse_match(config_line, prefix_lists, community_lists, access_lists, as_pat
     elif str_field == "metric":
         field = RouteAnnouncementFields.MED
         match_type = RouteMapType.PERMIT
-        pattern = config_line.re_match("^\s*match\smetric\s(\d+)", group=1)
+        pattern = re_match(MATCH_METRIC_REGEX, config_line)
         filter_type = FilterType.EQUAL
 
     elif str_field == "local-preference":
         field = RouteAnnouncementFields.LOCAL_PREF
         match_type = RouteMapType.PERMIT
-        pattern = config_line.re_match("^\s*match\slocal-preference\s(\d+)", group=1)
+        pattern = re_match(MATCH_LOCAL_PREF_REGEX, config_line)
         filter_type = FilterType.EQUAL
 
     else:
-        logger.error("UNKNOWN MATCH: %s" % config_line.text)
+        logger.error("UNKNOWN MATCH: %s" % config_line)
         sys.exit(0)
 
     return match_type, field, pattern, filter_type
@@ -362,55 +665,51 @@ def parse_match(config_line, prefix_lists, community_lists, access_lists, as_pat
 def parse_action(config_line):
     communities = set()
 
-    str_field = config_line.re_match(
-        "^\s*set\s(community|ip\snext-hop|local-preference|as-path\sprepend|metric)",
-        group=1
-    )
+    str_field = re_match(SET_FIELD_REGEX, config_line)
 
     if str_field == "community":
         field = RouteAnnouncementFields.COMMUNITIES
-        str_pattern = config_line.re_match("^\s*set\scommunity\s(.+)$", group=1)
+        str_pattern = re_match(SET_COMMUNITY_REGEX, config_line)
         pattern = str_pattern.split()
         communities = set(pattern)
 
     elif str_field == "ip next-hop":
         field = RouteAnnouncementFields.NEXT_HOP
-        pattern = config_line.re_match("^\s*set\sip\snext-hop\s(\d{1,3}\.\d{1,3}\.\d{1,3}\.\d{1,3})$", group=1)
+        pattern = re_match(SET_NEXT_HOP_REGEX, config_line)
 
     elif str_field == "local-preference":
         field = RouteAnnouncementFields.LOCAL_PREF
-        pattern = int(config_line.re_match("^\s*set\slocal-preference\s(\d+)$", group=1))
+        pattern = int(re_match(SET_LOCAL_PREF_REGEX, config_line))
 
     elif str_field == "as-path prepend":
         field = RouteAnnouncementFields.AS_PATH
         pattern = [
-            int(asn) for asn in config_line.re_match("^\s*set\sas-path\sprepend\s((?:\d+\s?)+)$", group=1).split()
+            int(asn) for asn in re_match(SET_AS_PATH_PREPEND_REGEX, config_line).split()
         ]
 
     elif str_field == "metric":
         field = RouteAnnouncementFields.MED
-        pattern = int(config_line.re_match("^\s*set\smetric\s(\d+)$", group=1))
+        pattern = int(re_match(SET_METRIC_REGEX, config_line))
 
     else:
-        logger.error("UNKNOWN ACTION: %s" % config_line.text)
+        logger.error("UNKNOWN ACTION: %s" % config_line)
         sys.exit(0)
 
     return field, pattern, communities
 
 
-def get_bgp_peerings(parsed_config):
+def get_bgp_peerings(config_lines):
     peerings = dict()
     external_routers = list()
 
     # TODO at the moment, we assume that there is a single BGP process per router
-    bgp_configs = parsed_config.find_objects("^router\sbgp\s\d+$", exactmatch=True)
-    bgp_config = bgp_configs[0]
+    bgp_config, children = config_lines.bgp_configs[0]
 
-    asn = int(bgp_config.re_match("^router\sbgp\s(\d+)$", group=1))
+    asn = int(bgp_config.group(1))
 
-    for child in bgp_config.children:
-        if child.re_match("^\s*(neighbor)"):
-            neighbor_ip = child.re_match("^\s*neighbor\s(\d{1,3}\.\d{1,3}\.\d{1,3}\.\d{1,3})\s", group=1)
+    for child in children:
+        if NEIGHBOR_LINE_REGEX.search(child):
+            neighbor_ip = re_match(NEIGHBOR_IP_REGEX, child)
 
             # init the session
             if neighbor_ip not in peerings:
@@ -419,31 +718,41 @@ def get_bgp_peerings(parsed_config):
                     RouteMapDirection.OUT: "",
                 }
 
-            if child.re_match("(route-map)"):
-                rm_name = child.re_match("route-map\s(\w+)\s(in|out)$", group=1)
-                rm_type = RouteMapDirection.OUT if child.re_match("(out)$") else RouteMapDirection.IN
+            if NEIGHBOR_ROUTE_MAP_REGEX.search(child):
+                rm_name = re_match(NEIGHBOR_ROUTE_MAP_NAME_REGEX, child)
+                rm_type = RouteMapDirection.OUT if NEIGHBOR_OUT_REGEX.search(child) else RouteMapDirection.IN
 
                 peerings[neighbor_ip][rm_type] = rm_name
 
-            elif child.re_match("(remote-as)"):
-                neighbor_asn = int(child.re_match("remote-as\s(\d+)"))
+            elif NEIGHBOR_REMOTE_AS_REGEX.search(child):
+                neighbor_asn = int(re_match(NEIGHBOR_REMOTE_AS_NUMBER_REGEX, child))
 
                 if neighbor_asn != asn:
                     external_routers.append((neighbor_ip, neighbor_asn))
 
-            elif child.re_match("(update-source)"):
-                us_intf = child.re_match("update-source\s(.+)", group=1)
+            elif NEIGHBOR_UPDATE_SOURCE_REGEX.search(child):
+                us_intf = re_match(NEIGHBOR_UPDATE_SOURCE_REGEX, child)
                 logger.debug("Update-Source %s" % us_intf)
 
-            elif child.re_match("(next-hop-self)"):
+            elif NEIGHBOR_NEXT_HOP_SELF_REGEX.search(child):
                 logger.debug("Next-Hop-Self")
 
             else:
-                logger.error("UNKNOWN: %s" % (child.text))
+                logger.error("UNKNOWN: %s" % (child, ))
 
     return peerings, external_routers
 
 
+def re_match(regex, text, group=1, default=""):
+    """
+    Returns the group of the first match of the precompiled regex in the text, or default if it does not match
+    """
+    line_match = regex.search(text)
+    if line_match is not None:
+        return line_match.group(group)
+    return default
+
+
 def get_match_type(str_type):
     if str_type == "permit":
         return RouteMapType.PERMIT
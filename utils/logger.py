@@ -4,6 +4,16 @@
 import logging
 
 
+# global switch for the debug output of the model. The debug calls on the hot paths are guarded by it, hence, while it
+# is off they neither format their message nor allocate anything.
+DEBUG = False
+
+
+def set_debug(enabled):
+    global DEBUG
+    DEBUG = enabled
+
+
 def get_logger(name, loglevel):
     # LOGGING
     if loglevel == 'INFO':
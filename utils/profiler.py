@@ -0,0 +1,130 @@
+#!/usr/bin/env python
+# Author: Ruediger Birkner (Networked Systems Group at ETH Zurich)
+
+import functools
+import json
+import time
+from collections import defaultdict
+
+
+class Profiler(object):
+    """
+    Opt-in instrumentation of the hot paths of the symbolic execution. While the profiler is enabled, the instrumented
+    methods are replaced by wrappers that count the calls and sum up the time spent in them (including the time spent
+    in nested instrumented calls). When it is disabled, the original methods are put back, hence, there is no overhead
+    at all.
+
+    The compiled route map items capture the filter and set methods, they are compiled again whenever the version of
+    the profiler changes. Only the calls in the current process are recorded, i.e., propagations in worker processes
+    are not included.
+    """
+
+    def __init__(self):
+        self.enabled = False
+        # incremented whenever the instrumented methods are replaced or restored
+        self.version = 0
+
+        # label -> [number of calls, cumulative time]
+        self.stats = defaultdict(lambda: [0, 0.0])
+
+        # (class, method name, original method) of all instrumented methods
+        self.originals = list()
+
+    def get_targets(self):
+        """
+        Returns (class, method name, label) of all instrumented methods, the label is either a string or a function
+        that derives it from the arguments of the call
+        """
+        # imported here as the model itself depends on the profiler
+        from model.announcement import RouteAnnouncement, AsPath, Community, FILTER_METHODS, SET_METHODS
+        from model.router import RouteMap, RouteMapItems
+        from model.fsm_store import FSMStore
+        from model.network import NetworkTopology, AnnouncementSet
+
+        targets = [
+            (NetworkTopology, 'propagate_announcement', 'NetworkTopology.propagate_announcement'),
+            (NetworkTopology, 'propagate_routes', 'NetworkTopology.propagate_routes'),
+            (AnnouncementSet, 'add', 'AnnouncementSet.add'),
+            (RouteMap, 'apply', 'RouteMap.apply'),
+            (RouteMap, 'process', 'RouteMap.process'),
+            (RouteMap, 'apply_batch', 'RouteMap.apply_batch'),
+            (RouteMap, 'apply_concrete', 'RouteMap.apply_concrete'),
+            (RouteMapItems, 'apply', 'RouteMapItems.apply'),
+            (RouteAnnouncement, 'copy', 'RouteAnnouncement.copy'),
+            (AsPath, 'copy', 'AsPath.copy'),
+            (Community, 'copy', 'Community.copy'),
+            (FSMStore, 'compile', 'FSMStore.compile'),
+            (FSMStore, 'intern', 'FSMStore.intern'),
+            (FSMStore, 'apply', lambda store, operation, *args: 'FSMStore.%s' % operation),
+        ]
+        for field, method in FILTER_METHODS.items():
+            targets.append((RouteAnnouncement, method, 'RouteAnnouncement.filter[%s]' % field.name))
+        for field, method in SET_METHODS.items():
+            targets.append((RouteAnnouncement, method, 'RouteAnnouncement.set_field[%s]' % field.name))
+
+        return targets
+
+    def enable(self):
+        if self.enabled:
+            return
+
+        for cls, name, label in self.get_targets():
+            original = cls.__dict__[name]
+            self.originals.append((cls, name, original))
+            setattr(cls, name, self.instrument(original, label))
+
+        self.enabled = True
+        self.version += 1
+
+    def disable(self):
+        if not self.enabled:
+            return
+
+        for cls, name, original in reversed(self.originals):
+            setattr(cls, name, original)
+        self.originals = list()
+
+        self.enabled = False
+        self.version += 1
+
+    def reset(self):
+        self.stats.clear()
+
+    def instrument(self, function, label):
+        stats = self.stats
+        perf_counter = time.perf_counter
+
+        if callable(label):
+            get_label = label
+        else:
+            def get_label(*args):
+                return label
+
+        @functools.wraps(function)
+        def instrumented(*args, **kwargs):
+            start_time = perf_counter()
+            try:
+                return function(*args, **kwargs)
+            finally:
+                entry = stats[get_label(*args)]
+                entry[0] += 1
+                entry[1] += perf_counter() - start_time
+
+        return instrumented
+
+    def to_dict(self):
+        return dict((label, {'calls': calls, 'time': total}) for label, (calls, total) in self.stats.items())
+
+    def dump(self, file_name):
+        with open(file_name, 'w') as outfile:
+            json.dump(self.to_dict(), outfile, indent=2, sort_keys=True)
+
+    def get_report(self):
+        output = "%-45s %10s %12s %12s\n" % ('Function', 'Calls', 'Total (s)', 'Per call (us)')
+        for label, (calls, total) in sorted(self.stats.items(), key=lambda x: x[1][1], reverse=True):
+            output += "%-45s %10d %12.6f %12.2f\n" % (label, calls, total, total / calls * 1e6 if calls else 0.0)
+        return output
+
+
+# the hot paths of the model are instrumented by this profiler
+profiler = Profiler()
@@ -0,0 +1,75 @@
+#!/usr/bin/env python
+# Author: Ruediger Birkner (Networked Systems Group at ETH Zurich)
+
+import unittest
+
+from model.announcement import RouteAnnouncement, RouteAnnouncementFields, RouteMapType, PrefixList, IntervalSet, \
+    METRIC_END
+from model.router import RouteMapDirection
+from utils.config_parser import scan_config, create_prefix_lists, create_route_maps
+
+
+PREFIX_LIST_CONFIG = """!
+ip prefix-list MULTI seq 10 deny 10.0.0.0/8 le 32
+ip prefix-list MULTI seq 20 permit 10.1.0.0/16 le 24
+ip prefix-list MULTI seq 30 permit 20.0.0.0/8
+ip prefix-list RANGE seq 10 permit 30.0.0.0/8 ge 16 le 24
+!
+route-map MULTI_MAP permit 10
+ match ip address prefix-list MULTI
+route-map MULTI_MAP permit 20
+ set local-preference 200
+!
+route-map RANGE_MAP permit 10
+ match ip address prefix-list RANGE
+!
+"""
+
+
+def parse_route_maps(config):
+    config_lines = scan_config(config.splitlines())
+    prefix_lists = create_prefix_lists(config_lines)
+    route_maps, _ = create_route_maps(config_lines, prefix_lists, dict(), dict(), dict())
+    return route_maps
+
+
+class PrefixListParserTest(unittest.TestCase):
+    def setUp(self):
+        self.route_maps = parse_route_maps(PREFIX_LIST_CONFIG)
+
+    def get_match(self, rm_name):
+        _, rm_items, _ = self.route_maps[rm_name].compile()[0]
+        self.assertEqual(len(rm_items.matches), 1)
+        return rm_items.matches[0]
+
+    def test_multi_entry_list(self):
+        match = self.get_match('MULTI_MAP')
+        self.assertEqual(match.type, RouteMapType.PERMIT)
+        self.assertIsInstance(match.pattern, PrefixList)
+        self.assertEqual([(entry.type, entry.length, entry.lo, entry.hi) for entry in match.pattern.entries],
+                         [(RouteMapType.DENY, 8, 8, 32), (RouteMapType.PERMIT, 16, 16, 24),
+                          (RouteMapType.PERMIT, 8, 8, 8)])
+
+    def test_ge_and_le(self):
+        match = self.get_match('RANGE_MAP')
+        self.assertEqual(match.type, RouteMapType.PERMIT)
+        self.assertIsInstance(match.pattern, PrefixList)
+        self.assertEqual([(entry.lo, entry.hi) for entry in match.pattern.entries], [(16, 24)])
+
+    def test_multi_entry_route_map(self):
+        # 10.1.0.0/16 is shadowed by the deny entry, only 20.0.0.0/8 is permitted by the first item and everything
+        # else (10.0.0.0/8 included) reaches the second one
+        results = self.route_maps['MULTI_MAP'].apply(RouteAnnouncement(), RouteMapDirection.IN)
+        local_pref_200 = [ann for ann in results if ann.local_pref == IntervalSet.point(200, METRIC_END)]
+        matched = [ann for ann in results if ann not in local_pref_200]
+
+        self.assertEqual([(str(ann.ip_prefix), ann.ip_prefix.prefix_mask) for ann in matched],
+                         [('20.0.0.0/8', [8, 8])])
+        self.assertEqual([(str(ann.ip_prefix), ann.ip_prefix.prefix_mask) for ann in local_pref_200],
+                         [('10.0.0.0/8', [8, 32]), ('0.0.0.0/0', [0, 32])])
+        self.assertEqual([str(ip_prefix) for ip_prefix in local_pref_200[1].ip_prefix_deny],
+                         ['10.0.0.0/8', '10.1.0.0/16', '20.0.0.0/8'])
+
+
+if __name__ == '__main__':
+    unittest.main()